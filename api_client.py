@@ -1,16 +1,60 @@
+import time
 import requests
 import logging
-from typing import Dict, Any, List, Union
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, TimeoutError as FutureTimeout, wait
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+from array import array
+from datetime import date
+from typing import Dict, Any, List, Mapping, Optional, Union
 from exceptions import FitbitAPIError
+from rate_limit import RateLimiter, RETRYABLE_STATUS_CODES, backoff_delay, parse_header_number
+from resilience import CircuitBreaker, Timeout, circuit_breaker, timeout_for
+from intraday import new_minute_array, minute_hook
+from series import StepSeries, series_hook
+from resources import RESOURCES
+import metrics
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_API_BASE_URL = "https://api.fitbit.com"
+# Hedging needs this many recent latencies for an endpoint before the percentile means anything
+HEDGE_MIN_SAMPLES = 20
+
 class FitbitClient:
-    def __init__(self, access_token: str):
+    def __init__(self, access_token: str, rate_limiter: Optional[RateLimiter] = None, max_retries: int = 3,
+                 pool_size: int = 10, api_base_url: str = DEFAULT_API_BASE_URL,
+                 timeouts: Optional[Mapping[str, Timeout]] = None, hedge_percentile: Optional[float] = None,
+                 breaker: Optional[CircuitBreaker] = None, user_key: Optional[str] = None):
         self.access_token = access_token
-        self.base_url = "https://api.fitbit.com/1/user/-"
+        self.api_base_url = api_base_url.rstrip('/')
+        self.base_url = f"{self.api_base_url}/1/user/-"
+        self.host = urlparse(self.api_base_url).netloc
+        # Per-endpoint (connect, read) overrides of resilience.ENDPOINT_TIMEOUTS
+        self.timeouts = timeouts or {}
+        # Resend a GET that is slower than this latency percentile of its endpoint (None disables)
+        self.hedge_percentile = hedge_percentile
+        self._hedge_pool = ThreadPoolExecutor(max_workers=2 * pool_size) if hedge_percentile else None
+        self.breaker = breaker or circuit_breaker(self.host)
         self.session = requests.Session()
         self.session.headers.update(self._get_headers())
+        # Size the keep-alive pool for parallel callers such as Backfill
+        adapter = HTTPAdapter(pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # Quota is per user. Callers sharing a RateLimiter pass a stable user_key (token file or
+        # Fitbit user id) so the budget survives token refreshes; the access token is the fallback.
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.bucket = self.rate_limiter.bucket(user_key or access_token)
+        self.max_retries = max_retries
+
+    @classmethod
+    def from_settings(cls, access_token: str, settings, **kwargs) -> "FitbitClient":
+        """
+        Builds a client with the API URL, timeouts and hedging configured in Settings.
+        """
+        return cls(access_token, api_base_url=settings.api_base_url, timeouts=settings.timeouts,
+                   hedge_percentile=settings.hedge_percentile, **kwargs)
 
     def _get_headers(self) -> Dict[str, str]:
         return {
@@ -18,12 +62,89 @@ class FitbitClient:
             "Accept": "application/json"
         }
 
-    def _handle_response(self, response: requests.Response) -> Dict[str, Any]:
+    def _handle_response(self, response: requests.Response, **json_kwargs) -> Dict[str, Any]:
         if response.status_code != 200:
             logger.error(f"API Error ({response.status_code}): {response.text}")
             raise FitbitAPIError(f"API Error: {response.text}", status_code=response.status_code)
         
-        return response.json()
+        return response.json(**json_kwargs)
+
+    def _get(self, url: str, endpoint: str = "other", **json_kwargs) -> Dict[str, Any]:
+        """
+        Performs a GET within the user's rate-limit budget, retrying 429/5xx with jittered backoff.
+        `endpoint` labels the request in the metrics registry.
+        """
+        attempt = 0
+        while True:
+            self.breaker.allow()
+            self.bucket.acquire()
+            started = time.perf_counter()
+            try:
+                response = self._send(url, endpoint)
+            except requests.RequestException:
+                # Timeouts and connection failures count against the upstream's health
+                self.breaker.record_failure()
+                metrics.REQUESTS.inc(endpoint=endpoint, status="error")
+                raise
+            elapsed = time.perf_counter() - started
+            if response.status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            metrics.REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+            metrics.REQUESTS.inc(endpoint=endpoint, status=str(response.status_code))
+            metrics.RESPONSE_BYTES.inc(len(response.content), endpoint=endpoint)
+            self.bucket.update(response.headers)
+
+            if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                return self._handle_response(response, **json_kwargs)
+
+            if response.status_code == 429:
+                # Quota is spent; the next acquire() waits for the reset window
+                self.bucket.exhaust(parse_header_number(response.headers.get("Retry-After")))
+            metrics.RETRIES.inc(endpoint=endpoint, reason=str(response.status_code))
+            delay = backoff_delay(attempt)
+            logger.warning(f"Retryable API response ({response.status_code}), retrying in {delay:.2f}s")
+            self.rate_limiter.sleep(delay)
+            attempt += 1
+
+    def _timed_get(self, url: str, endpoint: str, timeout: Timeout) -> requests.Response:
+        # Each physical request is sampled, including the loser of a hedge, so the
+        # percentiles describe single-request latency rather than hedged latency
+        started = time.perf_counter()
+        response = self.session.get(url, timeout=timeout)
+        metrics.REQUEST_LATENCY.observe(time.perf_counter() - started, host=self.host, endpoint=endpoint)
+        return response
+
+    def _send(self, url: str, endpoint: str) -> requests.Response:
+        """
+        One GET with the endpoint's timeouts. With hedging enabled, a request still running after
+        the endpoint's `hedge_percentile` latency gets a duplicate, and whichever answers first wins.
+        The hedge needs spare rate-limit budget; it is skipped rather than waited for.
+        """
+        timeout = timeout_for(endpoint, self.timeouts)
+        threshold = None
+        if self.hedge_percentile and metrics.REQUEST_LATENCY.count(host=self.host, endpoint=endpoint) >= HEDGE_MIN_SAMPLES:
+            threshold = metrics.REQUEST_LATENCY.quantile(self.hedge_percentile, host=self.host, endpoint=endpoint)
+        if threshold is None:
+            return self._timed_get(url, endpoint, timeout)
+
+        primary = self._hedge_pool.submit(self._timed_get, url, endpoint, timeout)
+        try:
+            return primary.result(timeout=threshold)
+        except FutureTimeout:
+            pass
+        if self.bucket.try_acquire() > 0:
+            return primary.result()
+        logger.debug(f"{endpoint} slower than p{self.hedge_percentile * 100:g} ({threshold:.3f}s), hedging")
+        hedge = self._hedge_pool.submit(self._timed_get, url, endpoint, timeout)
+        done, _ = wait((primary, hedge), return_when=FIRST_COMPLETED)
+        first = done.pop()
+        if first.exception() is not None:
+            # The faster one failed; the other may still succeed
+            first = hedge if first is primary else primary
+        metrics.HEDGED_REQUESTS.inc(endpoint=endpoint, winner="hedge" if first is hedge else "primary")
+        return first.result()
 
     def get_daily_steps(self, date_str: str = "today") -> int:
         """
@@ -32,8 +153,7 @@ class FitbitClient:
         url = f"{self.base_url}/activities/date/{date_str}.json"
         logger.debug(f"Fetching daily steps from {url}")
         
-        response = self.session.get(url)
-        data = self._handle_response(response)
+        data = self._get(url, endpoint="daily_summary")
         
         summary = data.get("summary", {})
         steps = summary.get("steps", 0)
@@ -47,8 +167,73 @@ class FitbitClient:
         url = f"{self.base_url}/activities/steps/date/{start_date}/{end_date}.json"
         logger.debug(f"Fetching step time series from {url}")
         
-        response = self.session.get(url)
-        data = self._handle_response(response)
+        data = self._get(url, endpoint="steps_time_series")
         
         # Response format: {"activities-steps": [{"dateTime": "YYYY-MM-DD", "value": "1234"}, ...]}
         return data.get("activities-steps", [])
+
+    def get_step_series(self, start_date: str, end_date: str, into: Optional[StepSeries] = None) -> StepSeries:
+        """
+        Fetches step counts for a date range (YYYY-MM-DD) as a StepSeries.
+        Pass `into` to fill a larger existing series (e.g. one chunk of a long window) in place.
+        """
+        url = f"{self.base_url}/activities/steps/date/{start_date}/{end_date}.json"
+        logger.debug(f"Fetching step series from {url}")
+
+        series = into if into is not None else StepSeries.for_range(date.fromisoformat(start_date),
+                                                                    date.fromisoformat(end_date))
+        # The hook fills `series` while decoding, so the entries are never materialized
+        self._get(url, endpoint="steps_time_series", object_hook=series_hook(series))
+        return series
+
+    def get_time_series(self, resource: str, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        """
+        Fetches any daily resource in `resources.RESOURCES` (distance, calories, sleep_minutes, ...)
+        for a date range, as [{"dateTime": "YYYY-MM-DD", "value": number}, ...] sorted by date.
+        Days the API reports no value for are left out.
+        """
+        spec = RESOURCES.get(resource)
+        if spec is None:
+            raise ValueError(f"Unknown resource: {resource}")
+        url = f"{self.api_base_url}/{spec.path.format(start=start_date, end=end_date)}"
+        logger.debug(f"Fetching {resource} time series from {url}")
+
+        data = self._get(url, endpoint=f"{resource}_time_series")
+
+        by_date: Dict[str, float] = {}
+        for entry in data.get(spec.key, []):
+            value = spec.value(entry)
+            if value is not None:
+                day = entry[spec.date_field]
+                by_date[day] = by_date.get(day, 0) + value
+        return [{"dateTime": day, "value": value} for day, value in sorted(by_date.items())]
+
+    def create_subscription(self, subscription_id: str, collection: str = "activities") -> Dict[str, Any]:
+        """
+        Subscribes the user to change notifications for `collection`.
+        Fitbit answers 201 for a new subscription and 200 if it already exists.
+        """
+        url = f"{self.base_url}/{collection}/apiSubscriptions/{subscription_id}.json"
+        logger.debug(f"Creating subscription at {url}")
+
+        self.breaker.allow()
+        self.bucket.acquire()
+        response = self.session.post(url, timeout=timeout_for("subscriptions", self.timeouts))
+        metrics.REQUESTS.inc(endpoint="subscriptions", status=str(response.status_code))
+        self.bucket.update(response.headers)
+        if response.status_code == 201:
+            return response.json()
+        return self._handle_response(response)
+
+    def get_intraday_steps(self, date_str: str = "today") -> array:
+        """
+        Fetches per-minute steps for a single date (YYYY-MM-DD or 'today').
+        Returns a 1440-slot int array indexed by minute of the day.
+        """
+        url = f"{self.base_url}/activities/steps/date/{date_str}/1d/1min.json"
+        logger.debug(f"Fetching intraday steps from {url}")
+
+        minutes = new_minute_array()
+        # The hook fills `minutes` while decoding, so the dataset is never materialized
+        self._get(url, endpoint="steps_intraday", object_hook=minute_hook(minutes))
+        return minutes
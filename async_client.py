@@ -0,0 +1,176 @@
+import json
+import time
+import asyncio
+import logging
+from array import array
+from datetime import date
+from typing import Dict, Any, Awaitable, Callable, List, Mapping, Optional
+from urllib.parse import urlparse
+
+from exceptions import ConfigError, FitbitAPIError
+from rate_limit import RateLimiter, RETRYABLE_STATUS_CODES, backoff_delay, parse_header_number
+from intraday import new_minute_array, minute_hook
+from series import StepSeries, series_hook
+from resources import RESOURCES
+from resilience import CircuitBreaker, Timeout, circuit_breaker, timeout_for
+from api_client import DEFAULT_API_BASE_URL
+import metrics
+
+try:
+    import aiohttp
+except ImportError:  # optional dependency
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+def create_session(limit: int = 1000, limit_per_host: int = 100, timeout: float = 30.0) -> "aiohttp.ClientSession":
+    """
+    Shared keep-alive session for many AsyncFitbitClients. `limit` caps open connections
+    in total and `limit_per_host` per API host; further requests queue for a free connection.
+    Must be called from a running event loop.
+    """
+    if aiohttp is None:
+        raise ConfigError("AsyncFitbitClient requires aiohttp (pip install aiohttp)")
+    connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit_per_host, keepalive_timeout=60)
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout))
+
+class AsyncFitbitClient:
+    """
+    asyncio counterpart of FitbitClient with the same methods as coroutines.
+    Clients for many users should share one session from create_session(); each
+    client additionally caps its own in-flight requests at `per_user_limit`.
+    Cancelling a call releases its connection back to the pool.
+    """
+    def __init__(self, access_token: str, session: Optional["aiohttp.ClientSession"] = None,
+                 rate_limiter: Optional[RateLimiter] = None, max_retries: int = 3, per_user_limit: int = 4,
+                 api_base_url: str = DEFAULT_API_BASE_URL, timeouts: Optional[Mapping[str, Timeout]] = None,
+                 breaker: Optional[CircuitBreaker] = None, user_key: Optional[str] = None,
+                 sleep: Callable[[float], Awaitable[None]] = asyncio.sleep):
+        if aiohttp is None:
+            raise ConfigError("AsyncFitbitClient requires aiohttp (pip install aiohttp)")
+        self.access_token = access_token
+        self.api_base_url = api_base_url.rstrip('/')
+        self.base_url = f"{self.api_base_url}/1/user/-"
+        self.host = urlparse(self.api_base_url).netloc
+        self.timeouts = timeouts or {}
+        self.breaker = breaker or circuit_breaker(self.host)
+        self._session = session
+        self._owns_session = session is None
+        self.headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Accept": "application/json"
+        }
+        self.rate_limiter = rate_limiter or RateLimiter()
+        # Same keying as FitbitClient, so sync and async clients can share a RateLimiter
+        self.bucket = self.rate_limiter.bucket(user_key or access_token)
+        self.max_retries = max_retries
+        self.user_limit = asyncio.Semaphore(per_user_limit)
+        self.sleep = sleep
+
+    @property
+    def session(self) -> "aiohttp.ClientSession":
+        if self._session is None:
+            self._session = create_session()
+        return self._session
+
+    async def close(self):
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self) -> "AsyncFitbitClient":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _acquire(self):
+        while True:
+            wait = self.bucket.try_acquire()
+            if wait <= 0:
+                return
+            logger.warning(f"Rate limit budget exhausted, waiting {wait:.1f}s for quota reset")
+            await self.sleep(wait)
+
+    async def _get(self, url: str, endpoint: str = "other", **json_kwargs) -> Dict[str, Any]:
+        """
+        Async version of FitbitClient._get: budgeted GET with jittered retries of 429/5xx.
+        """
+        attempt = 0
+        while True:
+            self.breaker.allow()
+            connect, read = timeout_for(endpoint, self.timeouts)
+            async with self.user_limit:
+                await self._acquire()
+                started = time.perf_counter()
+                try:
+                    async with self.session.get(url, headers=self.headers,
+                                                timeout=aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)) as response:
+                        body = await response.read()
+                        status = response.status
+                        headers = response.headers
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    self.breaker.record_failure()
+                    metrics.REQUESTS.inc(endpoint=endpoint, status="error")
+                    raise
+            elapsed = time.perf_counter() - started
+            if status >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            metrics.REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+            metrics.REQUEST_LATENCY.observe(elapsed, host=self.host, endpoint=endpoint)
+            metrics.REQUESTS.inc(endpoint=endpoint, status=str(status))
+            metrics.RESPONSE_BYTES.inc(len(body), endpoint=endpoint)
+            self.bucket.update(headers)
+
+            if status not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                if status != 200:
+                    text = body.decode(errors="replace")
+                    logger.error(f"API Error ({status}): {text}")
+                    raise FitbitAPIError(f"API Error: {text}", status_code=status)
+                return json.loads(body, **json_kwargs)
+
+            if status == 429:
+                self.bucket.exhaust(parse_header_number(headers.get("Retry-After")))
+            metrics.RETRIES.inc(endpoint=endpoint, reason=str(status))
+            delay = backoff_delay(attempt)
+            logger.warning(f"Retryable API response ({status}), retrying in {delay:.2f}s")
+            await self.sleep(delay)
+            attempt += 1
+
+    async def get_daily_steps(self, date_str: str = "today") -> int:
+        url = f"{self.base_url}/activities/date/{date_str}.json"
+        data = await self._get(url, endpoint="daily_summary")
+        return int(data.get("summary", {}).get("steps", 0))
+
+    async def get_step_time_series(self, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        url = f"{self.base_url}/activities/steps/date/{start_date}/{end_date}.json"
+        data = await self._get(url, endpoint="steps_time_series")
+        return data.get("activities-steps", [])
+
+    async def get_step_series(self, start_date: str, end_date: str, into: Optional[StepSeries] = None) -> StepSeries:
+        url = f"{self.base_url}/activities/steps/date/{start_date}/{end_date}.json"
+        series = into if into is not None else StepSeries.for_range(date.fromisoformat(start_date),
+                                                                    date.fromisoformat(end_date))
+        await self._get(url, endpoint="steps_time_series", object_hook=series_hook(series))
+        return series
+
+    async def get_time_series(self, resource: str, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        spec = RESOURCES.get(resource)
+        if spec is None:
+            raise ValueError(f"Unknown resource: {resource}")
+        url = f"{self.api_base_url}/{spec.path.format(start=start_date, end=end_date)}"
+        data = await self._get(url, endpoint=f"{resource}_time_series")
+        by_date: Dict[str, float] = {}
+        for entry in data.get(spec.key, []):
+            value = spec.value(entry)
+            if value is not None:
+                by_date[entry[spec.date_field]] = by_date.get(entry[spec.date_field], 0) + value
+        return [{"dateTime": day, "value": value} for day, value in sorted(by_date.items())]
+
+    async def get_intraday_steps(self, date_str: str = "today") -> array:
+        url = f"{self.base_url}/activities/steps/date/{date_str}/1d/1min.json"
+        minutes = new_minute_array()
+        await self._get(url, endpoint="steps_intraday", object_hook=minute_hook(minutes))
+        return minutes
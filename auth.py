@@ -1,5 +1,7 @@
+import os
 import json
 import time
+import tempfile
 import requests
 import webbrowser
 import logging
@@ -11,6 +13,8 @@ from typing import Optional, Dict, Any
 
 from config import Settings
 from exceptions import FitbitAuthError
+from resilience import timeout_for
+import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -32,12 +36,28 @@ class OAuthHandler(BaseHTTPRequestHandler):
         # Suppress default server logging
         pass
 
+def token_user_id(token_file: Path, default: str = "-") -> str:
+    """
+    The Fitbit user ID saved with a token (the `user_id` field of the token response), or `default`.
+    Local stores are keyed by it so every entry point shares one entry per Fitbit user.
+    """
+    try:
+        with open(token_file, "r") as f:
+            return json.load(f).get("user_id") or default
+    except (OSError, json.JSONDecodeError):
+        return default
+
 class FitbitAuth:
-    def __init__(self, settings: Settings):
+    def __init__(self, settings: Settings, interactive: bool = True):
         self.settings = settings
+        # Non-interactive callers (batch runs) get an error instead of a browser prompt
+        self.interactive = interactive
+        # Full token payload from the last save, so callers can keep it in memory
+        self.token_data: Optional[Dict[str, Any]] = None
         self.auth_url = "https://www.fitbit.com/oauth2/authorize"
         self.token_url = "https://api.fitbit.com/oauth2/token"
-        self.scope = "activity profile"
+        # heartrate and sleep back the resting_heart_rate and sleep_minutes metrics
+        self.scope = "activity heartrate sleep profile"
 
     def get_token(self) -> str:
         if self.settings.token_file.exists():
@@ -56,6 +76,9 @@ class FitbitAuth:
         return self.authorize()
 
     def authorize(self) -> str:
+        if not self.interactive:
+            raise FitbitAuthError(f"No valid token in {self.settings.token_file} and interactive authorization is disabled.")
+
         # Start local server to listen for callback
         server = HTTPServer(('localhost', 8080), OAuthHandler)
         server.auth_code = None
@@ -87,8 +110,10 @@ class FitbitAuth:
         }
         auth_header = requests.auth.HTTPBasicAuth(self.settings.client_id, self.settings.client_secret)
         
+        response = None
         try:
-            response = requests.post(self.token_url, data=data, auth=auth_header)
+            response = requests.post(self.token_url, data=data, auth=auth_header,
+                                     timeout=timeout_for("oauth_token", self.settings.timeouts))
             response.raise_for_status()
             return self.save_token(response.json())
         except requests.RequestException as e:
@@ -105,23 +130,38 @@ class FitbitAuth:
         auth_header = requests.auth.HTTPBasicAuth(self.settings.client_id, self.settings.client_secret)
         
         try:
-            response = requests.post(self.token_url, data=data, auth=auth_header)
+            response = requests.post(self.token_url, data=data, auth=auth_header,
+                                     timeout=timeout_for("oauth_token", self.settings.timeouts))
             
             if response.status_code != 200:
                 logger.warning(f"Failed to refresh token: {response.text}")
+                metrics.TOKEN_REFRESHES.inc(result="failure")
                 return self.authorize()
 
+            metrics.TOKEN_REFRESHES.inc(result="success")
             return self.save_token(response.json())
         except requests.RequestException as e:
             logger.error(f"Error during token refresh: {e}")
+            metrics.TOKEN_REFRESHES.inc(result="failure")
             return self.authorize()
 
     def save_token(self, token_response: Dict[str, Any]) -> str:
         # Calculate expiry time
         token_response["expires_at"] = time.time() + token_response["expires_in"]
         
-        with open(self.settings.token_file, "w") as f:
-            json.dump(token_response, f)
+        # Write to a temp file and rename so readers never see a partial token file
+        token_file = Path(self.settings.token_file)
+        fd, tmp_path = tempfile.mkstemp(dir=token_file.parent, prefix=f".{token_file.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(token_response, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, token_file)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
         
+        self.token_data = token_response
         logger.info("Token saved successfully.")
         return token_response["access_token"]
@@ -0,0 +1,92 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import logging
+from typing import Dict, Any, List, Tuple
+
+from api_client import FitbitClient
+from exceptions import BackfillError
+
+logger = logging.getLogger(__name__)
+
+# Longest range Fitbit accepts for a single activity time series request
+MAX_RANGE_DAYS = 1095
+
+Chunk = Tuple[date, date]
+
+def plan_chunks(start: date, end: date, max_days: int = MAX_RANGE_DAYS) -> List[Chunk]:
+    """
+    Splits [start, end] into consecutive inclusive ranges of at most max_days days.
+    """
+    if max_days < 1:
+        raise ValueError("max_days must be at least 1")
+    chunks = []
+    while start <= end:
+        chunk_end = min(start + timedelta(days=max_days - 1), end)
+        chunks.append((start, chunk_end))
+        start = chunk_end + timedelta(days=1)
+    return chunks
+
+class Backfill:
+    """
+    Fetches a long step history as parallel chunked requests over the client's session pool.
+    Completed chunks are kept on the instance, so calling run() again after a
+    BackfillError only re-fetches the chunks that failed.
+    """
+    def __init__(self, client: FitbitClient, start: date, end: date,
+                 chunk_days: int = MAX_RANGE_DAYS, max_workers: int = 4):
+        self.client = client
+        self.chunks = plan_chunks(start, end, chunk_days)
+        self.max_workers = max_workers
+        self.completed: Dict[Chunk, List[Dict[str, Any]]] = {}
+
+    @property
+    def pending(self) -> List[Chunk]:
+        return [chunk for chunk in self.chunks if chunk not in self.completed]
+
+    def _fetch(self, chunk: Chunk) -> List[Dict[str, Any]]:
+        start, end = chunk
+        return self.client.get_step_time_series(start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+
+    def run(self) -> List[Dict[str, Any]]:
+        """
+        Fetches all pending chunks and returns the merged, date-ordered series.
+        """
+        pending = self.pending
+        logger.info(f"Backfilling {len(pending)} of {len(self.chunks)} chunks with {self.max_workers} workers...")
+
+        failed = []
+        last_error = None
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {chunk: executor.submit(self._fetch, chunk) for chunk in pending}
+            for chunk, future in futures.items():
+                try:
+                    self.completed[chunk] = future.result()
+                except Exception as e:
+                    logger.warning(f"Backfill chunk {chunk[0]}..{chunk[1]} failed: {e}")
+                    failed.append(chunk)
+                    last_error = e
+
+        if failed:
+            raise BackfillError(
+                f"{len(failed)} of {len(self.chunks)} backfill chunks failed: {last_error}",
+                failed_chunks=failed,
+                status_code=getattr(last_error, "status_code", None)
+            )
+        return self.merge()
+
+    def merge(self) -> List[Dict[str, Any]]:
+        """
+        Concatenates completed chunks in date order, keeping the first entry for each date
+        and dropping anything outside the backfill window.
+        """
+        first = self.chunks[0][0].strftime("%Y-%m-%d") if self.chunks else ""
+        last = self.chunks[-1][1].strftime("%Y-%m-%d") if self.chunks else ""
+        seen = set()
+        merged = []
+        for chunk in self.chunks:
+            for entry in self.completed.get(chunk, []):
+                if first <= entry["dateTime"] <= last and entry["dateTime"] not in seen:
+                    seen.add(entry["dateTime"])
+                    merged.append(entry)
+        merged.sort(key=lambda entry: entry["dateTime"])
+        return merged
@@ -0,0 +1,197 @@
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Union
+
+from config import Settings
+from exceptions import ConfigError
+from auth import token_user_id
+from token_manager import TokenManager
+from api_client import FitbitClient
+from cache import StepCache, CachedFitbitClient
+from rate_limit import RateLimiter
+from stats import calculate_stats, calculate_stats_async
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class UserResult:
+    user_id: str
+    token_file: Path
+    stats: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+@dataclass
+class BatchReport:
+    results: List[UserResult]
+    elapsed: float
+
+    @property
+    def succeeded(self) -> int:
+        return sum(1 for r in self.results if r.ok)
+
+    @property
+    def failed(self) -> int:
+        return len(self.results) - self.succeeded
+
+    @property
+    def throughput(self) -> float:
+        """
+        Users processed per second of wall-clock time.
+        """
+        return len(self.results) / self.elapsed if self.elapsed > 0 else 0.0
+
+def discover_token_files(source: Union[str, Path]) -> List[Path]:
+    """
+    Resolves a batch source into token files.
+    A directory yields every *.json file in it; any other file is read as a
+    manifest with one token path per line (relative to the manifest, '#' comments allowed).
+    """
+    source = Path(source)
+    if source.is_dir():
+        return sorted(source.glob("*.json"))
+
+    paths = []
+    with open(source, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path = Path(line)
+            paths.append(path if path.is_absolute() else source.parent / path)
+    return paths
+
+def assign_user_ids(token_files: List[Path]) -> Dict[Path, str]:
+    """
+    Gives every token file a unique user id: its path relative to the directory that
+    contains all of them, without the .json suffix ("alice" for tokens/alice.json,
+    "alice/token" for tokens/alice/token.json). Raises ConfigError if the same file is
+    listed twice or two files would get the same id.
+    """
+    if not token_files:
+        return {}
+    resolved = [Path(path).resolve() for path in token_files]
+    base = os.path.commonpath([str(full.parent) for full in resolved])
+    ids: Dict[Path, str] = {}
+    seen: Dict[str, Path] = {}
+    for path, full in zip(token_files, resolved):
+        relative = full.relative_to(base)
+        user_id = (relative.with_suffix("") if relative.suffix == ".json" else relative).as_posix()
+        if user_id in seen:
+            if seen[user_id] == full:
+                raise ConfigError(f"Token file {full} is listed more than once")
+            raise ConfigError(f"Token files {seen[user_id]} and {full} both map to user id {user_id!r}")
+        seen[user_id] = full
+        ids[path] = user_id
+    return ids
+
+def process_user(tokens: TokenManager, token_file: Path, cache: Optional[StepCache] = None,
+                 user_id: Optional[str] = None, rate_limiter: Optional[RateLimiter] = None) -> UserResult:
+    """
+    Computes stats for a single user. Never raises; failures are captured in the result.
+    `user_id` labels the result (see assign_user_ids; the file stem by default).
+    """
+    user_id = user_id or token_file.stem
+    result = UserResult(user_id=user_id, token_file=token_file)
+    started = time.perf_counter()
+    try:
+        token = tokens.get_token(token_file)
+        # Quota and cache entries belong to the Fitbit user, like the webhook's refetches
+        owner_id = token_user_id(token_file, default="")
+
+        client = FitbitClient.from_settings(token, tokens.settings, rate_limiter=rate_limiter,
+                                            user_key=owner_id or str(token_file))
+        if cache is not None:
+            client = CachedFitbitClient(client, cache, user_id=owner_id or user_id)
+
+        result.stats = calculate_stats(client)
+    except Exception as e:
+        logger.warning(f"User {user_id} failed: {e}")
+        result.error = str(e) or e.__class__.__name__
+    result.elapsed = time.perf_counter() - started
+    return result
+
+def run_batch(settings: Settings, token_files: List[Path], max_workers: int = 8) -> BatchReport:
+    """
+    Runs calculate_stats for every token file on a bounded worker pool.
+    """
+    user_ids = assign_user_ids(token_files)
+    cache = StepCache(settings.cache_file) if settings.cache_file else None
+    # A batch run must never fall back to the browser flow
+    tokens = TokenManager(settings, interactive=False, background=False)
+    rate_limiter = RateLimiter()
+    results: List[UserResult] = []
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(process_user, tokens, path, cache, user_ids[path], rate_limiter)
+                       for path in token_files]
+            for future in as_completed(futures):
+                result = future.result()
+                status = "ok" if result.ok else f"FAILED ({result.error})"
+                logger.info(f"[{len(results) + 1}/{len(token_files)}] {result.user_id}: {status}")
+                results.append(result)
+    finally:
+        tokens.close()
+        if cache is not None:
+            cache.close()
+
+    results.sort(key=lambda r: r.user_id)
+    return BatchReport(results=results, elapsed=time.perf_counter() - started)
+
+async def process_user_async(tokens: TokenManager, token_file: Path, session, limit: asyncio.Semaphore,
+                             user_id: Optional[str] = None,
+                             rate_limiter: Optional[RateLimiter] = None) -> UserResult:
+    """
+    Async counterpart of process_user; the token file is read on a worker thread.
+    """
+    from async_client import AsyncFitbitClient
+
+    user_id = user_id or token_file.stem
+    result = UserResult(user_id=user_id, token_file=token_file)
+    async with limit:
+        started = time.perf_counter()
+        try:
+            token = await asyncio.to_thread(tokens.get_token, token_file)
+            owner_id = await asyncio.to_thread(token_user_id, token_file, "")
+            client = AsyncFitbitClient(token, session=session, api_base_url=tokens.settings.api_base_url,
+                                       timeouts=tokens.settings.timeouts, rate_limiter=rate_limiter,
+                                       user_key=owner_id or str(token_file))
+            result.stats = await calculate_stats_async(client)
+        except Exception as e:
+            logger.warning(f"User {user_id} failed: {e}")
+            result.error = str(e) or e.__class__.__name__
+        result.elapsed = time.perf_counter() - started
+    return result
+
+async def run_batch_async(settings: Settings, token_files: List[Path], max_users: int = 100) -> BatchReport:
+    """
+    Runs calculate_stats_async for every token file on one event loop and one pooled session,
+    with at most `max_users` users in flight. Requires aiohttp; the step cache is not used.
+    """
+    from async_client import create_session
+
+    user_ids = assign_user_ids(token_files)
+    tokens = TokenManager(settings, interactive=False, background=False)
+    rate_limiter = RateLimiter()
+    limit = asyncio.Semaphore(max_users)
+    started = time.perf_counter()
+    session = create_session(limit=max_users)
+    try:
+        results = await asyncio.gather(*(process_user_async(tokens, path, session, limit, user_ids[path], rate_limiter)
+                                         for path in token_files))
+    finally:
+        await session.close()
+        tokens.close()
+
+    results = sorted(results, key=lambda r: r.user_id)
+    return BatchReport(results=results, elapsed=time.perf_counter() - started)
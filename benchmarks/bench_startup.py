@@ -0,0 +1,82 @@
+"""
+Startup-time benchmark for the cached CLI path.
+
+Runs `python main.py --cached` against a throwaway snapshot and reports the
+median wall-clock time. Exits non-zero when the median exceeds --max-ms or
+when the fast path imports a heavy module, so it can guard CI against
+regressions:
+
+    python benchmarks/bench_startup.py --runs 20 --max-ms 150
+"""
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ("requests", "pydantic", "pydantic_settings", "pandas", "numpy")
+
+def write_snapshot(path: Path):
+    stats = {"today_steps": 1234, "weekly_avg": 5678.0, "monthly_avg": 4321.0,
+             "days_counted_weekly": 7, "days_counted_monthly": 30}
+    path.write_text(json.dumps({"saved_at": time.time(), "stats": stats}))
+
+def time_cached_run(snapshot: Path) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, str(ROOT / "main.py"), "--cached", "--snapshot", str(snapshot)],
+                   cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+def heavy_modules_loaded(snapshot: Path, flag: str = "--cached") -> list:
+    code = (
+        "import sys, main\n"
+        f"main.main([{flag!r}, '--snapshot', {str(snapshot)!r}])\n"
+        f"print('HEAVY:' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True,
+                         capture_output=True, text=True).stdout.splitlines()
+    line = next(l for l in reversed(out) if l.startswith("HEAVY:"))
+    return [m for m in line[len("HEAVY:"):].split(",") if m]
+
+def python_baseline() -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if the median exceeds this")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = Path(tmp) / "snapshot.json"
+        write_snapshot(snapshot)
+
+        heavy = heavy_modules_loaded(snapshot)
+        timings = [time_cached_run(snapshot) for _ in range(args.runs)]
+        baseline = statistics.median(python_baseline() for _ in range(args.runs))
+
+    median_ms = statistics.median(timings) * 1000
+    result = {
+        "runs": args.runs,
+        "median_ms": round(median_ms, 2),
+        "min_ms": round(min(timings) * 1000, 2),
+        "interpreter_ms": round(baseline * 1000, 2),
+        "heavy_modules": heavy,
+    }
+    print(json.dumps(result, indent=2))
+
+    if heavy:
+        print(f"FAIL: cached path imported {', '.join(heavy)}", file=sys.stderr)
+        sys.exit(1)
+    if args.max_ms is not None and median_ms > args.max_ms:
+        print(f"FAIL: median {median_ms:.1f}ms exceeds {args.max_ms}ms", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
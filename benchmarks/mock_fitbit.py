@@ -0,0 +1,219 @@
+"""
+Local stand-in for the Fitbit Web API used by the benchmarks and integration tests.
+
+Serves the endpoints FitbitClient uses with deterministic data and lets a
+benchmark inject per-request latency, periodic 429 responses and padded
+(large) payloads. send_notifications() plays Fitbit's side of the
+subscription API against a webhook receiver.
+"""
+import re
+import json
+import time
+import threading
+import urllib.error
+import urllib.request
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from webhook import SIGNATURE_HEADER, sign
+
+DAILY_RE = re.compile(r"^/1/user/-/activities/date/(\d{4}-\d{2}-\d{2})\.json$")
+SERIES_RE = re.compile(r"^/1/user/-/activities/(\w+)/date/(\d{4}-\d{2}-\d{2})/(\d{4}-\d{2}-\d{2})\.json$")
+SLEEP_RE = re.compile(r"^/1\.2/user/-/sleep/date/(\d{4}-\d{2}-\d{2})/(\d{4}-\d{2}-\d{2})\.json$")
+SUBSCRIPTION_RE = re.compile(r"^/1/user/-/(\w+)/apiSubscriptions/([\w-]+)\.json$")
+INTRADAY_RE = re.compile(r"^/1/user/-/activities/steps/date/(\d{4}-\d{2}-\d{2})/1d/1min\.json$")
+
+def steps_for(day: date) -> int:
+    """
+    Deterministic daily total so benchmarks and tests can check results.
+    """
+    return 1000 + (day.toordinal() % 7) * 1000
+
+def value_for(resource: str, day: date):
+    """
+    Deterministic daily value of any other activity resource, derived from steps_for.
+    """
+    if resource == "steps":
+        return steps_for(day)
+    if resource == "distance":
+        return round(steps_for(day) * 0.0008, 2)
+    if resource == "heart":
+        return {"restingHeartRate": 60 + day.toordinal() % 5, "heartRateZones": []}
+    return steps_for(day) // 100
+
+def _days(start: date, end: date):
+    while start <= end:
+        yield start
+        start += timedelta(days=1)
+
+class MockFitbitHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; avoid delayed-ACK stalls on keep-alive
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        count = server.next_request()
+        if server.slow_every and count % server.slow_every == 0:
+            time.sleep(server.slow_latency)
+        elif server.latency:
+            time.sleep(server.latency)
+
+        if server.rate_limit_every and count % server.rate_limit_every == 0:
+            server.throttled += 1
+            self._send(429, {"errors": [{"errorType": "rate_limit"}]}, {"Retry-After": "0"})
+            return
+
+        path = self.path.split("?", 1)[0]
+        match = DAILY_RE.match(path)
+        if match:
+            day = date.fromisoformat(match.group(1))
+            self._send(200, {"summary": {"steps": steps_for(day)}})
+            return
+
+        match = INTRADAY_RE.match(path)
+        if match:
+            day = date.fromisoformat(match.group(1))
+            total = steps_for(day)
+            per_minute, remainder = divmod(total, 1440)
+            dataset = [{"time": f"{m // 60:02d}:{m % 60:02d}:00", "value": per_minute + (remainder if m == 0 else 0)}
+                       for m in range(1440)]
+            self._send(200, {
+                "activities-steps": [{"dateTime": day.isoformat(), "value": str(total)}],
+                "activities-steps-intraday": {"dataset": dataset, "datasetInterval": 1, "datasetType": "minute"},
+            })
+            return
+
+        match = SERIES_RE.match(path)
+        if match:
+            resource = match.group(1)
+            start = date.fromisoformat(match.group(2))
+            end = date.fromisoformat(match.group(3))
+            series = []
+            for day in _days(start, end):
+                value = value_for(resource, day)
+                series.append({"dateTime": day.isoformat(), "value": value if isinstance(value, dict) else str(value)})
+            self._send(200, {f"activities-{resource}": series})
+            return
+
+        match = SLEEP_RE.match(path)
+        if match:
+            start = date.fromisoformat(match.group(1))
+            end = date.fromisoformat(match.group(2))
+            # A main sleep plus a nap every day
+            sleep = []
+            for day in _days(start, end):
+                sleep.append({"dateOfSleep": day.isoformat(), "minutesAsleep": 400, "isMainSleep": True})
+                sleep.append({"dateOfSleep": day.isoformat(), "minutesAsleep": 20, "isMainSleep": False})
+            self._send(200, {"sleep": sleep})
+            return
+
+        self._send(404, {"errors": [{"errorType": "not_found", "message": path}]})
+
+    def do_POST(self):
+        self.server.next_request()
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        match = SUBSCRIPTION_RE.match(self.path.split("?", 1)[0])
+        if match:
+            collection, subscription_id = match.groups()
+            self._send(201, {"collectionType": collection, "ownerId": "MOCK", "ownerType": "user",
+                             "subscriberId": "1", "subscriptionId": subscription_id})
+            return
+        self._send(404, {"errors": [{"errorType": "not_found", "message": self.path}]})
+
+    def _send(self, status: int, payload: dict, headers: Optional[dict] = None):
+        if self.server.pad_bytes:
+            payload["padding"] = "x" * self.server.pad_bytes
+        body = json.dumps(payload).encode()
+        self.server.bytes_sent += len(body)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        # Generous quota so the client's budget never stalls a benchmark
+        self.send_header("Fitbit-Rate-Limit-Limit", "1000000")
+        self.send_header("Fitbit-Rate-Limit-Remaining", "999999")
+        self.send_header("Fitbit-Rate-Limit-Reset", "3600")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Suppress default server logging
+        pass
+
+class MockFitbitServer(ThreadingHTTPServer):
+    """
+    Threaded mock API on localhost. Use as a context manager; `url` is the api_base_url.
+    """
+    daemon_threads = True
+    # Batch benchmarks open many connections at once; the default backlog of 5 drops SYNs
+    request_queue_size = 128
+
+    def __init__(self, latency: float = 0.0, rate_limit_every: int = 0, pad_bytes: int = 0, port: int = 0,
+                 slow_every: int = 0, slow_latency: float = 0.0):
+        super().__init__(("127.0.0.1", port), MockFitbitHandler)
+        self.latency = latency
+        # Every Nth GET takes `slow_latency` instead (0 disables), to produce a latency tail
+        self.slow_every = slow_every
+        self.slow_latency = slow_latency
+        # Every Nth request gets a 429 (0 disables)
+        self.rate_limit_every = rate_limit_every
+        self.pad_bytes = pad_bytes
+        self.requests = 0
+        self.throttled = 0
+        self.bytes_sent = 0
+        self._count_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def next_request(self) -> int:
+        with self._count_lock:
+            self.requests += 1
+            return self.requests
+
+    def start(self) -> "MockFitbitServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "MockFitbitServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def send_notifications(url: str, notifications: List[Dict[str, str]], client_secret: str,
+                       signature: Optional[str] = None) -> int:
+    """
+    POSTs a signed notification batch to a webhook receiver the way Fitbit does and returns the HTTP status.
+    Pass `signature` to send a specific (e.g. forged) signature instead.
+    """
+    body = json.dumps(notifications).encode()
+    request = urllib.request.Request(url, data=body, method="POST", headers={
+        "Content-Type": "application/json",
+        SIGNATURE_HEADER: signature if signature is not None else sign(body, client_secret),
+    })
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+def verify_subscriber(url: str, code: str) -> int:
+    """
+    Sends Fitbit's subscriber verification request and returns the HTTP status.
+    """
+    try:
+        with urllib.request.urlopen(f"{url}?verify={code}", timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
@@ -0,0 +1,190 @@
+"""
+End-to-end benchmark suite against a local mock Fitbit server.
+
+Measures calculate_stats latency (with and without injected latency/429s),
+FitbitClient requests per second, batch throughput and multi-year backfill
+time. Results are written as JSON; a previous result file can be passed as a
+baseline to fail the run on regressions:
+
+    python -m benchmarks.run_benchmarks --output bench.json
+    python -m benchmarks.run_benchmarks --baseline bench.json --tolerance 0.25
+"""
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Any, Callable, List
+
+from config import Settings
+from api_client import FitbitClient
+from backfill import Backfill
+from rate_limit import RateLimiter
+from batch import run_batch
+from stats import calculate_stats
+from benchmarks.mock_fitbit import MockFitbitServer
+
+# Metrics where a larger value is better; everything else is a duration
+HIGHER_IS_BETTER = ("rps", "users_per_s")
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def _timed(fn: Callable[[], Any], iterations: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "p50_ms": round(_percentile(samples, 50), 3),
+        "p95_ms": round(_percentile(samples, 95), 3),
+        "p99_ms": round(_percentile(samples, 99), 3),
+        "mean_ms": round(statistics.mean(samples), 3),
+    }
+
+def bench_stats_latency(latency: float, iterations: int, rate_limit_every: int = 0,
+                        backoff: float = 0.01) -> Dict[str, float]:
+    retries = []
+
+    def sleep(delay: float):
+        # A fixed pause instead of the jittered backoff, so runs stay comparable
+        retries.append(delay)
+        time.sleep(backoff)
+
+    with MockFitbitServer(latency=latency, rate_limit_every=rate_limit_every) as server:
+        client = FitbitClient("bench-token", api_base_url=server.url, rate_limiter=RateLimiter(sleep=sleep))
+        result = _timed(lambda: calculate_stats(client), iterations)
+        result["requests"] = server.requests
+        result["throttled"] = server.throttled
+        result["retries"] = len(retries)
+        return result
+
+def bench_tail_latency(iterations: int, hedge_percentile: float = None) -> Dict[str, float]:
+    """
+    Daily-summary latency when one GET in 20 stalls for 300 ms, with or without hedging.
+    """
+    with MockFitbitServer(latency=0.005, slow_every=20, slow_latency=0.3) as server:
+        client = FitbitClient("bench-token", api_base_url=server.url, hedge_percentile=hedge_percentile,
+                              rate_limiter=RateLimiter(limit=1_000_000))
+        # Learn the endpoint's latency distribution before measuring
+        for _ in range(40):
+            client.get_daily_steps("2024-01-01")
+        result = _timed(lambda: client.get_daily_steps("2024-01-01"), iterations)
+        result["requests"] = server.requests
+        return result
+
+def bench_client_rps(threads: int, total_requests: int, pad_bytes: int = 0) -> Dict[str, float]:
+    with MockFitbitServer(pad_bytes=pad_bytes) as server:
+        client = FitbitClient("bench-token", api_base_url=server.url, pool_size=threads)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(lambda _: client.get_daily_steps("2024-01-01"), range(total_requests)))
+        elapsed = time.perf_counter() - started
+        return {
+            "rps": round(total_requests / elapsed, 1),
+            "mb_received": round(server.bytes_sent / 1e6, 2),
+        }
+
+def bench_batch(users: int, workers: int, latency: float) -> Dict[str, float]:
+    with MockFitbitServer(latency=latency) as server, tempfile.TemporaryDirectory() as tmp:
+        token_files = []
+        for i in range(users):
+            path = Path(tmp) / f"user{i:05d}.json"
+            path.write_text(json.dumps({"access_token": f"token-{i}", "refresh_token": "r",
+                                        "expires_at": time.time() + 3600 * 8}))
+            token_files.append(path)
+        settings = Settings(client_id="bench", client_secret="bench", api_base_url=server.url, cache_file=None)
+        report = run_batch(settings, token_files, max_workers=workers)
+        if report.failed:
+            raise RuntimeError(f"{report.failed} batch users failed: {report.results[0].error}")
+        return {"users_per_s": round(report.throughput, 1), "elapsed_s": round(report.elapsed, 3)}
+
+def bench_backfill(years: int, chunk_days: int, workers: int, latency: float) -> Dict[str, float]:
+    with MockFitbitServer(latency=latency) as server:
+        client = FitbitClient("bench-token", api_base_url=server.url, pool_size=workers)
+        end = date(2024, 12, 31)
+        start = end - timedelta(days=365 * years - 1)
+        started = time.perf_counter()
+        series = Backfill(client, start, end, chunk_days=chunk_days, max_workers=workers).run()
+        elapsed = time.perf_counter() - started
+        if len(series) != 365 * years:
+            raise RuntimeError(f"Backfill returned {len(series)} days")
+        return {"elapsed_s": round(elapsed, 3), "requests": server.requests}
+
+def run_all(quick: bool) -> Dict[str, Dict[str, float]]:
+    scale = 0.2 if quick else 1.0
+    return {
+        "stats_latency": bench_stats_latency(latency=0.0, iterations=int(200 * scale)),
+        "stats_latency_20ms": bench_stats_latency(latency=0.02, iterations=int(50 * scale)),
+        "stats_latency_429": bench_stats_latency(latency=0.0, iterations=int(20 * scale), rate_limit_every=4),
+        "tail_latency": bench_tail_latency(iterations=int(200 * scale)),
+        "tail_latency_hedged": bench_tail_latency(iterations=int(200 * scale), hedge_percentile=0.9),
+        "client_rps": bench_client_rps(threads=8, total_requests=int(2000 * scale)),
+        "client_rps_large_payload": bench_client_rps(threads=8, total_requests=int(500 * scale), pad_bytes=256_000),
+        "batch": bench_batch(users=int(500 * scale), workers=32, latency=0.01),
+        "backfill_3y": bench_backfill(years=3, chunk_days=90, workers=8, latency=0.02),
+    }
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """
+    Returns human-readable regressions beyond `tolerance` (a fraction) relative to the baseline.
+    Only timing and throughput metrics are compared; counters are informational.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            base = baseline.get(name, {}).get(metric)
+            if not base:
+                continue
+            if metric in HIGHER_IS_BETTER:
+                if value < base * (1 - tolerance):
+                    regressions.append(f"{name}.{metric}: {value} < baseline {base}")
+            elif metric.endswith(("_ms", "_s")):
+                if value > base * (1 + tolerance):
+                    regressions.append(f"{name}.{metric}: {value} > baseline {base}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="bench_results.json", help="Where to write results (default: bench_results.json)")
+    parser.add_argument("--baseline", help="Previous results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression (default: 0.25)")
+    parser.add_argument("--quick", action="store_true", help="Run a reduced workload")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    results = run_all(args.quick)
+    document = {
+        "created_at": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(document, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Performance regressions:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} of {args.baseline}")
+
+if __name__ == "__main__":
+    main()
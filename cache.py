@@ -0,0 +1,188 @@
+import sqlite3
+import logging
+import threading
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+from api_client import FitbitClient
+from series import StepSeries
+
+logger = logging.getLogger(__name__)
+
+DATE_FORMAT = "%Y-%m-%d"
+
+class StepCache:
+    """
+    SQLite-backed store of daily step totals.
+    Days are keyed by (user_id, ordinal day). A day is marked final once it can
+    no longer change on the Fitbit side, and final days are never fetched again.
+    """
+    def __init__(self, path: Union[str, Path] = "steps_cache.db"):
+        self.path = str(path)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS steps ("
+                " user_id TEXT NOT NULL,"
+                " day INTEGER NOT NULL,"
+                " value INTEGER NOT NULL,"
+                " final INTEGER NOT NULL,"
+                " PRIMARY KEY (user_id, day))"
+            )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def get_range(self, user_id: str, start: date, end: date) -> Dict[int, Tuple[int, bool]]:
+        """
+        Returns {ordinal_day: (value, final)} for every cached day in [start, end].
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT day, value, final FROM steps WHERE user_id = ? AND day BETWEEN ? AND ?",
+                (user_id, start.toordinal(), end.toordinal())
+            ).fetchall()
+        return {day: (value, bool(final)) for day, value, final in rows}
+
+    def missing_bitmap(self, user_id: str, start: date, end: date) -> int:
+        """
+        Returns an integer bitmap over [start, end] where bit i is set when
+        day start + i is absent from the cache or not yet final.
+        """
+        days = end.toordinal() - start.toordinal() + 1
+        bitmap = (1 << days) - 1 if days > 0 else 0
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT day FROM steps WHERE user_id = ? AND final = 1 AND day BETWEEN ? AND ?",
+                (user_id, start.toordinal(), end.toordinal())
+            ).fetchall()
+        base = start.toordinal()
+        for (day,) in rows:
+            bitmap &= ~(1 << (day - base))
+        return bitmap
+
+    def store(self, user_id: str, values: Dict[int, int], final_before: int):
+        """
+        Upserts {ordinal_day: value}. Days strictly before final_before are marked final.
+        """
+        rows = [(user_id, day, value, int(day < final_before)) for day, value in values.items()]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO steps (user_id, day, value, final) VALUES (?, ?, ?, ?)",
+                rows
+            )
+
+    def invalidate(self, user_id: str, days: List[date]):
+        """
+        Clears the final flag of `days` so the next read refetches them.
+        """
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE steps SET final = 0 WHERE user_id = ? AND day = ?",
+                [(user_id, day.toordinal()) for day in days]
+            )
+
+def bitmap_runs(bitmap: int, base: int) -> List[Tuple[int, int]]:
+    """
+    Splits a day bitmap into contiguous (first_ordinal, last_ordinal) runs of set bits.
+    """
+    runs = []
+    offset = 0
+    while bitmap:
+        # Skip the unset bits, then measure the run of set bits
+        skip = (bitmap & -bitmap).bit_length() - 1
+        bitmap >>= skip
+        offset += skip
+        length = (~bitmap & (bitmap + 1)).bit_length() - 1
+        runs.append((base + offset, base + offset + length - 1))
+        bitmap >>= length
+        offset += length
+    return runs
+
+class CachedFitbitClient:
+    """
+    Drop-in wrapper around FitbitClient that serves finalized days from a StepCache
+    and only calls the API for days that are missing or still open.
+    """
+    def __init__(self, client: FitbitClient, cache: StepCache, user_id: str = "-", open_days: int = 2):
+        self.client = client
+        self.cache = cache
+        self.user_id = user_id
+        # Today and yesterday can still be synced from the device, so they stay open
+        self.open_days = open_days
+
+    def _final_before(self) -> int:
+        return datetime.now().date().toordinal() - self.open_days + 1
+
+    @staticmethod
+    def _parse_date(date_str: str) -> Optional[date]:
+        try:
+            return datetime.strptime(date_str, DATE_FORMAT).date()
+        except ValueError:
+            return None
+
+    def get_daily_steps(self, date_str: str = "today") -> int:
+        day = self._parse_date(date_str)
+        if day is None:
+            return self.client.get_daily_steps(date_str)
+
+        cached = self.cache.get_range(self.user_id, day, day).get(day.toordinal())
+        if cached is not None and cached[1]:
+            return cached[0]
+
+        steps = self.client.get_daily_steps(date_str)
+        self.cache.store(self.user_id, {day.toordinal(): steps}, self._final_before())
+        return steps
+
+    def get_time_series(self, resource: str, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        # Only steps are cached; other resources go straight to the API
+        return self.client.get_time_series(resource, start_date, end_date)
+
+    def _sync_range(self, start: date, end: date) -> Dict[int, Tuple[int, bool]]:
+        """
+        Fetches the missing or open days of [start, end] and returns the cached range.
+        """
+        bitmap = self.cache.missing_bitmap(self.user_id, start, end)
+        final_before = self._final_before()
+        for first, last in bitmap_runs(bitmap, start.toordinal()):
+            run_start = date.fromordinal(first).strftime(DATE_FORMAT)
+            run_end = date.fromordinal(last).strftime(DATE_FORMAT)
+            logger.debug(f"Cache miss for {run_start}..{run_end}, fetching from API")
+            entries = self.client.get_step_time_series(run_start, run_end)
+            fetched = {
+                datetime.strptime(entry["dateTime"], DATE_FORMAT).date().toordinal(): int(entry["value"])
+                for entry in entries
+            }
+            self.cache.store(self.user_id, fetched, final_before)
+
+        return self.cache.get_range(self.user_id, start, end)
+
+    def get_step_time_series(self, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        start = self._parse_date(start_date)
+        end = self._parse_date(end_date)
+        if start is None or end is None:
+            return self.client.get_step_time_series(start_date, end_date)
+
+        cached = self._sync_range(start, end)
+        return [
+            {"dateTime": date.fromordinal(day).strftime(DATE_FORMAT), "value": str(value)}
+            for day, (value, _) in sorted(cached.items())
+        ]
+
+    def get_step_series(self, start_date: str, end_date: str, into: Optional[StepSeries] = None) -> StepSeries:
+        start = self._parse_date(start_date)
+        end = self._parse_date(end_date)
+        if start is None or end is None:
+            return self.client.get_step_series(start_date, end_date, into=into)
+
+        series = into if into is not None else StepSeries.for_range(start, end)
+        # Cached days are keyed by ordinal, so they map onto the series without date strings
+        offset = series.start.toordinal()
+        for day, (value, _) in self._sync_range(start, end).items():
+            index = day - offset
+            if 0 <= index < len(series):
+                series.values[index] = value
+        return series
@@ -0,0 +1,97 @@
+from datetime import date
+import logging
+from typing import Dict, Any, List, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def build_matrix(series_by_user: Dict[str, List[Dict[str, Any]]], start: date, end: date) -> Tuple[List[str], np.ndarray]:
+    """
+    Loads many users' daily series into one users x days float matrix covering [start, end].
+    Days without data are 0, matching calculate_stats.
+    """
+    user_ids = sorted(series_by_user)
+    base = start.toordinal()
+    days = end.toordinal() - base + 1
+    matrix = np.zeros((len(user_ids), days), dtype=np.float64)
+
+    for row, user_id in enumerate(user_ids):
+        entries = series_by_user[user_id]
+        if not entries:
+            continue
+        cols = np.fromiter((date.fromisoformat(e["dateTime"]).toordinal() - base for e in entries),
+                           dtype=np.int64, count=len(entries))
+        values = np.fromiter((float(e["value"]) for e in entries), dtype=np.float64, count=len(entries))
+        in_range = (cols >= 0) & (cols < days)
+        matrix[row, cols[in_range]] = values[in_range]
+
+    return user_ids, matrix
+
+def rolling_mean(matrix: np.ndarray, window: int) -> np.ndarray:
+    """
+    Trailing mean over `window` days for every user at once; the first window-1 columns are NaN.
+    """
+    out = np.full(matrix.shape, np.nan)
+    if matrix.shape[1] < window:
+        return out
+    csum = np.cumsum(matrix, axis=1)
+    out[:, window - 1] = csum[:, window - 1]
+    out[:, window:] = csum[:, window:] - csum[:, :-window]
+    out[:, window - 1:] /= window
+    return out
+
+def streaks(matrix: np.ndarray, goal: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (current, longest) runs of consecutive days at or above `goal` per user.
+    The current streak is the run ending on the last day of the matrix.
+    """
+    hits = matrix >= goal
+    count = np.cumsum(hits, axis=1)
+    # At every miss, remember the running count; subtracting the latest one restarts the run
+    last_reset = np.maximum.accumulate(np.where(hits, 0, count), axis=1)
+    runs = count - last_reset
+    return runs[:, -1], runs.max(axis=1)
+
+def cohort_stats(matrix: np.ndarray, goal: float = 10000,
+                 percentiles: Sequence[float] = (25, 50, 75, 90)) -> Dict[str, np.ndarray]:
+    """
+    Computes per-user statistics for a users x days matrix in a single vectorized pass.
+    Weekly/monthly averages cover the last 7/30 columns, like calculate_stats.
+    """
+    if matrix.shape[1] == 0:
+        raise ValueError("Cohort matrix has no days")
+
+    weekly = rolling_mean(matrix, 7)
+    monthly = rolling_mean(matrix, 30)
+    current_streak, longest_streak = streaks(matrix, goal)
+
+    if matrix.shape[1] >= 14:
+        wow_delta = weekly[:, -1] - weekly[:, -8]
+    else:
+        wow_delta = np.full(matrix.shape[0], np.nan)
+
+    return {
+        "weekly_avg": weekly[:, -1],
+        "monthly_avg": monthly[:, -1],
+        "rolling_weekly": weekly,
+        "rolling_monthly": monthly,
+        "median": np.median(matrix, axis=1),
+        "percentiles": np.percentile(matrix, percentiles, axis=1).T,
+        "current_streak": current_streak,
+        "longest_streak": longest_streak,
+        "wow_delta": wow_delta,
+    }
+
+def summary_frame(user_ids: List[str], stats: Dict[str, np.ndarray],
+                  percentiles: Sequence[float] = (25, 50, 75, 90)):
+    """
+    Flattens the per-user scalar statistics into a pandas DataFrame indexed by user.
+    """
+    import pandas as pd
+
+    columns = {name: stats[name] for name in
+               ("weekly_avg", "monthly_avg", "median", "current_streak", "longest_streak", "wow_delta")}
+    for i, p in enumerate(percentiles):
+        columns[f"p{p:g}"] = stats["percentiles"][:, i]
+    return pd.DataFrame(columns, index=pd.Index(user_ids, name="user_id"))
@@ -1,12 +1,21 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
+from functools import lru_cache
 from pathlib import Path
+from typing import Dict, Optional, Tuple
 
 class Settings(BaseSettings):
     client_id: str = Field(..., description="Fitbit Client ID")
     client_secret: str = Field(..., description="Fitbit Client Secret")
     redirect_uri: str = Field("http://localhost:8080", description="Redirect URI for OAuth")
     token_file: Path = Field(default=Path("token.json"), description="Path to store/read token file")
+    api_base_url: str = Field("https://api.fitbit.com", description="Fitbit Web API base URL (override for testing)")
+    cache_file: Optional[Path] = Field(default=Path("steps_cache.db"), description="SQLite step cache (null to disable)")
+    rolling_file: Optional[Path] = Field(None, description="Persisted rolling-window state (enables incremental stats)")
+    intraday_dir: Path = Field(default=Path("intraday_store"), description="Directory of the memory-mapped per-minute store")
+    timeouts: Dict[str, Tuple[float, float]] = Field(default_factory=dict, description="Per-endpoint (connect, read) timeout overrides in seconds; \"default\" applies to all other endpoints")
+    hedge_percentile: Optional[float] = Field(None, ge=0.5, lt=1.0, description="Hedge GETs slower than this latency percentile of their endpoint (e.g. 0.95)")
+    subscriber_verification_code: Optional[str] = Field(None, description="Verification code of the Fitbit subscriber endpoint")
     
     class Config:
         env_file = ".env"
@@ -27,4 +36,9 @@ class Settings(BaseSettings):
         
         return cls(**config_data)
 
-settings = Settings.load()
+@lru_cache(maxsize=None)
+def get_settings(config_path: str = "config.json") -> Settings:
+    """
+    Loads settings on first use instead of at import time, then reuses them.
+    """
+    return Settings.load(config_path)
@@ -0,0 +1,162 @@
+import json
+import time
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+from config import Settings
+from exceptions import FitbitAuthError
+from auth import token_user_id
+from token_manager import TokenManager
+from api_client import FitbitClient
+from cache import StepCache, CachedFitbitClient
+from rate_limit import RateLimiter
+from stats import calculate_stats
+from rolling import RollingAggregator, calculate_rolling_stats
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class StatsHandler(BaseHTTPRequestHandler):
+    # Keep-alive lets dashboards reuse one connection for many queries
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; avoid delayed-ACK stalls on keep-alive
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        # Query strings (e.g. cache busters from dashboards) do not change the route
+        path = urlparse(self.path).path
+        if path in ("/", "/stats"):
+            status, body = self.server.stats_daemon.response()
+        elif path == "/metrics":
+            status, body = 200, metrics.registry.render_prometheus().encode()
+        elif path == "/healthz":
+            status, body = 200, b'{"status": "ok"}'
+        else:
+            status, body = 404, b'{"error": "not found"}'
+        self.send_response(status)
+        content_type = "text/plain; version=0.0.4" if path == "/metrics" else "application/json"
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Suppress default server logging
+        pass
+
+class StatsDaemon:
+    """
+    Long-running process that keeps the session, tokens and last computed stats
+    in memory, recomputes them on a schedule, and serves them as JSON.
+    Requests are answered from a pre-serialized body, so they never touch the Fitbit API.
+    """
+    def __init__(self, settings: Settings, interval: float = 300, host: str = "127.0.0.1", port: int = 8765,
+                 compute: Optional[Callable[[], Dict[str, Any]]] = None):
+        self.settings = settings
+        self.interval = interval
+        self.host = host
+        self.port = port
+        self.tokens: Optional[TokenManager] = None
+        self.cache: Optional[StepCache] = None
+        self.client: Optional[FitbitClient] = None
+        # Outlives the clients, so a token refresh keeps the user's request budget
+        self.rate_limiter = RateLimiter()
+        self.rolling: Optional[RollingAggregator] = None
+        self.compute = compute or self._compute
+        self._response = (503, b'{"error": "stats not computed yet"}')
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    def _compute(self) -> Dict[str, Any]:
+        if self.tokens is None:
+            # Only the first refresh, run in the foreground by start(), may open the browser
+            self.tokens = TokenManager(self.settings, interactive=self._refresher is None)
+        token = self.tokens.get_token()
+
+        user_id = token_user_id(self.settings.token_file)
+
+        # Reuse the client (and its connection pool) until the token changes
+        if self.client is None or self.client.access_token != token:
+            self.client = FitbitClient.from_settings(token, self.settings, rate_limiter=self.rate_limiter,
+                                                     user_key=user_id)
+        client = self.client
+        if self.settings.cache_file:
+            if self.cache is None:
+                self.cache = StepCache(self.settings.cache_file)
+            client = CachedFitbitClient(client, self.cache, user_id=user_id)
+        if self.settings.rolling_file:
+            # Kept in memory between refreshes; each refresh only folds in the days that changed
+            if self.rolling is None:
+                self.rolling = RollingAggregator.load(self.settings.rolling_file)
+            stats = calculate_rolling_stats(client, self.rolling)
+            self.rolling.save(self.settings.rolling_file)
+            return stats
+        return calculate_stats(client)
+
+    def refresh(self):
+        """
+        Recomputes stats and swaps in the new response body.
+        On failure the previous stats keep being served.
+        """
+        try:
+            stats = self.compute()
+        except FitbitAuthError as e:
+            logger.error(f"Stats refresh needs authorization; run main.py once interactively to sign in again: {e}")
+            if self._response[0] != 200:
+                self._response = (503, b'{"error": "authorization required"}')
+            return
+        except Exception as e:
+            logger.error(f"Stats refresh failed: {e}")
+            return
+        payload = {"stats": stats, "updated_at": time.time()}
+        # A single reference assignment, so readers always see a consistent (status, body) pair
+        self._response = (200, json.dumps(payload).encode())
+        logger.info("Stats refreshed.")
+
+    def response(self):
+        return self._response
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.interval):
+            self.refresh()
+
+    def start(self):
+        """
+        Computes the first stats, then starts the refresher thread and the HTTP server thread.
+        """
+        self.refresh()
+        if self.tokens is not None:
+            # From here on refreshes run unattended
+            self.tokens.interactive = False
+        self.server = ThreadingHTTPServer((self.host, self.port), StatsHandler)
+        self.server.daemon_threads = True
+        self.server.stats_daemon = self
+        self.port = self.server.server_address[1]
+
+        self._refresher = threading.Thread(target=self._refresh_loop, daemon=True)
+        self._refresher.start()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        logger.info(f"Serving stats on http://{self.host}:{self.port}/stats (refresh every {self.interval}s)")
+
+    def serve_forever(self):
+        self.start()
+        try:
+            self._stop.wait()
+        except KeyboardInterrupt:
+            logger.info("Shutting down...")
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stop.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        if self.tokens is not None:
+            self.tokens.close()
+        if self.cache is not None:
+            self.cache.close()
@@ -15,3 +15,13 @@ class FitbitAPIError(HealthConnectError):
 class FitbitAuthError(HealthConnectError):
     """Authentication related errors."""
     pass
+
+class BackfillError(FitbitAPIError):
+    """Raised when some chunks of a backfill failed; completed chunks are kept for resuming."""
+    def __init__(self, message: str, failed_chunks=None, status_code: int = None):
+        super().__init__(message, status_code=status_code)
+        self.failed_chunks = failed_chunks or []
+
+class CircuitOpenError(FitbitAPIError):
+    """Raised without calling the API while the circuit breaker for its host is open."""
+    pass
@@ -0,0 +1,139 @@
+import csv
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import List, Optional, Union
+
+from config import Settings
+from exceptions import ConfigError
+from auth import token_user_id
+from token_manager import TokenManager
+from api_client import FitbitClient
+from cache import StepCache, CachedFitbitClient
+from rate_limit import RateLimiter
+from backfill import plan_chunks, MAX_RANGE_DAYS
+from series import StepSeries
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("csv", "parquet")
+COLUMNS = ("user_id", "date", "steps")
+
+class CsvSink:
+    """
+    Appends (user_id, date, steps) rows to a CSV file.
+    """
+    def __init__(self, path: Union[str, Path]):
+        self.file = open(path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, user_id: str, series: StepSeries) -> int:
+        self.writer.writerows((user_id, day.isoformat(), value) for day, value in series.items())
+        self.file.flush()
+        return len(series)
+
+    def close(self):
+        self.file.close()
+
+class ParquetSink:
+    """
+    Appends each chunk as its own row group, so only one chunk is ever held in memory.
+    """
+    def __init__(self, path: Union[str, Path]):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ConfigError("Parquet export requires pyarrow (pip install pyarrow), or export to .csv instead")
+        self.pa = pa
+        self.schema = pa.schema([("user_id", pa.string()), ("date", pa.date32()), ("steps", pa.int32())])
+        self.writer = pq.ParquetWriter(str(path), self.schema)
+
+    def write(self, user_id: str, series: StepSeries) -> int:
+        pa = self.pa
+        rows = len(series)
+        # date32 counts days since the epoch, which is exactly how StepSeries numbers its days
+        days = pa.array(range(series.start_day, series.start_day + rows), type=pa.int32()).cast(pa.date32())
+        table = pa.Table.from_arrays(
+            [pa.array([user_id] * rows, type=pa.string()), days, pa.array(series.to_numpy(), type=pa.int32())],
+            schema=self.schema,
+        )
+        self.writer.write_table(table)
+        return rows
+
+    def close(self):
+        self.writer.close()
+
+def open_sink(path: Union[str, Path], fmt: Optional[str] = None):
+    """
+    Opens a CSV or Parquet sink; the format defaults to the file extension.
+    """
+    fmt = fmt or {".csv": "csv", ".parquet": "parquet", ".pq": "parquet"}.get(Path(path).suffix.lower())
+    if fmt not in EXPORT_FORMATS:
+        raise ConfigError(f"Cannot tell the export format of {path}; use a .csv or .parquet file")
+    return CsvSink(path) if fmt == "csv" else ParquetSink(path)
+
+@dataclass
+class ExportReport:
+    users: int
+    rows: int
+    elapsed: float
+    failed: List[str] = field(default_factory=list)
+
+def export_history(settings: Settings, token_files: List[Path], start: date, end: date,
+                   path: Union[str, Path], fmt: Optional[str] = None, chunk_days: int = MAX_RANGE_DAYS,
+                   max_workers: int = 4) -> ExportReport:
+    """
+    Streams daily steps for [start, end] of every token file into a CSV or Parquet file.
+    Each user is fetched chunk by chunk and every chunk is written as soon as it
+    arrives, so memory stays at about `max_workers` chunks however many users or
+    days are exported. Rows of different users may interleave, and a user that
+    fails part-way keeps the chunks written before the failure.
+    """
+    from batch import assign_user_ids
+
+    user_ids = assign_user_ids(token_files)
+    sink = open_sink(path, fmt)
+    cache = StepCache(settings.cache_file) if settings.cache_file else None
+    tokens = TokenManager(settings, interactive=False, background=False)
+    rate_limiter = RateLimiter()
+    write_lock = threading.Lock()
+    chunks = plan_chunks(start, end, chunk_days)
+    rows = 0
+    failed: List[str] = []
+
+    def export_user(token_file: Path):
+        nonlocal rows
+        user_id = user_ids[token_file]
+        try:
+            owner_id = token_user_id(token_file, default="")
+            client = FitbitClient.from_settings(tokens.get_token(token_file), settings, rate_limiter=rate_limiter,
+                                                user_key=owner_id or str(token_file))
+            if cache is not None:
+                client = CachedFitbitClient(client, cache, user_id=owner_id or user_id)
+            for chunk_start, chunk_end in chunks:
+                series = client.get_step_series(chunk_start.strftime("%Y-%m-%d"), chunk_end.strftime("%Y-%m-%d"))
+                with write_lock:
+                    rows += sink.write(user_id, series)
+        except Exception as e:
+            logger.warning(f"Export for {user_id} failed: {e}")
+            with write_lock:
+                failed.append(user_id)
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(export_user, token_files))
+    finally:
+        sink.close()
+        tokens.close()
+        if cache is not None:
+            cache.close()
+
+    return ExportReport(users=len(token_files), rows=rows, elapsed=time.perf_counter() - started,
+                        failed=sorted(failed))
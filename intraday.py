@@ -0,0 +1,87 @@
+from array import array
+from datetime import date
+import logging
+from typing import Dict, Any, Callable, List
+
+logger = logging.getLogger(__name__)
+
+MINUTES_PER_DAY = 1440
+MINUTES_PER_HOUR = 60
+
+def new_minute_array() -> array:
+    """
+    Returns a zeroed 1440-slot int array, one slot per minute of the day.
+    """
+    return array("i", bytes(array("i").itemsize * MINUTES_PER_DAY))
+
+def minute_hook(minutes: array) -> Callable[[Dict[str, Any]], Any]:
+    """
+    Builds a json object_hook that writes intraday {"time": "HH:MM:SS", "value": n}
+    entries straight into `minutes` and drops them, so no list of dicts is ever built.
+    """
+    def hook(obj: Dict[str, Any]) -> Any:
+        if "time" in obj and "value" in obj:
+            t = obj["time"]
+            minutes[int(t[0:2]) * MINUTES_PER_HOUR + int(t[3:5])] = int(obj["value"])
+            return None
+        return obj
+    return hook
+
+def hourly_sums(minutes: array) -> List[int]:
+    return [sum(minutes[h * MINUTES_PER_HOUR:(h + 1) * MINUTES_PER_HOUR]) for h in range(24)]
+
+def active_minutes(minutes: array, threshold: int = 1) -> int:
+    """
+    Counts minutes with at least `threshold` steps.
+    """
+    return sum(1 for value in minutes if value >= threshold)
+
+def peak_hour(minutes: array) -> int:
+    """
+    Returns the hour (0-23) with the most steps; the earliest wins ties.
+    """
+    sums = hourly_sums(minutes)
+    return sums.index(max(sums))
+
+def intraday_stats(minutes: array, active_threshold: int = 1) -> Dict[str, Any]:
+    sums = hourly_sums(minutes)
+    return {
+        "total_steps": sum(sums),
+        "active_minutes": active_minutes(minutes, active_threshold),
+        "peak_hour": sums.index(max(sums)),
+        "hourly_steps": sums,
+    }
+
+class IntradayHistory:
+    """
+    Contiguous per-minute history for one user: day i of the window lives at
+    data[i * 1440:(i + 1) * 1440]. A year is ~2 MB of 4-byte ints.
+    """
+    def __init__(self, start: date, days: int):
+        self.start = start
+        self.days = days
+        self.data = array("i", bytes(array("i").itemsize * MINUTES_PER_DAY * days))
+
+    def _offset(self, day: date) -> int:
+        index = day.toordinal() - self.start.toordinal()
+        if not 0 <= index < self.days:
+            raise KeyError(f"{day} is outside the history window")
+        return index * MINUTES_PER_DAY
+
+    def set_day(self, day: date, minutes: array):
+        offset = self._offset(day)
+        self.data[offset:offset + MINUTES_PER_DAY] = minutes
+
+    def day(self, day: date) -> memoryview:
+        """
+        Zero-copy view of one day's 1440 minute values.
+        """
+        offset = self._offset(day)
+        return memoryview(self.data)[offset:offset + MINUTES_PER_DAY]
+
+    def active_minutes_by_day(self, threshold: int = 1) -> List[int]:
+        view = memoryview(self.data)
+        return [
+            sum(1 for value in view[i * MINUTES_PER_DAY:(i + 1) * MINUTES_PER_DAY] if value >= threshold)
+            for i in range(self.days)
+        ]
@@ -0,0 +1,204 @@
+import logging
+import threading
+from array import array
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Sequence, Tuple, Union
+from urllib.parse import quote
+
+import numpy as np
+
+from intraday import MINUTES_PER_DAY, MINUTES_PER_HOUR
+from series import epoch_day, from_epoch_day
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTRADAY_DIR = "intraday_store"
+RECORD_DTYPE = np.int32
+RECORD_BYTES = MINUTES_PER_DAY * np.dtype(RECORD_DTYPE).itemsize
+# Index entries are (epoch day, record number) int32 pairs
+INDEX_TYPECODE = "i"
+
+def parse_time(value: str) -> int:
+    """
+    "HH:MM" -> minute of the day; "24:00" is accepted as the end of the day.
+    """
+    hours, minutes = value.split(":")
+    minute = int(hours) * MINUTES_PER_HOUR + int(minutes)
+    if not 0 <= minute <= MINUTES_PER_DAY or not 0 <= int(minutes) < MINUTES_PER_HOUR:
+        raise ValueError(f"Invalid time of day: {value}")
+    return minute
+
+class _UserFile:
+    """
+    One user's records: `<user>.days` holds 1440-slot int32 day records in append order and
+    `<user>.idx` is an append-only log of (epoch day, record) pairs mapping days to records.
+    """
+    def __init__(self, root: Path, user_id: str, grow_days: int):
+        name = quote(user_id, safe="")
+        self.data_path = root / f"{name}.days"
+        self.index_path = root / f"{name}.idx"
+        self.grow_days = grow_days
+        self.records: Dict[int, int] = {}
+        if self.index_path.exists():
+            pairs = array(INDEX_TYPECODE)
+            raw = self.index_path.read_bytes()
+            # Ignore a torn trailing entry from a crash mid-append
+            usable = len(raw) - len(raw) % (2 * pairs.itemsize)
+            pairs.frombytes(raw[:usable])
+            self.records = dict(zip(pairs[0::2], pairs[1::2]))
+        self.count = max(self.records.values(), default=-1) + 1
+        self.index_file = open(self.index_path, "ab")
+        self.data: Optional[np.memmap] = None
+        self._map(max(self.count, 1))
+
+    def _map(self, min_records: int):
+        size = self.data_path.stat().st_size if self.data_path.exists() else 0
+        capacity = size // RECORD_BYTES
+        if capacity < min_records:
+            capacity = max(min_records, capacity + self.grow_days)
+            with open(self.data_path, "ab") as f:
+                f.truncate(capacity * RECORD_BYTES)
+        if self.data is not None:
+            self.data.flush()
+        # Views of the previous mapping stay valid: the file only ever grows
+        self.data = np.memmap(self.data_path, dtype=RECORD_DTYPE, mode="r+", shape=(capacity, MINUTES_PER_DAY))
+
+    def put(self, day: int, minutes: Sequence[int]):
+        record = self.records.get(day)
+        if record is None:
+            record = self.count
+            if record >= self.data.shape[0]:
+                self._map(record + 1)
+        self.data[record] = minutes
+        if day not in self.records:
+            # Data first, then the index entry that makes it visible
+            self.data.flush()
+            self.index_file.write(array(INDEX_TYPECODE, (day, record)).tobytes())
+            self.index_file.flush()
+            self.records[day] = record
+            self.count = record + 1
+
+    def close(self):
+        self.index_file.close()
+        if self.data is not None:
+            self.data.flush()
+            self.data = None
+
+class IntradayStore:
+    """
+    On-disk per-minute step store keyed by user and day. Each day is a fixed-width record of
+    1440 int32 minutes in a memory-mapped, append-only file (a day written again is updated
+    in place), so reads never parse JSON or load whole files. Days appended in date order,
+    which is how syncing fills the store, come back as zero-copy NumPy views of the mapping.
+    """
+    def __init__(self, root: Union[str, Path] = DEFAULT_INTRADAY_DIR, grow_days: int = 64):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.grow_days = grow_days
+        self.lock = threading.Lock()
+        self._users: Dict[str, _UserFile] = {}
+
+    def _user(self, user_id: str) -> _UserFile:
+        user = self._users.get(user_id)
+        if user is None:
+            user = self._users[user_id] = _UserFile(self.root, user_id, self.grow_days)
+        return user
+
+    def close(self):
+        with self.lock:
+            for user in self._users.values():
+                user.close()
+            self._users.clear()
+
+    def put_day(self, user_id: str, day: date, minutes: Sequence[int]):
+        """
+        Stores one day's 1440 minute values (an intraday.new_minute_array() or any sequence).
+        """
+        if len(minutes) != MINUTES_PER_DAY:
+            raise ValueError(f"Expected {MINUTES_PER_DAY} minute values, got {len(minutes)}")
+        with self.lock:
+            self._user(user_id).put(epoch_day(day), minutes)
+
+    def days(self, user_id: str) -> List[date]:
+        with self.lock:
+            return [from_epoch_day(day) for day in sorted(self._user(user_id).records)]
+
+    def day(self, user_id: str, day: date) -> Optional[np.ndarray]:
+        """
+        Zero-copy view of one day's minutes, or None if the day is not stored.
+        """
+        with self.lock:
+            user = self._user(user_id)
+            record = user.records.get(epoch_day(day))
+            return None if record is None else user.data[record]
+
+    def range(self, user_id: str, start: date, end: date) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (epoch_days, minutes) for the stored days in [start, end], in date order:
+        an int array of epoch days and a days x 1440 matrix. When those days occupy consecutive
+        records (they were appended in order) the matrix is a view of the mapped file;
+        otherwise it is gathered into a copy.
+        """
+        first, last = epoch_day(start), epoch_day(end)
+        with self.lock:
+            user = self._user(user_id)
+            records = user.records
+            days = [day for day in range(first, last + 1) if day in records]
+            rows = [records[day] for day in days]
+            data = user.data
+        epoch_days = np.array(days, dtype=np.int32)
+        if not rows:
+            return epoch_days, np.empty((0, MINUTES_PER_DAY), dtype=RECORD_DTYPE)
+        if all(b == a + 1 for a, b in zip(rows, rows[1:])):
+            return epoch_days, data[rows[0]:rows[-1] + 1]
+        return epoch_days, data[rows]
+
+    def time_of_day(self, user_id: str, start: date, end: date, from_time: str, to_time: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Steps between `from_time` (inclusive) and `to_time` (exclusive), "HH:MM", for every stored
+        day in [start, end]: (epoch_days, steps per day). E.g. "07:00"-"09:00" sums minutes 420-539.
+        """
+        first, last = parse_time(from_time), parse_time(to_time)
+        if last <= first:
+            raise ValueError(f"{to_time} is not after {from_time}")
+        epoch_days, minutes = self.range(user_id, start, end)
+        return epoch_days, minutes[:, first:last].sum(axis=1, dtype=np.int64)
+
+def time_of_day_stats(store: IntradayStore, user_id: str, from_time: str, to_time: str, days: int = 90,
+                      today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Summarizes steps in a daily time window over the last `days` days ending yesterday,
+    e.g. the 07:00-09:00 commute. Days missing from the store are not counted.
+    """
+    today = today or datetime.now().date()
+    end = today - timedelta(days=1)
+    start = end - timedelta(days=days - 1)
+    epoch_days, steps = store.time_of_day(user_id, start, end, from_time, to_time)
+    counted = len(steps)
+    return {
+        "window": f"{from_time}-{to_time}",
+        "days": days,
+        "days_counted": counted,
+        "total": int(steps.sum()),
+        "mean": round(float(steps.mean()), 2) if counted else None,
+        "max": int(steps.max()) if counted else None,
+        "max_day": from_epoch_day(int(epoch_days[steps.argmax()])).isoformat() if counted else None,
+    }
+
+def sync_intraday(store: IntradayStore, client, user_id: str, start: date, end: date,
+                  refetch_from: Optional[date] = None) -> int:
+    """
+    Fetches per-minute steps for every day in [start, end] that is not stored yet, plus every
+    day from `refetch_from` on (today's record keeps changing), and stores them in date order.
+    Returns the number of days fetched.
+    """
+    stored = set(store.days(user_id))
+    fetched = 0
+    day = start
+    while day <= end:
+        if day not in stored or (refetch_from is not None and day >= refetch_from):
+            store.put_day(user_id, day, client.get_intraday_steps(day.strftime("%Y-%m-%d")))
+            fetched += 1
+        day += timedelta(days=1)
+    return fetched
@@ -1,12 +1,16 @@
+import os
 import sys
+import argparse
 import logging
-from pydantic import ValidationError
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
 
-from config import settings, Settings
-from auth import FitbitAuth
-from api_client import FitbitClient
-from stats import calculate_stats
 from exceptions import ConfigError, HealthConnectError
+from snapshot import (DEFAULT_SNAPSHOT_FILE, load_snapshot, save_snapshot, snapshot_age,
+                      acquire_refresh_lock, release_refresh_lock, spawn_refresh)
+
+# pydantic, requests and the auth/client stack are imported inside the functions
+# that use them, so the --cached path never pays for them.
 
 # Configure Logging
 logging.basicConfig(
@@ -18,43 +22,356 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def main():
-    logger.info("Starting Google Health Connect Stats (via Fitbit)...")
-    
+def parse_metrics(value: str) -> List[str]:
+    from resources import expand
+
+    metrics = [m.strip() for m in value.split(",") if m.strip()]
+    try:
+        expand(tuple(metrics))
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return metrics
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """
+    Parses "I/N" (shard I of N, zero-based) for --shard.
+    """
+    try:
+        shard, num_shards = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected SHARD/COUNT such as 0/4, got {value!r}")
+    if not 0 <= shard < num_shards:
+        raise argparse.ArgumentTypeError(f"Shard must be between 0 and {num_shards - 1}")
+    return shard, num_shards
+
+def parse_time_window(value: str) -> Tuple[str, str]:
+    """
+    Parses "HH:MM-HH:MM" for --time-window.
+    """
+    from intraday_store import parse_time
+
     try:
-        # Settings are already loaded by import, but we could re-load or validate if needed
-        # In this pattern, 'settings' is a global instance from config.py
+        start, end = value.split("-")
+        if parse_time(end) <= parse_time(start):
+            raise ValueError(f"{end} is not after {start}")
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"Expected HH:MM-HH:MM such as 07:00-09:00: {e}")
+    return start, end
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Google Health Connect Stats (via Fitbit)")
+    parser.add_argument("--batch", metavar="PATH",
+                        help="Directory of token files or manifest listing one token file per line")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="Maximum concurrent users in batch mode (default: 8)")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Run --batch on asyncio with one pooled connection set (requires aiohttp)")
+    parser.add_argument("--cached", action="store_true",
+                        help="Print the last computed stats from the snapshot without touching the network")
+    parser.add_argument("--swr", action="store_true",
+                        help="Stale-while-revalidate: print the snapshot immediately and refresh it in the background")
+    parser.add_argument("--stale-after", type=float, default=300, metavar="SECONDS",
+                        help="With --swr, refresh in the background once the snapshot is this old (default: 300)")
+    parser.add_argument("--max-age", type=float, default=86400, metavar="SECONDS",
+                        help="With --swr, fetch live data instead when the snapshot is older than this (default: 86400)")
+    parser.add_argument("--refresh-snapshot", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--snapshot", metavar="PATH", default=DEFAULT_SNAPSHOT_FILE,
+                        help=f"Snapshot file for the last computed stats (default: {DEFAULT_SNAPSHOT_FILE})")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="Write Prometheus-format metrics to PATH when the run finishes")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Keep running, refresh stats in the background and serve them over local HTTP")
+    parser.add_argument("--include", metavar="METRICS", type=parse_metrics, default=[],
+                        help="Comma-separated extra metrics to report: distance, calories, active_minutes, "
+                             "resting_heart_rate, sleep_minutes")
+    parser.add_argument("--export", metavar="PATH",
+                        help="Stream daily step history to a .csv or .parquet file "
+                             "(for the --batch token files if given)")
+    parser.add_argument("--since", type=date.fromisoformat, metavar="YYYY-MM-DD",
+                        help="First day for --export (default: one year ago)")
+    parser.add_argument("--webhook", action="store_true",
+                        help="Receive Fitbit subscription notifications and refetch only the changed days "
+                             "(for the --batch token files if given)")
+    parser.add_argument("--subscribe", action="store_true",
+                        help="Create activity subscriptions for the token files (--batch if given) and exit")
+    parser.add_argument("--port", type=int, default=8765,
+                        help="Port for --daemon and --webhook (default: 8765)")
+    parser.add_argument("--time-window", metavar="HH:MM-HH:MM", type=parse_time_window,
+                        help="Report steps in this daily time window over the last --days days, "
+                             "syncing per-minute data into the local intraday store")
+    parser.add_argument("--days", type=int, default=90,
+                        help="History length for --time-window (default: 90)")
+    parser.add_argument("--enqueue", action="store_true",
+                        help="Queue one sync job per token file (--batch if given) in the --queue database and exit")
+    parser.add_argument("--worker", action="store_true",
+                        help="Claim and run sync jobs from the --queue database until no work is left")
+    parser.add_argument("--queue", metavar="PATH", default="work_queue.db",
+                        help="Work queue shared by --enqueue and --worker (default: work_queue.db)")
+    parser.add_argument("--shard", metavar="I/N", type=parse_shard,
+                        help="With --worker, only take jobs of shard I out of N (e.g. 0/4)")
+    parser.add_argument("--interval", type=float, default=300,
+                        help="Seconds between background refreshes in --daemon mode (default: 300)")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="Profile the run per stage (time, allocations, folded stacks) and write reports to DIR")
+    return parser.parse_args(argv)
+
+def format_age(seconds: float) -> str:
+    if seconds < 60:
+        return f"{int(seconds)}s"
+    if seconds < 3600:
+        return f"{int(seconds // 60)}m"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)}h"
+    return f"{int(seconds // 86400)}d"
+
+def print_stats(stats: Dict[str, Any], age: Optional[float] = None):
+    print("\n" + "="*30)
+    print(" GOOGLE HEALTH CONNECT STATS")
+    print(" (via Fitbit API)")
+    if age is not None:
+        print(f" (cached, {format_age(age)} old)")
+    print("="*30)
+    print(f"Today's Steps:      {stats['today_steps']}")
+    print(f"Weekly Average:     {stats['weekly_avg']} (Last {stats['days_counted_weekly']} days)")
+    print(f"Monthly Average:    {stats['monthly_avg']} (Last {stats['days_counted_monthly']} days)")
+    rolling = stats.get("rolling", {})
+    for window in ("90", "365"):
+        if window in rolling:
+            print(f"{window + '-Day Average:':<20}{rolling[window]['mean']}")
+    for name, metric in stats.get("metrics", {}).items():
+        label = name.replace("_", " ").capitalize()
+        print(f"{label + ':':<20}today={metric['today']} weekly={metric['weekly_avg']} monthly={metric['monthly_avg']}")
+    print("="*30 + "\n")
+
+def load_settings():
+    from pydantic import ValidationError
+    from config import get_settings
+
+    try:
+        settings = get_settings()
         logger.debug(f"Loaded configuration for Client ID: {settings.client_id}")
-        
+        return settings
     except ValidationError as e:
         logger.critical(f"Configuration Invalid: {e}")
         sys.exit(1)
     except Exception as e:
         logger.critical(f"Failed to load configuration: {e}")
         sys.exit(1)
-        
+
+def print_latency():
+    """
+    Prints recent p50/p90/p99 API latency per endpoint (see metrics.REQUEST_LATENCY).
+    """
+    import metrics
+
+    for key, quantiles in sorted(metrics.REQUEST_LATENCY.snapshot().items()):
+        endpoint = dict(key).get("endpoint", "other")
+        values = " ".join(f"p{q * 100:g}={value * 1000:.0f}ms" for q, value in quantiles.items())
+        print(f"{endpoint + ':':<20}{values}")
+
+def run_batch_mode(settings, source: str, workers: int, use_async: bool = False):
+    from batch import discover_token_files, run_batch, run_batch_async
+
+    token_files = discover_token_files(source)
+    if use_async:
+        import asyncio
+        logger.info(f"Running async batch for {len(token_files)} users, {workers} at a time...")
+        report = asyncio.run(run_batch_async(settings, token_files, max_users=workers))
+    else:
+        logger.info(f"Running batch for {len(token_files)} users with {workers} workers...")
+        report = run_batch(settings, token_files, max_workers=workers)
+
+    print("\n" + "="*30)
+    print(" BATCH RESULTS")
+    print("="*30)
+    for result in report.results:
+        if result.ok:
+            print(f"{result.user_id}: today={result.stats['today_steps']} "
+                  f"weekly={result.stats['weekly_avg']} monthly={result.stats['monthly_avg']}")
+        else:
+            print(f"{result.user_id}: FAILED - {result.error}")
+    print("="*30)
+    print(f"Succeeded:          {report.succeeded}")
+    print(f"Failed:             {report.failed}")
+    print(f"Elapsed:            {report.elapsed:.2f}s")
+    print(f"Throughput:         {report.throughput:.2f} users/s")
+    print_latency()
+    print("="*30 + "\n")
+
+    if report.failed and not report.succeeded:
+        sys.exit(1)
+
+def fetch_stats(settings, metrics: Optional[List[str]] = None, interactive: bool = True) -> Dict[str, Any]:
+    from auth import FitbitAuth, token_user_id
+    from api_client import FitbitClient
+    from cache import StepCache, CachedFitbitClient
+    from stats import calculate_stats
+
+    auth = FitbitAuth(settings, interactive=interactive)
+    # Check if we have credentials or need to auth
+    # Note: get_token will trigger auth flow if needed
+    token = auth.get_token()
+
+    client = FitbitClient.from_settings(token, settings)
+    if settings.cache_file:
+        # Keyed like the webhook, which stores refetched days under the Fitbit user ID
+        client = CachedFitbitClient(client, StepCache(settings.cache_file), user_id=token_user_id(settings.token_file))
+
+    if settings.rolling_file:
+        from rolling import RollingAggregator, calculate_rolling_stats
+
+        if metrics:
+            logger.warning("Extra metrics are not tracked by the rolling aggregator and are skipped")
+        aggregator = RollingAggregator.load(settings.rolling_file)
+        stats = calculate_rolling_stats(client, aggregator)
+        aggregator.save(settings.rolling_file)
+        return stats
+
+    logger.info("Fetching data and calculating statistics...")
+    return calculate_stats(client, metrics=metrics or ())
+
+def start_background_refresh(args: argparse.Namespace) -> bool:
+    """
+    Spawns a detached `main.py --refresh-snapshot` unless a refresh is already running.
+    """
+    if not acquire_refresh_lock(args.snapshot):
+        return False
+    refresh_args = [os.path.abspath(__file__), "--refresh-snapshot", "--snapshot", os.path.abspath(args.snapshot)]
+    if args.include:
+        refresh_args += ["--include", ",".join(args.include)]
     try:
-        auth = FitbitAuth(settings)
-        # Check if we have credentials or need to auth
-        # Note: get_token will trigger auth flow if needed
-        token = auth.get_token()
-        
-        client = FitbitClient(token)
-        
-        logger.info("Fetching data and calculating statistics...")
-        stats = calculate_stats(client)
-        
-        print("\n" + "="*30)
-        print(" GOOGLE HEALTH CONNECT STATS")
-        print(" (via Fitbit API)")
-        print("="*30)
-        print(f"Today's Steps:      {stats['today_steps']}")
-        print(f"Weekly Average:     {stats['weekly_avg']} (Last {stats['days_counted_weekly']} days)")
-        print(f"Monthly Average:    {stats['monthly_avg']} (Last {stats['days_counted_monthly']} days)")
-        print("="*30 + "\n")
-        
+        spawn_refresh(refresh_args)
+    except OSError as e:
+        release_refresh_lock(args.snapshot)
+        logger.warning(f"Could not start background refresh: {e}")
+        return False
+    return True
+
+def refresh_snapshot(args: argparse.Namespace, settings):
+    """
+    Body of the background refresh: fetch without prompting and replace the snapshot.
+    """
+    try:
+        stats = fetch_stats(settings, args.include, interactive=False)
+        save_snapshot(stats, args.snapshot)
+    except HealthConnectError as e:
+        logger.error(f"Background refresh failed: {e}")
+        sys.exit(1)
+    finally:
+        release_refresh_lock(args.snapshot)
+
+def run_time_window(settings, window: Tuple[str, str], days: int):
+    from auth import FitbitAuth, token_user_id
+    from api_client import FitbitClient
+    from intraday_store import IntradayStore, sync_intraday, time_of_day_stats
+
+    client = FitbitClient.from_settings(FitbitAuth(settings).get_token(), settings)
+    user_id = token_user_id(settings.token_file)
+    today = date.today()
+    store = IntradayStore(settings.intraday_dir)
+    try:
+        # Yesterday may still have been syncing last time, so it is always refetched
+        fetched = sync_intraday(store, client, user_id, today - timedelta(days=days), today - timedelta(days=1),
+                                refetch_from=today - timedelta(days=1))
+        logger.info(f"Fetched {fetched} days of per-minute data")
+        stats = time_of_day_stats(store, user_id, window[0], window[1], days=days, today=today)
+    finally:
+        store.close()
+
+    print(f"\nSteps {stats['window']} over the last {days} days ({stats['days_counted']} with data):")
+    print(f"  Average: {stats['mean']}  Total: {stats['total']}  Best: {stats['max']} on {stats['max_day']}\n")
+
+def run(args: argparse.Namespace, settings):
+    if args.refresh_snapshot:
+        refresh_snapshot(args, settings)
+        return
+
+    if args.time_window:
+        try:
+            run_time_window(settings, args.time_window, args.days)
+        except HealthConnectError as e:
+            logger.error(f"Time window query failed: {e}")
+            sys.exit(1)
+        return
+
+    if args.daemon:
+        from daemon import StatsDaemon
+
+        StatsDaemon(settings, interval=args.interval, port=args.port).serve_forever()
+        return
+
+    if args.export:
+        from batch import discover_token_files
+        from export import export_history
+
+        token_files = discover_token_files(args.batch) if args.batch else [settings.token_file]
+        end = date.today()
+        start = args.since or end - timedelta(days=364)
+        try:
+            report = export_history(settings, token_files, start, end, args.export, max_workers=args.workers)
+        except HealthConnectError as e:
+            logger.error(f"Export failed: {e}")
+            sys.exit(1)
+        logger.info(f"Exported {report.rows} rows for {report.users - len(report.failed)} of {report.users} users "
+                    f"to {args.export} in {report.elapsed:.2f}s")
+        if report.failed:
+            logger.warning(f"Failed users: {', '.join(report.failed)}")
+        return
+
+    if args.webhook or args.subscribe:
+        from batch import discover_token_files
+        from webhook import WebhookReceiver, subscribe_all
+
+        token_files = discover_token_files(args.batch) if args.batch else [settings.token_file]
+        if args.subscribe:
+            subscribed = subscribe_all(settings, token_files)
+            logger.info(f"Subscribed {subscribed} of {len(token_files)} users")
+            return
+        WebhookReceiver(settings, token_files, port=args.port).serve_forever()
+        return
+
+    if args.enqueue or args.worker:
+        from batch import discover_token_files
+        from work_queue import WorkQueue, run_worker
+
+        queue = WorkQueue(args.queue)
+        try:
+            if args.enqueue:
+                token_files = discover_token_files(args.batch) if args.batch else [settings.token_file]
+                try:
+                    queued = queue.enqueue(token_files)
+                except ConfigError as e:
+                    logger.error(str(e))
+                    sys.exit(1)
+                logger.info(f"Queued {queued} of {len(token_files)} users in {args.queue}")
+                return
+            shard, num_shards = args.shard or (None, 1)
+            report = run_worker(settings, queue, shard=shard, num_shards=num_shards)
+            logger.info(f"Worker {report.worker} processed {report.processed} jobs "
+                        f"({report.succeeded} ok, {report.failed} failed) in {report.elapsed:.2f}s; "
+                        f"queue: {queue.counts()}")
+        finally:
+            queue.close()
+        return
+
+    if args.batch:
+        try:
+            run_batch_mode(settings, args.batch, args.workers, args.use_async)
+        except OSError as e:
+            logger.error(f"Cannot read batch source: {e}")
+            sys.exit(1)
+        except ConfigError as e:
+            logger.error(str(e))
+            sys.exit(1)
+        return
+
+    try:
+        stats = fetch_stats(settings, args.include)
+        print_stats(stats)
+        save_snapshot(stats, args.snapshot)
+
         logger.info("Done.")
-        
+
     except HealthConnectError as e:
         logger.error(f"Application Error: {e}")
         sys.exit(1)
@@ -62,5 +379,64 @@ def main():
         logger.exception(f"Unexpected Error: {e}")
         sys.exit(1)
 
+def write_metrics(path: str):
+    import metrics
+
+    with open(path, "w") as f:
+        f.write(metrics.registry.render_prometheus())
+    logger.info(f"Metrics written to {path}")
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+
+    if args.cached:
+        payload = load_snapshot(args.snapshot)
+        if payload is not None:
+            print_stats(payload["stats"], age=snapshot_age(payload))
+            return
+        logger.info("No cached stats available, fetching live data...")
+
+    if args.swr:
+        payload = load_snapshot(args.snapshot)
+        if payload is not None and snapshot_age(payload) <= args.max_age:
+            age = snapshot_age(payload)
+            print_stats(payload["stats"], age=age)
+            if age >= args.stale_after and start_background_refresh(args):
+                logger.info("Refreshing stats in the background for the next run")
+            return
+        logger.info("No snapshot within --max-age, fetching live data...")
+
+    logger.info("Starting Google Health Connect Stats (via Fitbit)...")
+    if args.profile:
+        run_profiled(args)
+        return
+    settings = load_settings()
+
+    try:
+        run(args, settings)
+    finally:
+        if args.metrics:
+            write_metrics(args.metrics)
+
+def run_profiled(args: argparse.Namespace):
+    """
+    Runs the selected mode under profiling.Profiler and writes its reports to --profile.
+    """
+    from profiling import Profiler
+
+    profiler = Profiler(args.profile)
+    profiler.start()
+    profiler.install()
+    try:
+        with profiler.stage("config"):
+            settings = load_settings()
+        run(args, settings)
+    finally:
+        profiler.uninstall()
+        profiler.stop()
+        if args.metrics:
+            write_metrics(args.metrics)
+        print(profiler.write()["report"].read_text())
+
 if __name__ == "__main__":
     main()
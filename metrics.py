@@ -0,0 +1,243 @@
+import time
+import bisect
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+# Hooks receive (metric name, labels, value) for every counter increment and histogram observation
+Hook = Callable[[str, Dict[str, str], float], None]
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(key: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (k + '="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+               for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+def _format_value(value: float) -> str:
+    # Whole numbers print as integers; everything else keeps full float precision
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Counter:
+    def __init__(self, registry: "MetricsRegistry", name: str, help: str):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.values: Dict[LabelKey, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = _label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        self.registry._notify(self.name, labels, amount)
+
+    def value(self, **labels: str) -> float:
+        with self.lock:
+            return self.values.get(_label_key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, registry: "MetricsRegistry", name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self.counts: Dict[LabelKey, List[int]] = {}
+        self.sums: Dict[LabelKey, float] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts = self.counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[index] += 1
+            self.sums[key] = self.sums.get(key, 0.0) + value
+        self.registry._notify(self.name, labels, value)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        with self.lock:
+            return sum(self.counts.get(_label_key(labels), []))
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key in sorted(self.counts):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), self.counts[key]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else _format_value(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', le)])} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(self.sums[key])}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+class Summary:
+    """
+    Latency quantiles over the most recent `window` observations per label set.
+    Unlike histogram buckets these are exact, which is what tail-latency tuning needs.
+    """
+    def __init__(self, registry: "MetricsRegistry", name: str, help: str, quantiles: Sequence[float] = DEFAULT_QUANTILES,
+                 window: int = 1024):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.quantiles = tuple(quantiles)
+        self.window = window
+        self.samples: Dict[LabelKey, Deque[float]] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = _label_key(labels)
+        with self.lock:
+            samples = self.samples.get(key)
+            if samples is None:
+                samples = self.samples[key] = deque(maxlen=self.window)
+            samples.append(value)
+        self.registry._notify(self.name, labels, value)
+
+    def count(self, **labels: str) -> int:
+        with self.lock:
+            return len(self.samples.get(_label_key(labels), ()))
+
+    def quantile(self, q: float, **labels: str) -> Optional[float]:
+        """
+        The q-quantile (0..1, nearest rank) of the recent observations, or None without any.
+        """
+        with self.lock:
+            samples = sorted(self.samples.get(_label_key(labels), ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, max(0, int(q * len(samples) + 0.5) - 1))]
+
+    def snapshot(self) -> Dict[LabelKey, Dict[float, float]]:
+        """
+        {label key: {quantile: value}} for every label set, for reports.
+        """
+        with self.lock:
+            keys = list(self.samples)
+        return {key: {q: self.quantile(q, **dict(key)) for q in self.quantiles} for key in keys}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} summary"]
+        for key, values in sorted(self.snapshot().items()):
+            for q, value in values.items():
+                lines.append(f"{self.name}{_format_labels(key, [('quantile', _format_value(q))])} {_format_value(value)}")
+            with self.lock:
+                samples = list(self.samples[key])
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(sum(samples))}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {len(samples)}")
+        return lines
+
+class MetricsRegistry:
+    """
+    In-process metrics with a pluggable hook API and Prometheus text export.
+    """
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+        self.hooks: List[Hook] = []
+        self.lock = threading.Lock()
+
+    def counter(self, name: str, help: str) -> Counter:
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = Counter(self, name, help)
+            return self.metrics[name]
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = Histogram(self, name, help, buckets)
+            return self.metrics[name]
+
+    def summary(self, name: str, help: str, quantiles: Sequence[float] = DEFAULT_QUANTILES,
+                window: int = 1024) -> Summary:
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = Summary(self, name, help, quantiles, window)
+            return self.metrics[name]
+
+    def add_hook(self, hook: Hook):
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook: Hook):
+        self.hooks.remove(hook)
+
+    def _notify(self, name: str, labels: Dict[str, str], value: float):
+        for hook in list(self.hooks):
+            try:
+                hook(name, labels, value)
+            except Exception as e:
+                # Instrumentation must never break the code it observes
+                logger.warning(f"Metrics hook {hook!r} failed: {e}")
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        with self.lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+REQUESTS = registry.counter("fitbit_requests_total", "Fitbit API requests by endpoint and HTTP status.")
+REQUEST_SECONDS = registry.histogram("fitbit_request_duration_seconds", "Fitbit API request latency by endpoint.")
+RESPONSE_BYTES = registry.counter("fitbit_response_bytes_total", "Fitbit API response body bytes by endpoint.")
+RETRIES = registry.counter("fitbit_retries_total", "Retried Fitbit API requests by endpoint and reason.")
+TOKEN_REFRESHES = registry.counter("fitbit_token_refreshes_total", "OAuth token refreshes by result.")
+REQUEST_LATENCY = registry.summary("fitbit_request_latency_seconds",
+                                   "Recent Fitbit API latency quantiles by host and endpoint.")
+HEDGED_REQUESTS = registry.counter("fitbit_hedged_requests_total",
+                                   "Hedged (duplicate) GETs by endpoint and which request answered first.")
+CIRCUIT_OPENED = registry.counter("fitbit_circuit_opened_total", "Times the circuit breaker opened, by host.")
+STAGE_SECONDS = registry.histogram("stats_stage_duration_seconds", "Time spent in each calculate_stats stage.")
+
+class StageTimer:
+    """
+    Times consecutive stages in place: start() closes the running stage and opens the next one.
+    """
+    def __init__(self, histogram: Histogram = STAGE_SECONDS):
+        self.histogram = histogram
+        self.current: Optional[str] = None
+        self.started = 0.0
+
+    def start(self, name: str):
+        self.stop()
+        self.current = name
+        self.started = time.perf_counter()
+
+    def stop(self):
+        if self.current is not None:
+            self.histogram.observe(time.perf_counter() - self.started, stage=self.current)
+            self.current = None
@@ -0,0 +1,148 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from functools import partial
+import logging
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from backfill import plan_chunks, MAX_RANGE_DAYS
+from resources import RESOURCES
+from series import StepSeries
+
+logger = logging.getLogger(__name__)
+
+Fetcher = Callable[[str, str], List[Dict[str, Any]]]
+SeriesFetcher = Callable[..., StepSeries]
+
+class Query:
+    """
+    Handle for one requested (resource, start, end) window. Filled in by QueryPlanner.execute().
+    """
+    def __init__(self, resource: str, start: date, end: date):
+        self.resource = resource
+        self.start = start
+        self.end = end
+        self._entries: Optional[List[Dict[str, Any]]] = None
+        self._series: Optional[StepSeries] = None
+
+    def result(self) -> List[Dict[str, Any]]:
+        if self._entries is None:
+            if self._series is None:
+                raise RuntimeError("Query has not been executed yet")
+            self._entries = self._series.to_entries()
+        return self._entries
+
+    def series(self) -> StepSeries:
+        """
+        The window as a StepSeries (a zero-copy view when the client parses straight into series).
+        """
+        if self._series is None:
+            if self._entries is None:
+                raise RuntimeError("Query has not been executed yet")
+            self._series = StepSeries.from_entries(self._entries, self.start, self.end)
+        return self._series
+
+class QueryPlanner:
+    """
+    Collects every time-series window a computation needs, merges overlapping or
+    adjacent windows per resource into the fewest API calls, and hands each caller
+    back the slice it asked for.
+    """
+    def __init__(self, client, max_range_days: int = MAX_RANGE_DAYS, max_workers: int = 8):
+        self.fetchers: Dict[str, Fetcher] = {"steps": client.get_step_time_series}
+        # Other metrics through the client's generic fetcher, when it has one
+        if hasattr(client, "get_time_series"):
+            for resource in RESOURCES:
+                self.fetchers.setdefault(resource, partial(client.get_time_series, resource))
+        # Resources the client can decode straight into a StepSeries
+        self.series_fetchers: Dict[str, SeriesFetcher] = {}
+        if hasattr(client, "get_step_series"):
+            self.series_fetchers["steps"] = client.get_step_series
+        self.max_range_days = max_range_days
+        self.max_workers = max_workers
+        self.queries: List[Query] = []
+
+    def add(self, resource: str, start: date, end: date) -> Query:
+        if resource not in self.fetchers:
+            raise ValueError(f"Unsupported resource: {resource}")
+        query = Query(resource, start, end)
+        self.queries.append(query)
+        return query
+
+    def plan(self) -> List[Tuple[str, date, date]]:
+        """
+        Returns the minimal list of (resource, start, end) calls covering all queries.
+        """
+        calls = []
+        for resource in sorted({q.resource for q in self.queries}):
+            for start, end in self._merged(resource):
+                for chunk_start, chunk_end in self._chunks(resource, start, end):
+                    calls.append((resource, chunk_start, chunk_end))
+        return calls
+
+    def _chunks(self, resource: str, start: date, end: date) -> List[Tuple[date, date]]:
+        limit = min(self.max_range_days, RESOURCES[resource].max_days) if resource in RESOURCES else self.max_range_days
+        return plan_chunks(start, end, limit)
+
+    def _merged(self, resource: str) -> List[Tuple[date, date]]:
+        windows = sorted((q.start, q.end) for q in self.queries if q.resource == resource)
+        merged = [list(windows[0])]
+        for start, end in windows[1:]:
+            if start <= merged[-1][1] + timedelta(days=1):
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return [(start, end) for start, end in merged]
+
+    def execute(self) -> int:
+        """
+        Runs the planned calls and distributes results to every query. Returns the number of calls made.
+        Independent calls (other resources, other chunks) run concurrently, so the
+        wall time is set by the slowest call rather than the sum of all of them.
+        """
+        calls = self.plan()
+        logger.debug(f"Coalesced {len(self.queries)} queries into {len(calls)} API calls")
+
+        series_resources = {q.resource for q in self.queries} & set(self.series_fetchers)
+        spans: Dict[str, List[StepSeries]] = {}
+        tasks: List[Callable[[], Any]] = []
+        for resource in series_resources:
+            spans[resource] = []
+            for start, end in self._merged(resource):
+                series = StepSeries.for_range(start, end)
+                spans[resource].append(series)
+                # Chunks write disjoint slices of the same series
+                for chunk_start, chunk_end in self._chunks(resource, start, end):
+                    tasks.append(partial(self.series_fetchers[resource], _fmt(chunk_start), _fmt(chunk_end),
+                                         into=series))
+
+        entry_calls = [(r, s, e) for r, s, e in calls if r not in series_resources]
+        for resource, start, end in entry_calls:
+            tasks.append(partial(self.fetchers[resource], _fmt(start), _fmt(end)))
+
+        if len(tasks) > 1 and self.max_workers > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tasks))) as executor:
+                results = list(executor.map(lambda task: task(), tasks))
+        else:
+            results = [task() for task in tasks]
+
+        fetched: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for (resource, _, _), entries in zip(entry_calls, results[len(results) - len(entry_calls):]):
+            by_date = fetched.setdefault(resource, {})
+            for entry in entries:
+                by_date[entry["dateTime"]] = entry
+
+        for query in self.queries:
+            if query.resource in series_resources:
+                span = next(s for s in spans[query.resource] if query.start in s and query.end in s)
+                query._series = span.window(query.start, query.end)
+                continue
+            first = _fmt(query.start)
+            last = _fmt(query.end)
+            query._entries = [
+                entry for day, entry in sorted(fetched.get(query.resource, {}).items())
+                if first <= day <= last
+            ]
+        return len(calls)
+
+def _fmt(day: date) -> str:
+    return day.strftime("%Y-%m-%d")
@@ -0,0 +1,241 @@
+import os
+import io
+import sys
+import time
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+from collections import Counter as Tally
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import wraps
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_DIR = "profile"
+
+# (module, attribute path, stage name) wrapped by Profiler.install(); methods get one stage per call
+STAGE_TARGETS: Tuple[Tuple[str, str, str], ...] = (
+    ("auth", "FitbitAuth.get_token", "token"),
+    ("token_manager", "TokenManager.get_token", "token"),
+    ("api_client", "FitbitClient.get_daily_steps", "client.get_daily_steps"),
+    ("api_client", "FitbitClient.get_step_time_series", "client.get_step_time_series"),
+    ("api_client", "FitbitClient.get_step_series", "client.get_step_series"),
+    ("api_client", "FitbitClient.get_time_series", "client.get_time_series"),
+    ("api_client", "FitbitClient.get_intraday_steps", "client.get_intraday_steps"),
+    ("api_client", "FitbitClient._send", "http"),
+    ("api_client", "FitbitClient._handle_response", "json_decode"),
+    ("cache", "CachedFitbitClient._sync_range", "cache"),
+    ("stats", "summarize_steps", "aggregate"),
+    ("stats", "summarize_metric", "aggregate"),
+    ("rolling", "RollingAggregator.update", "aggregate"),
+)
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    # Net traced bytes still allocated when the stage returned
+    net_bytes: int = 0
+
+class Profiler:
+    """
+    Per-stage profiling of a real run without changing the code under test: install() wraps
+    the functions in STAGE_TARGETS at runtime. While running it collects
+    - wall time and net tracemalloc allocations per stage (nested stages are inclusive),
+    - cProfile data for the main thread and for worker threads while they are inside a stage,
+    - periodic stack samples of every thread, written as folded stacks for flamegraph tools
+      (flamegraph.pl, speedscope, inferno).
+    Allocations of stages that overlap in different threads are attributed to both.
+    """
+    def __init__(self, output_dir: Union[str, Path] = DEFAULT_PROFILE_DIR, sample_interval: float = 0.005,
+                 top: int = 20):
+        self.output_dir = Path(output_dir)
+        self.sample_interval = sample_interval
+        self.top = top
+        self.stages: Dict[str, StageStats] = {}
+        self.samples: Tally = Tally()
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self._profiles: List[cProfile.Profile] = []
+        self._patches: List[Tuple[Any, str, Any]] = []
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._peak = 0
+        self.started = 0.0
+        self.elapsed = 0.0
+
+    def _thread_profile(self) -> cProfile.Profile:
+        profile = getattr(self._local, "profile", None)
+        if profile is None:
+            profile = self._local.profile = cProfile.Profile()
+            self._local.depth = 0
+            with self.lock:
+                self._profiles.append(profile)
+        return profile
+
+    def _enter(self):
+        profile = self._thread_profile()
+        if self._local.depth == 0:
+            profile.enable()
+        self._local.depth += 1
+
+    def _exit(self):
+        self._local.depth -= 1
+        if self._local.depth == 0:
+            self._local.profile.disable()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        self._enter()
+        before = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            after = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+            with self.lock:
+                stats = self.stages.setdefault(name, StageStats())
+                stats.calls += 1
+                stats.seconds += elapsed
+                stats.max_seconds = max(stats.max_seconds, elapsed)
+                stats.net_bytes += after - before
+            self._exit()
+
+    def wrap(self, owner: Any, attribute: str, name: str):
+        """
+        Replaces owner.attribute (a function or method) with a version that runs inside stage `name`.
+        """
+        original = getattr(owner, attribute)
+
+        @wraps(original)
+        def staged(*args, **kwargs):
+            with self.stage(name):
+                return original(*args, **kwargs)
+
+        self._patches.append((owner, attribute, original))
+        setattr(owner, attribute, staged)
+
+    def install(self, targets: Tuple[Tuple[str, str, str], ...] = STAGE_TARGETS):
+        """
+        Imports the pipeline modules (timed as the "import" stage) and wraps every target.
+        """
+        import importlib
+
+        with self.stage("import"):
+            modules = {module: importlib.import_module(module) for module in {t[0] for t in targets}}
+        for module, path, name in targets:
+            *owners, attribute = path.split(".")
+            owner = modules[module]
+            for part in owners:
+                owner = getattr(owner, part)
+            self.wrap(owner, attribute, name)
+
+    def uninstall(self):
+        while self._patches:
+            owner, attribute, original = self._patches.pop()
+            setattr(owner, attribute, original)
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.sample_interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    # Leave the stage wrappers out of the flame graph
+                    if code.co_filename != __file__:
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self.started = time.perf_counter()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        # The main thread is profiled for the whole run, worker threads only inside stages
+        self._enter()
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample, name="profile-sampler", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self._exit()
+        self.elapsed = time.perf_counter() - self.started
+        self._peak = tracemalloc.get_traced_memory()[1]
+        self._snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+    def __enter__(self) -> "Profiler":
+        self.start()
+        self.install()
+        return self
+
+    def __exit__(self, *exc):
+        self.uninstall()
+        self.stop()
+        self.write()
+
+    def pstats(self) -> Optional[pstats.Stats]:
+        stats = None
+        for profile in self._profiles:
+            try:
+                stats = pstats.Stats(profile) if stats is None else stats.add(profile)
+            except TypeError:
+                # A thread that never ran profiled code has nothing to add
+                continue
+        return stats
+
+    def report(self) -> str:
+        lines = [f"Profiled run: {self.elapsed:.3f}s wall, peak traced memory {self._peak / 1024:.0f} KiB", ""]
+        lines.append(f"{'stage':<28}{'calls':>7}{'total s':>10}{'mean ms':>10}{'max ms':>10}{'net KiB':>10}")
+        for name, stats in sorted(self.stages.items(), key=lambda item: -item[1].seconds):
+            lines.append(f"{name:<28}{stats.calls:>7}{stats.seconds:>10.3f}"
+                         f"{stats.seconds / stats.calls * 1000:>10.2f}{stats.max_seconds * 1000:>10.2f}"
+                         f"{stats.net_bytes / 1024:>10.1f}")
+        stats = self.pstats()
+        if stats is not None:
+            out = io.StringIO()
+            stats.stream = out
+            stats.sort_stats("cumulative").print_stats(self.top)
+            lines += ["", f"Top {self.top} functions by cumulative time (cProfile):", out.getvalue().strip()]
+        if self._snapshot is not None:
+            lines += ["", f"Top {self.top} allocation sites still held at the end (tracemalloc):"]
+            for stat in self._snapshot.statistics("lineno")[:self.top]:
+                lines.append(f"  {stat}")
+        return "\n".join(lines) + "\n"
+
+    def write(self) -> Dict[str, Path]:
+        """
+        Writes report.txt, profile.pstats (for pstats/snakeviz) and profile.folded
+        (collapsed stacks for flamegraph tools) to output_dir.
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        paths = {
+            "report": self.output_dir / "report.txt",
+            "pstats": self.output_dir / "profile.pstats",
+            "folded": self.output_dir / "profile.folded",
+        }
+        paths["report"].write_text(self.report())
+        stats = self.pstats()
+        if stats is not None:
+            stats.dump_stats(paths["pstats"])
+        with open(paths["folded"], "w") as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f"{stack} {count}\n")
+        logger.info(f"Profile written to {self.output_dir} (report.txt, profile.pstats, profile.folded)")
+        return paths
@@ -0,0 +1,111 @@
+import time
+import random
+import logging
+import threading
+from typing import Callable, Dict, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# Fitbit allows 150 requests per user per hour, reset at the top of the hour
+DEFAULT_HOURLY_LIMIT = 150
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+def parse_header_number(value) -> Optional[float]:
+    if not isinstance(value, (str, int, float)):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """
+    Exponential backoff with full jitter for the given (0-based) retry attempt.
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+class TokenBucket:
+    """
+    Per-user request budget kept in sync with Fitbit's rate-limit headers.
+    Until the first response is seen the bucket assumes a full hourly quota.
+    """
+    def __init__(self, limit: int = DEFAULT_HOURLY_LIMIT, reserve: int = 0,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.limit = limit
+        self.remaining = limit
+        # Requests held back from the budget, e.g. for interactive use alongside a batch run
+        self.reserve = reserve
+        self.reset_at = clock() + 3600
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes one request from the budget, waiting for the quota window to reset if it is spent.
+        """
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            logger.warning(f"Rate limit budget exhausted, waiting {wait:.1f}s for quota reset")
+            self.sleep(wait)
+
+    def try_acquire(self) -> float:
+        """
+        Takes one request from the budget without blocking. Returns 0 on success,
+        otherwise the seconds until the quota resets (for callers that wait themselves, e.g. asyncio).
+        """
+        with self.lock:
+            now = self.clock()
+            if now >= self.reset_at:
+                self.remaining = self.limit
+                self.reset_at = now + 3600
+            if self.remaining > self.reserve:
+                self.remaining -= 1
+                return 0.0
+            return max(self.reset_at - now, 1e-3)
+
+    def update(self, headers: Mapping[str, str]):
+        """
+        Reconciles the local budget with Fitbit-Rate-Limit-* response headers.
+        """
+        limit = parse_header_number(headers.get("Fitbit-Rate-Limit-Limit"))
+        remaining = parse_header_number(headers.get("Fitbit-Rate-Limit-Remaining"))
+        reset = parse_header_number(headers.get("Fitbit-Rate-Limit-Reset"))
+        with self.lock:
+            if limit is not None:
+                self.limit = int(limit)
+            if remaining is not None:
+                # Other processes may share the quota, so the server is authoritative
+                self.remaining = int(remaining)
+            if reset is not None:
+                self.reset_at = self.clock() + reset
+
+    def exhaust(self, retry_after: Optional[float] = None):
+        """
+        Marks the budget as spent after a 429, optionally moving the reset time.
+        """
+        with self.lock:
+            self.remaining = 0
+            if retry_after is not None:
+                self.reset_at = self.clock() + retry_after
+
+class RateLimiter:
+    """
+    Registry of TokenBuckets keyed by user, shareable between clients and threads.
+    """
+    def __init__(self, limit: int = DEFAULT_HOURLY_LIMIT, reserve: int = 0,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.limit = limit
+        self.reserve = reserve
+        self.clock = clock
+        self.sleep = sleep
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, user_key: str) -> TokenBucket:
+        with self.lock:
+            if user_key not in self.buckets:
+                self.buckets[user_key] = TokenBucket(self.limit, self.reserve, self.clock, self.sleep)
+            return self.buckets[user_key]
@@ -0,0 +1,102 @@
+import time
+import logging
+import threading
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+from exceptions import CircuitOpenError
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# (connect, read) seconds. The connect timeout sits just above a multiple of 3s, the TCP retransmit window.
+Timeout = Tuple[float, float]
+DEFAULT_TIMEOUT: Timeout = (3.05, 10.0)
+ENDPOINT_TIMEOUTS: Dict[str, Timeout] = {
+    "daily_summary": (3.05, 5.0),
+    # Multi-year ranges and per-minute datasets are large responses
+    "steps_time_series": (3.05, 15.0),
+    "steps_intraday": (3.05, 20.0),
+    "oauth_token": (3.05, 15.0),
+}
+
+def timeout_for(endpoint: str, overrides: Optional[Mapping[str, Timeout]] = None) -> Timeout:
+    """
+    (connect, read) timeout for an endpoint label; `overrides` (Settings.timeouts) wins,
+    and its "default" entry replaces DEFAULT_TIMEOUT for endpoints without their own.
+    """
+    overrides = overrides or {}
+    if endpoint in overrides:
+        return tuple(overrides[endpoint])
+    if endpoint in ENDPOINT_TIMEOUTS:
+        return ENDPOINT_TIMEOUTS[endpoint]
+    return tuple(overrides.get("default", DEFAULT_TIMEOUT))
+
+class CircuitBreaker:
+    """
+    Fails fast while an upstream is degraded. After `failure_threshold` consecutive failures
+    (timeouts, connection errors, 5xx) the circuit opens and calls raise CircuitOpenError
+    without touching the network. After `reset_timeout` seconds one probe request is let
+    through (half-open): success closes the circuit, failure opens it again.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str = "fitbit", failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """
+        Raises CircuitOpenError unless a request may be sent now.
+        """
+        with self.lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            retry_in = max(0.0, self.reset_timeout - (self.clock() - self.opened_at))
+        raise CircuitOpenError(f"Circuit for {self.name} is open after repeated failures; retry in {retry_in:.0f}s")
+
+    def record_success(self):
+        with self.lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit for {self.name} closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                logger.warning(f"Circuit for {self.name} opened after {self.failures} consecutive failures")
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+                self._probing = False
+                metrics.CIRCUIT_OPENED.inc(host=self.name)
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def circuit_breaker(host: str) -> CircuitBreaker:
+    """
+    The process-wide breaker for an upstream host, shared by every client that talks to it.
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker(host)
+        return breaker
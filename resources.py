@@ -0,0 +1,58 @@
+from dataclasses import dataclass
+import logging
+from typing import Dict, Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class Resource:
+    """
+    How to fetch one daily time series: the URL path (relative to the API base URL),
+    the list key in the response, and how to read a day's value from an entry.
+    """
+    path: str
+    key: str
+    value: Callable[[Dict[str, Any]], Optional[float]]
+    date_field: str = "dateTime"
+    # Longest range the endpoint accepts in one request
+    max_days: int = 1095
+
+def _activity(name: str, cast: Callable[[Any], float] = int) -> Resource:
+    return Resource(f"1/user/-/activities/{name}/date/{{start}}/{{end}}.json", f"activities-{name}",
+                    lambda entry: cast(entry["value"]))
+
+def _int(value: Any) -> int:
+    # Calories arrive as "2145" but occasionally as "2145.0"
+    return int(float(value))
+
+RESOURCES: Dict[str, Resource] = {
+    "steps": _activity("steps"),
+    "distance": _activity("distance", float),
+    "calories": _activity("calories", _int),
+    "minutes_fairly_active": _activity("minutesFairlyActive", _int),
+    "minutes_very_active": _activity("minutesVeryActive", _int),
+    "resting_heart_rate": Resource("1/user/-/activities/heart/date/{start}/{end}.json", "activities-heart",
+                                   lambda entry: entry["value"].get("restingHeartRate"), max_days=365),
+    # One entry per sleep log; logs ending on the same date are added up
+    "sleep_minutes": Resource("1.2/user/-/sleep/date/{start}/{end}.json", "sleep",
+                              lambda entry: entry["minutesAsleep"], date_field="dateOfSleep", max_days=100),
+}
+
+# Metrics derived by adding up other resources
+COMPOSITES: Dict[str, Tuple[str, ...]] = {
+    "active_minutes": ("minutes_fairly_active", "minutes_very_active"),
+}
+
+def expand(metrics: Tuple[str, ...]) -> Tuple[str, ...]:
+    """
+    Resolves metric names (resources or composites) into the resources to fetch.
+    """
+    needed = []
+    for metric in metrics:
+        parts = COMPOSITES.get(metric, (metric,))
+        for part in parts:
+            if part not in RESOURCES:
+                raise ValueError(f"Unknown metric: {metric}")
+            if part not in needed:
+                needed.append(part)
+    return tuple(needed)
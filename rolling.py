@@ -0,0 +1,241 @@
+import os
+import json
+import logging
+import tempfile
+from array import array
+from collections import deque
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Any, Deque, Optional, Sequence, Union
+
+from planner import QueryPlanner
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOWS = (7, 30, 90, 365)
+DEFAULT_ROLLING_FILE = "rolling_state.json"
+
+# Ring slot value for a day without data
+MISSING = -1
+
+class RollingAggregator:
+    """
+    Running sum, count, min and max of daily steps over several trailing windows
+    that all end on the latest day seen.
+    The last max(windows) days live in a ring buffer. A new day evicts one day
+    per window, and a changed day adjusts each sum by the difference, so updates
+    cost O(len(windows)) however long the windows are. Min/max use monotonic
+    deques; a change to an already recorded day can bring back a candidate the
+    deque dropped, so such edits mark the window for a rescan on its next read.
+    """
+    def __init__(self, windows: Sequence[int] = DEFAULT_WINDOWS):
+        if not windows or min(windows) < 1:
+            raise ValueError("Windows must be positive day counts")
+        self.windows = tuple(sorted(set(windows)))
+        self.size = self.windows[-1]
+        self.values = array("i", [MISSING]) * self.size
+        # Ordinal of the newest day in the ring
+        self.last_day: Optional[int] = None
+        self.sums: Dict[int, int] = {w: 0 for w in self.windows}
+        self.counts: Dict[int, int] = {w: 0 for w in self.windows}
+        # Ordinals whose values are decreasing (max) / increasing (min) from front to back
+        self._max: Dict[int, Deque[int]] = {w: deque() for w in self.windows}
+        self._min: Dict[int, Deque[int]] = {w: deque() for w in self.windows}
+        self._dirty = set()
+
+    def _value(self, day: int) -> int:
+        return self.values[day % self.size]
+
+    def _reset(self, last_day: int):
+        self.values = array("i", [MISSING]) * self.size
+        self.last_day = last_day
+        for w in self.windows:
+            self.sums[w] = 0
+            self.counts[w] = 0
+            self._max[w].clear()
+            self._min[w].clear()
+        self._dirty.clear()
+
+    def _advance(self, day: int):
+        if self.last_day is None or day - self.last_day >= self.size:
+            self._reset(day - 1)
+        for new_day in range(self.last_day + 1, day + 1):
+            for w in self.windows:
+                leaving = new_day - w
+                value = self._value(leaving)
+                if value != MISSING:
+                    self.sums[w] -= value
+                    self.counts[w] -= 1
+                if self._max[w] and self._max[w][0] == leaving:
+                    self._max[w].popleft()
+                if self._min[w] and self._min[w][0] == leaving:
+                    self._min[w].popleft()
+            # For the largest window the leaving day shares this slot, so clear it only now
+            self.values[new_day % self.size] = MISSING
+            self.last_day = new_day
+
+    @staticmethod
+    def _push(candidates: Deque[int], day: int, keep) -> None:
+        if candidates and candidates[-1] == day:
+            candidates.pop()
+        while candidates and not keep(candidates[-1]):
+            candidates.pop()
+        candidates.append(day)
+
+    def update(self, day: date, value: int) -> bool:
+        """
+        Records `value` for `day` (a new day or a change to a known one).
+        Returns False for days older than the largest window.
+        """
+        ordinal = day.toordinal()
+        if self.last_day is None or ordinal > self.last_day:
+            self._advance(ordinal)
+        elif ordinal <= self.last_day - self.size:
+            logger.debug(f"Ignoring {day}: older than the {self.size}-day window")
+            return False
+
+        old = self._value(ordinal)
+        if old == value:
+            return True
+        self.values[ordinal % self.size] = value
+        age = self.last_day - ordinal
+        for w in self.windows:
+            if age >= w:
+                continue
+            self.sums[w] += value - (0 if old == MISSING else old)
+            if old == MISSING:
+                self.counts[w] += 1
+            if w in self._dirty:
+                continue
+            if age == 0 and (old == MISSING or value >= old):
+                self._push(self._max[w], ordinal, lambda d: self._value(d) > value)
+            else:
+                self._dirty.add(w)
+                continue
+            if age == 0 and (old == MISSING or value <= old):
+                self._push(self._min[w], ordinal, lambda d: self._value(d) < value)
+            else:
+                self._dirty.add(w)
+        return True
+
+    def _rebuild(self, w: int):
+        self._max[w].clear()
+        self._min[w].clear()
+        for day in range(self.last_day - w + 1, self.last_day + 1):
+            value = self._value(day)
+            if value == MISSING:
+                continue
+            self._push(self._max[w], day, lambda d: self._value(d) > value)
+            self._push(self._min[w], day, lambda d: self._value(d) < value)
+        self._dirty.discard(w)
+
+    def window(self, days: int) -> Dict[str, Any]:
+        """
+        Stats for the trailing `days` window: sum, count of days with data,
+        mean per calendar day (missing days count as 0), min and max.
+        """
+        if days not in self.sums:
+            raise KeyError(f"No {days}-day window (configured: {self.windows})")
+        if days in self._dirty:
+            self._rebuild(days)
+        count = self.counts[days]
+        return {
+            "days": days,
+            "sum": self.sums[days],
+            "count": count,
+            "mean": round(self.sums[days] / days, 2),
+            "min": self._value(self._min[days][0]) if count else None,
+            "max": self._value(self._max[days][0]) if count else None,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        if self.last_day is None:
+            return {"windows": list(self.windows), "last_day": None, "values": []}
+        first = self.last_day - self.size + 1
+        return {
+            "windows": list(self.windows),
+            "last_day": date.fromordinal(self.last_day).isoformat(),
+            # Oldest to newest; null for days without data
+            "values": [None if v == MISSING else v for v in (self._value(d) for d in range(first, self.last_day + 1))],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], windows: Optional[Sequence[int]] = None) -> "RollingAggregator":
+        aggregator = cls(windows or data.get("windows") or DEFAULT_WINDOWS)
+        if data.get("last_day"):
+            last_day = date.fromisoformat(data["last_day"])
+            values = data.get("values", [])
+            first = last_day - timedelta(days=len(values) - 1)
+            for offset, value in enumerate(values):
+                if value is not None:
+                    aggregator.update(first + timedelta(days=offset), value)
+            # Keep the saved end day even if its trailing days had no data
+            if aggregator.last_day is None or aggregator.last_day < last_day.toordinal():
+                aggregator._advance(last_day.toordinal())
+        return aggregator
+
+    def save(self, path: Union[str, Path] = DEFAULT_ROLLING_FILE):
+        """
+        Atomically writes the aggregator state.
+        """
+        path = Path(path)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.to_dict(), f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: Union[str, Path] = DEFAULT_ROLLING_FILE,
+             windows: Optional[Sequence[int]] = None) -> "RollingAggregator":
+        """
+        Restores a saved aggregator, or returns an empty one if there is no usable state.
+        """
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls(windows or DEFAULT_WINDOWS)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable rolling state {path}: {e}")
+            return cls(windows or DEFAULT_WINDOWS)
+        return cls.from_dict(data, windows)
+
+def calculate_rolling_stats(client, aggregator: RollingAggregator, today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    calculate_stats on top of a RollingAggregator whose windows end yesterday.
+    Only days the aggregator has not seen, or that may still have changed, are fetched,
+    so a refresh usually asks the API for two days instead of thirty.
+    """
+    if not {7, 30} <= set(aggregator.windows):
+        raise ValueError("Rolling stats need 7- and 30-day windows")
+    today = today or datetime.now().date()
+    yesterday = today - timedelta(days=1)
+    oldest = yesterday - timedelta(days=aggregator.size - 1)
+    if aggregator.last_day is None:
+        start = oldest
+    else:
+        # The last stored day may still have been open when it was recorded
+        start = max(oldest, min(date.fromordinal(aggregator.last_day), yesterday))
+
+    planner = QueryPlanner(client)
+    today_query = planner.add("steps", today, today)
+    history_query = planner.add("steps", start, yesterday)
+    logger.info(f"Fetching data from {start} to {today}...")
+    planner.execute()
+
+    for day, value in history_query.series().items():
+        aggregator.update(day, value)
+
+    windows = {w: aggregator.window(w) for w in aggregator.windows}
+    return {
+        "today_steps": today_query.series().total(),
+        "weekly_avg": windows[7]["mean"],
+        "monthly_avg": windows[30]["mean"],
+        "days_counted_weekly": 7,
+        "days_counted_monthly": 30,
+        "rolling": {str(w): stats for w, stats in windows.items()},
+    }
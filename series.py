@@ -0,0 +1,130 @@
+from array import array
+from datetime import date, timedelta
+import logging
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def epoch_day(day: date) -> int:
+    """
+    Days since 1970-01-01.
+    """
+    return day.toordinal() - EPOCH_ORDINAL
+
+def from_epoch_day(days: int) -> date:
+    return date.fromordinal(days + EPOCH_ORDINAL)
+
+class StepSeries:
+    """
+    Daily step totals for a contiguous date range: the epoch day of the first
+    date plus one 4-byte int per day (days without data read as 0).
+    A year is ~1.5 KB instead of 365 dicts of strings. Lookups by date are O(1),
+    window() returns a zero-copy view and to_numpy() shares the same buffer.
+    """
+    __slots__ = ("start_day", "values")
+
+    def __init__(self, start: date, days: int = 0, values: Optional[Union[array, memoryview]] = None):
+        self.start_day = epoch_day(start)
+        self.values = values if values is not None else array("i", bytes(array("i").itemsize * days))
+
+    @classmethod
+    def for_range(cls, start: date, end: date) -> "StepSeries":
+        return cls(start, max(0, (end - start).days + 1))
+
+    @classmethod
+    def from_entries(cls, entries: List[Dict[str, Any]], start: date, end: date) -> "StepSeries":
+        """
+        Builds a series from API-style [{"dateTime": "YYYY-MM-DD", "value": "n"}, ...] entries.
+        """
+        series = cls.for_range(start, end)
+        for entry in entries:
+            series.set_entry(entry["dateTime"], entry["value"])
+        return series
+
+    @property
+    def start(self) -> date:
+        return from_epoch_day(self.start_day)
+
+    @property
+    def end(self) -> date:
+        return from_epoch_day(self.start_day + len(self.values) - 1)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def _index(self, day: date) -> int:
+        index = epoch_day(day) - self.start_day
+        if not 0 <= index < len(self.values):
+            raise KeyError(f"{day} is outside the series")
+        return index
+
+    def __contains__(self, day: date) -> bool:
+        return 0 <= epoch_day(day) - self.start_day < len(self.values)
+
+    def __getitem__(self, day: date) -> int:
+        return self.values[self._index(day)]
+
+    def get(self, day: date, default: int = 0) -> int:
+        index = epoch_day(day) - self.start_day
+        if 0 <= index < len(self.values):
+            return self.values[index]
+        return default
+
+    def set(self, day: date, value: int):
+        self.values[self._index(day)] = value
+
+    def set_entry(self, date_str: str, value: Any) -> bool:
+        """
+        Stores an API entry; returns False when its date falls outside the series.
+        """
+        index = epoch_day(date.fromisoformat(date_str)) - self.start_day
+        if not 0 <= index < len(self.values):
+            return False
+        self.values[index] = int(value)
+        return True
+
+    def window(self, start: date, end: date) -> "StepSeries":
+        """
+        Zero-copy sub-series for [start, end]; writes go through to this series.
+        """
+        first = self._index(start)
+        last = self._index(end)
+        return StepSeries(start, values=memoryview(self.values)[first:last + 1])
+
+    def total(self) -> int:
+        return sum(self.values)
+
+    def items(self) -> Iterator[Tuple[date, int]]:
+        day = self.start
+        for value in self.values:
+            yield day, value
+            day += timedelta(days=1)
+
+    def to_entries(self) -> List[Dict[str, Any]]:
+        """
+        The API's list-of-dicts shape, for callers that still expect it.
+        """
+        return [{"dateTime": day.strftime("%Y-%m-%d"), "value": str(value)} for day, value in self.items()]
+
+    def to_numpy(self):
+        """
+        int32 NumPy view over the same memory (no copy).
+        """
+        import numpy as np
+
+        return np.frombuffer(self.values, dtype=np.int32)
+
+def series_hook(series: StepSeries) -> Callable[[Dict[str, Any]], Any]:
+    """
+    Builds a json object_hook that writes {"dateTime": ..., "value": ...} entries
+    straight into `series` and drops them, so no list of dicts is ever built.
+    """
+    def hook(obj: Dict[str, Any]) -> Any:
+        if "dateTime" in obj and "value" in obj:
+            if not series.set_entry(obj["dateTime"], obj["value"]):
+                logger.debug(f"Ignoring entry for {obj['dateTime']} outside {series.start}..{series.end}")
+            return None
+        return obj
+    return hook
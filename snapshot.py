@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import time
+import logging
+import tempfile
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Union
+
+# Deliberately stdlib-only: the cached fast path in main.py must not pull in
+# requests or pydantic.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_FILE = "stats_snapshot.json"
+
+def save_snapshot(stats: Dict[str, Any], path: Union[str, Path] = DEFAULT_SNAPSHOT_FILE):
+    """
+    Atomically writes the last computed stats together with the time they were computed.
+    """
+    path = Path(path)
+    payload = {"saved_at": time.time(), "stats": stats}
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def load_snapshot(path: Union[str, Path] = DEFAULT_SNAPSHOT_FILE) -> Optional[Dict[str, Any]]:
+    """
+    Returns {"saved_at": epoch_seconds, "stats": {...}} or None if there is no usable snapshot.
+    """
+    try:
+        with open(path, "r") as f:
+            payload = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
+    if not isinstance(payload, dict) or "stats" not in payload or "saved_at" not in payload:
+        return None
+    return payload
+
+def snapshot_age(payload: Dict[str, Any]) -> float:
+    """
+    Seconds since the snapshot was saved.
+    """
+    return max(0.0, time.time() - payload["saved_at"])
+
+def refresh_lock_path(path: Union[str, Path]) -> Path:
+    path = Path(path)
+    return path.with_name(f".{path.name}.refresh")
+
+def acquire_refresh_lock(path: Union[str, Path] = DEFAULT_SNAPSHOT_FILE, stale_after: float = 300) -> bool:
+    """
+    Claims the right to refresh the snapshot, so back-to-back runs start one refresh, not one each.
+    A lock older than `stale_after` seconds is assumed to belong to a refresh that died and is taken over.
+    """
+    lock = refresh_lock_path(path)
+    for _ in range(2):
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - lock.stat().st_mtime < stale_after:
+                    return False
+                lock.unlink()
+            except FileNotFoundError:
+                pass
+            continue
+        with os.fdopen(fd, "w") as f:
+            f.write(str(os.getpid()))
+        return True
+    return False
+
+def release_refresh_lock(path: Union[str, Path] = DEFAULT_SNAPSHOT_FILE):
+    try:
+        refresh_lock_path(path).unlink()
+    except FileNotFoundError:
+        pass
+
+def spawn_refresh(args: List[str]) -> "subprocess.Popen":
+    """
+    Starts `python <args>` fully detached (own session, no stdio), so it outlives the caller
+    and never writes into the caller's terminal.
+    """
+    import subprocess
+
+    return subprocess.Popen([sys.executable, *args], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL, start_new_session=True, close_fds=True)
@@ -1,46 +1,40 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Sequence
 
 from api_client import FitbitClient
+from planner import QueryPlanner, Query
+from metrics import StageTimer
+from resources import COMPOSITES, expand
 
 logger = logging.getLogger(__name__)
 
-def calculate_stats(client: FitbitClient) -> Dict[str, Any]:
+def summarize_metric(parts: List[Query], today_parts: List[Query], yesterday: date) -> Dict[str, Any]:
     """
-    Orchestrates data fetching and statistics calculation.
+    Today's value plus weekly/monthly averages of one metric. Composite metrics add
+    up their parts per day. Unlike steps, the averages only count days that have
+    data, so e.g. a missing resting heart rate does not drag the average to 0.
+    """
+    by_day: Dict[str, float] = {}
+    for query in parts:
+        for entry in query.result():
+            by_day[entry["dateTime"]] = by_day.get(entry["dateTime"], 0) + float(entry["value"])
+    week_start = (yesterday - timedelta(days=6)).strftime("%Y-%m-%d")
+    weekly = [value for day, value in by_day.items() if day >= week_start]
+    monthly = list(by_day.values())
+    today_values = [float(entry["value"]) for query in today_parts for entry in query.result()]
+    return {
+        "today": sum(today_values) if today_values else None,
+        "weekly_avg": round(sum(weekly) / len(weekly), 2) if weekly else None,
+        "monthly_avg": round(sum(monthly) / len(monthly), 2) if monthly else None,
+        "days_counted_weekly": len(weekly),
+        "days_counted_monthly": len(monthly),
+    }
+
+def summarize_steps(today_steps: int, daily_values: Sequence[int]) -> Dict[str, Any]:
+    """
+    Builds the stats dict from today's steps and the last 30 days' totals (oldest first, ending yesterday).
     """
-    today = datetime.now().date()
-    today_str = today.strftime("%Y-%m-%d")
-    
-    # 1. Get today's steps
-    logger.info(f"Fetching data for today ({today_str})...")
-    today_steps = client.get_daily_steps(today_str)
-    
-    # 2. Get data for the last 30 days
-    yesterday = today - timedelta(days=1)
-    date_30_days_ago = yesterday - timedelta(days=29) # Total 30 days including yesterday
-    
-    start_date_str = date_30_days_ago.strftime("%Y-%m-%d")
-    end_date_str = yesterday.strftime("%Y-%m-%d")
-    
-    logger.info(f"Fetching historical data from {start_date_str} to {end_date_str}...")
-    time_series = client.get_step_time_series(start_date_str, end_date_str)
-    
-    # Parse time series map for date-based lookup
-    steps_by_date = {entry["dateTime"]: int(entry["value"]) for entry in time_series}
-    
-    # helper to generate date range
-    daily_values: List[int] = []
-    current_date = date_30_days_ago
-    
-    # Iterate through the expected 30 days
-    while current_date <= yesterday:
-        d_str = current_date.strftime("%Y-%m-%d")
-        steps = steps_by_date.get(d_str, 0) # Default to 0 if no data for date
-        daily_values.append(steps)
-        current_date += timedelta(days=1)
-        
     # Calculate averages
     # Weekly: Last 7 entries from the 30-day list
     last_7_days = daily_values[-7:]
@@ -57,3 +51,61 @@ def calculate_stats(client: FitbitClient) -> Dict[str, Any]:
         "days_counted_weekly": len(last_7_days),
         "days_counted_monthly": len(daily_values)
     }
+
+def calculate_stats(client: FitbitClient, metrics: Sequence[str] = ()) -> Dict[str, Any]:
+    """
+    Orchestrates data fetching and statistics calculation.
+    `metrics` adds other resources (see resources.py, e.g. "distance", "active_minutes");
+    they are fetched concurrently with the steps and reported under "metrics".
+    """
+    today = datetime.now().date()
+    today_str = today.strftime("%Y-%m-%d")
+    
+    # 1. Plan data for today and the last 30 days
+    yesterday = today - timedelta(days=1)
+    date_30_days_ago = yesterday - timedelta(days=29) # Total 30 days including yesterday
+    
+    start_date_str = date_30_days_ago.strftime("%Y-%m-%d")
+    
+    # Both windows are adjacent, so the planner fetches them with a single range call
+    planner = QueryPlanner(client)
+    today_query = planner.add("steps", today, today)
+    history_query = planner.add("steps", date_30_days_ago, yesterday)
+    extra = {
+        resource: (planner.add(resource, today, today), planner.add(resource, date_30_days_ago, yesterday))
+        for resource in expand(tuple(metrics))
+    }
+    
+    logger.info(f"Fetching data from {start_date_str} to {today_str}...")
+    stages = StageTimer()
+    stages.start("fetch")
+    planner.execute()
+    stages.start("parse")
+    
+    # 2. Today's steps (0 if the day has no entry yet)
+    today_steps = today_query.series().total()
+    
+    # One int per day from date_30_days_ago to yesterday; days without data are 0
+    daily_values = history_query.series().values
+        
+    stages.start("aggregate")
+    stats = summarize_steps(today_steps, daily_values)
+    if metrics:
+        stats["metrics"] = {
+            metric: summarize_metric([extra[part][1] for part in COMPOSITES.get(metric, (metric,))],
+                                     [extra[part][0] for part in COMPOSITES.get(metric, (metric,))], yesterday)
+            for metric in metrics
+        }
+    stages.stop()
+    return stats
+
+async def calculate_stats_async(client) -> Dict[str, Any]:
+    """
+    calculate_stats for an async_client.AsyncFitbitClient. Today and the last 30 days
+    come back in one range request, so a single await covers the whole computation.
+    """
+    today = datetime.now().date()
+    yesterday = today - timedelta(days=1)
+    date_30_days_ago = yesterday - timedelta(days=29)
+    series = await client.get_step_series(date_30_days_ago.strftime("%Y-%m-%d"), today.strftime("%Y-%m-%d"))
+    return summarize_steps(series.get(today), series.window(date_30_days_ago, yesterday).values)
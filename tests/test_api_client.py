@@ -1,12 +1,16 @@
 import unittest
+import json
+from datetime import date
 from unittest.mock import patch, MagicMock
 from api_client import FitbitClient
 from exceptions import FitbitAPIError
+from rate_limit import RateLimiter
+from resilience import CircuitBreaker
 
 class TestFitbitClient(unittest.TestCase):
     def setUp(self):
         self.access_token = "fake_token"
-        self.client = FitbitClient(self.access_token)
+        self.client = FitbitClient(self.access_token, breaker=CircuitBreaker())
 
     def test_headers_set_on_init(self):
         # Accessing session headers to verify they are set correctly
@@ -29,7 +33,7 @@ class TestFitbitClient(unittest.TestCase):
         
         self.assertEqual(steps, 1234)
         mock_get.assert_called_with(
-            "https://api.fitbit.com/1/user/-/activities/date/2023-01-01.json"
+            "https://api.fitbit.com/1/user/-/activities/date/2023-01-01.json", timeout=(3.05, 5.0)
         )
 
     @patch('requests.Session.get')
@@ -58,7 +62,145 @@ class TestFitbitClient(unittest.TestCase):
         
         self.assertEqual(data, mock_data)
         mock_get.assert_called_with(
-            "https://api.fitbit.com/1/user/-/activities/steps/date/2023-01-01/2023-01-02.json"
+            "https://api.fitbit.com/1/user/-/activities/steps/date/2023-01-01/2023-01-02.json", timeout=(3.05, 15.0)
+        )
+
+    def _response(self, status_code, json_data=None, headers=None):
+        response = MagicMock()
+        response.status_code = status_code
+        response.text = "error"
+        response.headers = headers or {}
+        response.json.return_value = json_data
+        return response
+
+    @patch('requests.Session.get')
+    def test_retries_retryable_errors(self, mock_get):
+        sleeps = []
+        client = FitbitClient("fake_token", rate_limiter=RateLimiter(sleep=sleeps.append))
+        mock_get.side_effect = [
+            self._response(503),
+            self._response(429, headers={"Retry-After": "0"}),
+            self._response(200, {"summary": {"steps": 10}}),
+        ]
+
+        self.assertEqual(client.get_daily_steps("2023-01-01"), 10)
+        self.assertEqual(mock_get.call_count, 3)
+        self.assertEqual(len(sleeps), 2)
+
+    @patch('requests.Session.get')
+    def test_gives_up_after_max_retries(self, mock_get):
+        client = FitbitClient("fake_token", rate_limiter=RateLimiter(sleep=lambda s: None), max_retries=2)
+        mock_get.return_value = self._response(500)
+
+        with self.assertRaises(FitbitAPIError) as cm:
+            client.get_daily_steps("2023-01-01")
+
+        self.assertEqual(cm.exception.status_code, 500)
+        self.assertEqual(mock_get.call_count, 3)
+
+    @patch('requests.Session.get')
+    def test_updates_budget_from_headers(self, mock_get):
+        mock_get.return_value = self._response(200, {"summary": {"steps": 1}}, headers={
+            "Fitbit-Rate-Limit-Limit": "150",
+            "Fitbit-Rate-Limit-Remaining": "42",
+            "Fitbit-Rate-Limit-Reset": "600",
+        })
+
+        self.client.get_daily_steps("2023-01-01")
+
+        self.assertEqual(self.client.bucket.remaining, 42)
+
+    def test_budget_keyed_by_user_not_token(self):
+        limiter = RateLimiter()
+        before = FitbitClient("old_token", rate_limiter=limiter, user_key="ABC123", breaker=CircuitBreaker())
+        after = FitbitClient("refreshed_token", rate_limiter=limiter, user_key="ABC123", breaker=CircuitBreaker())
+        other = FitbitClient("refreshed_token", rate_limiter=limiter, user_key="XYZ789", breaker=CircuitBreaker())
+
+        self.assertIs(before.bucket, after.bucket)
+        self.assertIsNot(after.bucket, other.bucket)
+
+    @patch('requests.Session.get')
+    def test_get_intraday_steps(self, mock_get):
+        payload = json.dumps({
+            "activities-steps": [{"dateTime": "2023-01-01", "value": "35"}],
+            "activities-steps-intraday": {
+                "dataset": [{"time": "00:00:00", "value": 5}, {"time": "12:34:00", "value": 30}],
+                "datasetInterval": 1,
+                "datasetType": "minute",
+            },
+        })
+        mock_response = self._response(200)
+        mock_response.json.side_effect = lambda **kwargs: json.loads(payload, **kwargs)
+        mock_get.return_value = mock_response
+
+        minutes = self.client.get_intraday_steps("2023-01-01")
+
+        self.assertEqual(len(minutes), 1440)
+        self.assertEqual(minutes[0], 5)
+        self.assertEqual(minutes[12 * 60 + 34], 30)
+        self.assertEqual(sum(minutes), 35)
+        mock_get.assert_called_with(
+            "https://api.fitbit.com/1/user/-/activities/steps/date/2023-01-01/1d/1min.json", timeout=(3.05, 20.0)
+        )
+
+    @patch('requests.Session.get')
+    def test_get_step_series(self, mock_get):
+        payload = json.dumps({"activities-steps": [
+            {"dateTime": "2023-01-01", "value": "100"},
+            {"dateTime": "2023-01-03", "value": "300"},
+        ]})
+        mock_response = self._response(200)
+        mock_response.json.side_effect = lambda **kwargs: json.loads(payload, **kwargs)
+        mock_get.return_value = mock_response
+
+        series = self.client.get_step_series("2023-01-01", "2023-01-03")
+
+        self.assertEqual(list(series.values), [100, 0, 300])
+        self.assertEqual(series.start, date(2023, 1, 1))
+        mock_get.assert_called_with(
+            "https://api.fitbit.com/1/user/-/activities/steps/date/2023-01-01/2023-01-03.json", timeout=(3.05, 15.0)
+        )
+
+    @patch('requests.Session.get')
+    def test_get_time_series_resting_heart_rate(self, mock_get):
+        mock_get.return_value = self._response(200, {"activities-heart": [
+            {"dateTime": "2023-01-01", "value": {"restingHeartRate": 58, "heartRateZones": []}},
+            {"dateTime": "2023-01-02", "value": {"heartRateZones": []}},
+        ]})
+
+        series = self.client.get_time_series("resting_heart_rate", "2023-01-01", "2023-01-02")
+
+        self.assertEqual(series, [{"dateTime": "2023-01-01", "value": 58}])
+        mock_get.assert_called_with(
+            "https://api.fitbit.com/1/user/-/activities/heart/date/2023-01-01/2023-01-02.json", timeout=(3.05, 10.0)
+        )
+
+    @patch('requests.Session.get')
+    def test_get_time_series_sleep_adds_up_logs(self, mock_get):
+        mock_get.return_value = self._response(200, {"sleep": [
+            {"dateOfSleep": "2023-01-02", "minutesAsleep": 30, "isMainSleep": False},
+            {"dateOfSleep": "2023-01-02", "minutesAsleep": 400, "isMainSleep": True},
+        ]})
+
+        series = self.client.get_time_series("sleep_minutes", "2023-01-01", "2023-01-02")
+
+        self.assertEqual(series, [{"dateTime": "2023-01-02", "value": 430}])
+        mock_get.assert_called_with("https://api.fitbit.com/1.2/user/-/sleep/date/2023-01-01/2023-01-02.json",
+                                    timeout=(3.05, 10.0))
+
+    def test_get_time_series_unknown_resource(self):
+        with self.assertRaises(ValueError):
+            self.client.get_time_series("floors_climbed", "2023-01-01", "2023-01-02")
+
+    @patch('requests.Session.post')
+    def test_create_subscription(self, mock_post):
+        mock_post.return_value = self._response(201, {"subscriptionId": "ABC", "collectionType": "activities"})
+
+        result = self.client.create_subscription("ABC")
+
+        self.assertEqual(result["subscriptionId"], "ABC")
+        mock_post.assert_called_with(
+            "https://api.fitbit.com/1/user/-/activities/apiSubscriptions/ABC.json", timeout=(3.05, 10.0)
         )
 
 if __name__ == '__main__':
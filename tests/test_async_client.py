@@ -0,0 +1,144 @@
+import json
+import time
+import asyncio
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from batch import run_batch_async
+from config import Settings
+from exceptions import FitbitAPIError
+from stats import calculate_stats_async
+from benchmarks.mock_fitbit import MockFitbitServer, steps_for
+import async_client
+from async_client import AsyncFitbitClient, create_session
+
+DAY = "2024-01-15"
+
+@unittest.skipIf(async_client.aiohttp is None, "aiohttp not installed")
+class TestAsyncFitbitClient(unittest.TestCase):
+    def setUp(self):
+        self.server = MockFitbitServer().start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def run_async(self, coro):
+        return asyncio.run(coro)
+
+    def test_same_results_as_sync_client(self):
+        async def fetch():
+            async with AsyncFitbitClient("token", api_base_url=self.server.url) as client:
+                return (await client.get_daily_steps(DAY),
+                        await client.get_step_time_series("2024-01-01", "2024-01-03"),
+                        await client.get_time_series("sleep_minutes", "2024-01-01", "2024-01-02"))
+
+        steps, series, sleep = self.run_async(fetch())
+
+        self.assertEqual(steps, steps_for(date.fromisoformat(DAY)))
+        self.assertEqual([e["dateTime"] for e in series], ["2024-01-01", "2024-01-02", "2024-01-03"])
+        self.assertEqual(sleep, [{"dateTime": "2024-01-01", "value": 420}, {"dateTime": "2024-01-02", "value": 420}])
+
+    def test_calculate_stats_async(self):
+        async def fetch():
+            async with AsyncFitbitClient("token", api_base_url=self.server.url) as client:
+                return await calculate_stats_async(client)
+
+        stats = self.run_async(fetch())
+
+        today = datetime.now().date()
+        week = [steps_for(today - timedelta(days=i)) for i in range(1, 8)]
+        self.assertEqual(stats["today_steps"], steps_for(today))
+        self.assertEqual(stats["weekly_avg"], round(sum(week) / 7, 2))
+        self.assertEqual(stats["days_counted_monthly"], 30)
+        self.assertEqual(self.server.requests, 1)
+
+    def test_per_user_limit(self):
+        self.server.latency = 0.2
+
+        async def fetch():
+            session = create_session()
+            try:
+                alice = AsyncFitbitClient("alice", session=session, api_base_url=self.server.url, per_user_limit=2)
+                bob = AsyncFitbitClient("bob", session=session, api_base_url=self.server.url, per_user_limit=2)
+                started = time.perf_counter()
+                await asyncio.gather(*(alice.get_daily_steps(DAY) for _ in range(4)))
+                one_user = time.perf_counter() - started
+                started = time.perf_counter()
+                await asyncio.gather(*(c.get_daily_steps(DAY) for c in (alice, bob) for _ in range(2)))
+                two_users = time.perf_counter() - started
+                return one_user, two_users
+            finally:
+                await session.close()
+
+        one_user, two_users = self.run_async(fetch())
+
+        # Four calls for one user go two at a time; split across two users they all overlap
+        self.assertGreaterEqual(one_user, 0.4)
+        self.assertLess(two_users, 0.35)
+
+    def test_retries_throttled_requests(self):
+        self.server.rate_limit_every = 2
+        delays = []
+
+        async def record(delay):
+            delays.append(delay)
+
+        async def fetch():
+            async with AsyncFitbitClient("token", api_base_url=self.server.url, sleep=record) as client:
+                await client.get_daily_steps(DAY)
+                return await client.get_daily_steps(DAY)
+
+        self.run_async(fetch())
+
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(self.server.throttled, 1)
+        self.assertTrue(delays)
+
+    def test_error_raises(self):
+        async def fetch():
+            async with AsyncFitbitClient("token", api_base_url=self.server.url) as client:
+                await client._get(f"{self.server.url}/1/user/-/unknown.json")
+
+        with self.assertRaises(FitbitAPIError) as ctx:
+            self.run_async(fetch())
+        self.assertEqual(ctx.exception.status_code, 404)
+
+    def test_cancellation_releases_slot(self):
+        self.server.latency = 0.2
+
+        async def fetch():
+            async with AsyncFitbitClient("token", api_base_url=self.server.url, per_user_limit=1) as client:
+                task = asyncio.ensure_future(client.get_daily_steps(DAY))
+                await asyncio.sleep(0.05)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+                self.server.latency = 0
+                return await asyncio.wait_for(client.get_daily_steps(DAY), timeout=1)
+
+        self.assertEqual(self.run_async(fetch()), steps_for(date.fromisoformat(DAY)))
+
+@unittest.skipIf(async_client.aiohttp is None, "aiohttp not installed")
+class TestRunBatchAsync(unittest.TestCase):
+    def test_users_share_one_session(self):
+        with tempfile.TemporaryDirectory() as tmp, MockFitbitServer() as server:
+            token_files = []
+            for name in ("alice", "bob", "carol"):
+                path = Path(tmp) / f"{name}.json"
+                path.write_text(json.dumps({"access_token": f"token-{name}", "refresh_token": "r",
+                                            "expires_at": time.time() + 3600 * 8}))
+                token_files.append(path)
+            (Path(tmp) / "broken.json").write_text("{}")
+            token_files.append(Path(tmp) / "broken.json")
+            settings = Settings(client_id="id", client_secret="secret", api_base_url=server.url, cache_file=None)
+
+            report = asyncio.run(run_batch_async(settings, token_files, max_users=2))
+
+        self.assertEqual([r.user_id for r in report.results], ["alice", "bob", "broken", "carol"])
+        self.assertEqual(report.succeeded, 3)
+        self.assertEqual(report.results[0].stats["today_steps"], steps_for(datetime.now().date()))
+        self.assertEqual(server.requests, 3)
+
+if __name__ == '__main__':
+    unittest.main()
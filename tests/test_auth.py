@@ -3,7 +3,7 @@ from unittest.mock import patch, mock_open, MagicMock
 import json
 import time
 from pathlib import Path
-from auth import FitbitAuth
+from auth import FitbitAuth, token_user_id
 from config import Settings
 
 class TestFitbitAuth(unittest.TestCase):
@@ -62,5 +62,50 @@ class TestFitbitAuth(unittest.TestCase):
         self.assertEqual(token, "auth_token")
         mock_authorize.assert_called_once()
 
+    @patch("auth.requests.post")
+    def test_token_requests_have_timeouts(self, mock_post):
+        mock_post.return_value = MagicMock(status_code=200)
+        mock_post.return_value.json.return_value = {"access_token": "new", "expires_in": 3600}
+        auth = FitbitAuth(self.settings.model_copy(update={"timeouts": {"oauth_token": (1.0, 2.0)}}))
+
+        with patch.object(auth, "save_token", return_value="new"):
+            auth.refresh_token({"refresh_token": "r"})
+
+        self.assertEqual(mock_post.call_args.kwargs["timeout"], (1.0, 2.0))
+
+    @patch("auth.requests.post")
+    def test_timed_out_code_exchange_raises_auth_error(self, mock_post):
+        import requests
+        from exceptions import FitbitAuthError
+        mock_post.side_effect = requests.Timeout("read timed out")
+
+        with self.assertRaises(FitbitAuthError):
+            self.auth.exchange_code_for_token("code")
+
+    def test_save_token_is_atomic(self):
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            token_file = Path(tmp) / "token.json"
+            token_file.write_text("old")
+            auth = FitbitAuth(self.settings.model_copy(update={"token_file": token_file}))
+
+            token = auth.save_token({"access_token": "new", "expires_in": 3600})
+
+            self.assertEqual(token, "new")
+            self.assertEqual(json.loads(token_file.read_text())["access_token"], "new")
+            self.assertEqual(auth.token_data["access_token"], "new")
+            # No temp files left behind
+            self.assertEqual([p.name for p in Path(tmp).iterdir()], ["token.json"])
+
+    def test_token_user_id(self):
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            token_file = Path(tmp) / "token.json"
+            self.assertEqual(token_user_id(token_file), "-")
+            token_file.write_text(json.dumps({"access_token": "a", "user_id": "ABC123"}))
+            self.assertEqual(token_user_id(token_file), "ABC123")
+            token_file.write_text(json.dumps({"access_token": "a"}))
+            self.assertEqual(token_user_id(token_file, default="local"), "local")
+
 if __name__ == '__main__':
     unittest.main()
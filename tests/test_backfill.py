@@ -0,0 +1,75 @@
+import unittest
+import threading
+from datetime import date, timedelta
+from backfill import plan_chunks, Backfill
+from exceptions import BackfillError, FitbitAPIError
+
+class ChunkClient:
+    def __init__(self, fail_on=()):
+        self.fail_on = set(fail_on)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get_step_time_series(self, start_date, end_date):
+        with self.lock:
+            self.calls.append((start_date, end_date))
+        if start_date in self.fail_on:
+            raise FitbitAPIError("boom", status_code=503)
+        start = date.fromisoformat(start_date)
+        end = date.fromisoformat(end_date)
+        # Overlap one day into the next chunk to exercise de-duplication
+        end += timedelta(days=1)
+        series = []
+        while start <= end:
+            series.append({"dateTime": start.isoformat(), "value": str(start.day)})
+            start += timedelta(days=1)
+        return series
+
+class TestPlanChunks(unittest.TestCase):
+    def test_three_years(self):
+        start = date(2020, 1, 1)
+        end = date(2023, 6, 30)
+        chunks = plan_chunks(start, end)
+        self.assertEqual(chunks[0][0], start)
+        self.assertEqual(chunks[-1][1], end)
+        for (_, prev_end), (next_start, _) in zip(chunks, chunks[1:]):
+            self.assertEqual(next_start, prev_end + timedelta(days=1))
+        for chunk_start, chunk_end in chunks:
+            self.assertLessEqual((chunk_end - chunk_start).days + 1, 1095)
+
+    def test_single_day(self):
+        day = date(2023, 1, 1)
+        self.assertEqual(plan_chunks(day, day), [(day, day)])
+
+class TestBackfill(unittest.TestCase):
+    def test_merges_in_order_without_duplicates(self):
+        client = ChunkClient()
+        backfill = Backfill(client, date(2023, 1, 1), date(2023, 3, 31), chunk_days=10, max_workers=4)
+
+        series = backfill.run()
+
+        dates = [entry["dateTime"] for entry in series]
+        self.assertEqual(len(client.calls), 9)
+        self.assertEqual(dates, sorted(set(dates)))
+        self.assertEqual(dates[0], "2023-01-01")
+        self.assertEqual(dates[-1], "2023-03-31")
+
+    def test_resume_after_partial_failure(self):
+        client = ChunkClient(fail_on={"2023-01-11"})
+        backfill = Backfill(client, date(2023, 1, 1), date(2023, 1, 30), chunk_days=10)
+
+        with self.assertRaises(BackfillError) as cm:
+            backfill.run()
+        self.assertEqual(cm.exception.failed_chunks, [(date(2023, 1, 11), date(2023, 1, 20))])
+        self.assertEqual(cm.exception.status_code, 503)
+
+        client.fail_on.clear()
+        client.calls.clear()
+        series = backfill.run()
+
+        self.assertEqual(client.calls, [("2023-01-11", "2023-01-20")])
+        self.assertEqual(len(series), 30)
+        self.assertEqual(series[-1]["dateTime"], "2023-01-30")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+from batch import assign_user_ids, discover_token_files, run_batch
+from config import Settings
+from exceptions import ConfigError, FitbitAuthError
+
+class TestDiscoverTokenFiles(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_directory(self):
+        for name in ["b.json", "a.json", "notes.txt"]:
+            (self.dir / name).write_text("{}")
+        self.assertEqual(discover_token_files(self.dir), [self.dir / "a.json", self.dir / "b.json"])
+
+    def test_manifest(self):
+        manifest = self.dir / "users.txt"
+        manifest.write_text("# enrolled users\nalice.json\n\n/abs/bob.json\n")
+        self.assertEqual(discover_token_files(manifest), [self.dir / "alice.json", Path("/abs/bob.json")])
+
+class TestAssignUserIds(unittest.TestCase):
+    def test_flat_directory_uses_stems(self):
+        files = [Path("/tokens/alice.json"), Path("/tokens/bob.json")]
+        self.assertEqual(assign_user_ids(files), {files[0]: "alice", files[1]: "bob"})
+
+    def test_same_file_name_in_different_directories(self):
+        files = [Path("/tokens/alice/token.json"), Path("/tokens/bob/token.json")]
+        self.assertEqual(assign_user_ids(files), {files[0]: "alice/token", files[1]: "bob/token"})
+
+    def test_duplicates_rejected(self):
+        with self.assertRaises(ConfigError):
+            assign_user_ids([Path("/tokens/alice.json"), Path("/tokens/../tokens/alice.json")])
+        with self.assertRaises(ConfigError):
+            assign_user_ids([Path("/tokens/alice.json"), Path("/tokens/alice")])
+
+class TestRunBatch(unittest.TestCase):
+    def setUp(self):
+        self.settings = Settings(client_id="test_id", client_secret="test_secret", cache_file=None)
+
+    @patch("batch.calculate_stats")
+    @patch("batch.FitbitClient")
+    @patch("batch.TokenManager")
+    def test_bad_token_does_not_stop_run(self, mock_manager, mock_client, mock_stats):
+        def get_token(token_file):
+            if token_file.stem == "bad":
+                raise FitbitAuthError("expired")
+            return f"token-{token_file.stem}"
+        mock_manager.return_value.get_token.side_effect = get_token
+        mock_stats.return_value = {"today_steps": 1}
+
+        files = [Path("alice.json"), Path("bad.json"), Path("carol.json")]
+        report = run_batch(self.settings, files, max_workers=2)
+
+        self.assertEqual([r.user_id for r in report.results], ["alice", "bad", "carol"])
+        self.assertEqual(report.succeeded, 2)
+        self.assertEqual(report.failed, 1)
+        self.assertEqual(report.results[1].error, "expired")
+        self.assertEqual(report.results[0].stats, {"today_steps": 1})
+        self.assertGreater(report.throughput, 0)
+        self.assertFalse(mock_manager.call_args.kwargs["interactive"])
+
+    @patch("batch.calculate_stats")
+    @patch("batch.FitbitClient")
+    @patch("batch.TokenManager")
+    def test_nested_token_files_do_not_collide(self, mock_manager, mock_client, mock_stats):
+        mock_stats.return_value = {"today_steps": 1}
+
+        files = [Path("/tokens/alice/token.json"), Path("/tokens/bob/token.json")]
+        report = run_batch(self.settings, files)
+
+        self.assertEqual([r.user_id for r in report.results], ["alice/token", "bob/token"])
+        with self.assertRaises(ConfigError):
+            run_batch(self.settings, files + files[:1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+from datetime import datetime, timedelta
+from cache import StepCache, CachedFitbitClient, bitmap_runs
+
+class FakeClient:
+    def __init__(self, value_fn=lambda d: 1000):
+        self.value_fn = value_fn
+        self.time_series_calls = []
+        self.daily_steps_calls = []
+
+    def get_daily_steps(self, date_str):
+        self.daily_steps_calls.append(date_str)
+        return 42
+
+    def get_step_time_series(self, start_date, end_date):
+        self.time_series_calls.append((start_date, end_date))
+        start = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end = datetime.strptime(end_date, "%Y-%m-%d").date()
+        series = []
+        while start <= end:
+            series.append({"dateTime": start.strftime("%Y-%m-%d"), "value": str(self.value_fn(start))})
+            start += timedelta(days=1)
+        return series
+
+class TestBitmapRuns(unittest.TestCase):
+    def test_runs(self):
+        # bits 0,1,2 set, 3 unset, 4 set, 5-6 unset, 7-8 set
+        bitmap = 0b110010111
+        self.assertEqual(bitmap_runs(bitmap, 100), [(100, 102), (104, 104), (107, 108)])
+
+    def test_empty(self):
+        self.assertEqual(bitmap_runs(0, 100), [])
+
+class TestCachedFitbitClient(unittest.TestCase):
+    def setUp(self):
+        self.today = datetime.now().date()
+        self.cache = StepCache(":memory:")
+        self.inner = FakeClient()
+        self.client = CachedFitbitClient(self.inner, self.cache)
+
+    def tearDown(self):
+        self.cache.close()
+
+    def _fmt(self, d):
+        return d.strftime("%Y-%m-%d")
+
+    def test_second_run_only_fetches_open_days(self):
+        start = self.today - timedelta(days=30)
+        end = self.today - timedelta(days=1)
+
+        first = self.client.get_step_time_series(self._fmt(start), self._fmt(end))
+        self.assertEqual(len(first), 30)
+        self.assertEqual(self.inner.time_series_calls, [(self._fmt(start), self._fmt(end))])
+
+        second = self.client.get_step_time_series(self._fmt(start), self._fmt(end))
+        self.assertEqual(second, first)
+        # Only yesterday is still open
+        self.assertEqual(self.inner.time_series_calls[1], (self._fmt(end), self._fmt(end)))
+        self.assertEqual(len(self.inner.time_series_calls), 2)
+
+    def test_step_series_from_cache(self):
+        start = self.today - timedelta(days=9)
+        end = self.today - timedelta(days=1)
+        self.client.get_step_time_series(self._fmt(start), self._fmt(end))
+
+        series = self.client.get_step_series(self._fmt(start), self._fmt(end))
+
+        self.assertEqual(len(series), 9)
+        self.assertEqual(series.total(), 9000)
+        self.assertEqual(series.start, start)
+
+    def test_fetches_only_gaps(self):
+        base = self.today - timedelta(days=20)
+        self.client.get_step_time_series(self._fmt(base), self._fmt(base + timedelta(days=4)))
+        self.inner.time_series_calls.clear()
+
+        self.client.get_step_time_series(self._fmt(base - timedelta(days=2)), self._fmt(base + timedelta(days=6)))
+
+        self.assertEqual(self.inner.time_series_calls, [
+            (self._fmt(base - timedelta(days=2)), self._fmt(base - timedelta(days=1))),
+            (self._fmt(base + timedelta(days=5)), self._fmt(base + timedelta(days=6))),
+        ])
+
+    def test_daily_steps_cached_only_when_final(self):
+        old = self._fmt(self.today - timedelta(days=5))
+        self.client.get_daily_steps(old)
+        self.client.get_daily_steps(old)
+        self.assertEqual(self.inner.daily_steps_calls, [old])
+
+        today = self._fmt(self.today)
+        self.client.get_daily_steps(today)
+        self.client.get_daily_steps(today)
+        self.assertEqual(self.inner.daily_steps_calls, [old, today, today])
+
+    def test_users_are_isolated(self):
+        other = CachedFitbitClient(self.inner, self.cache, user_id="other")
+        day = self._fmt(self.today - timedelta(days=10))
+        self.client.get_step_time_series(day, day)
+        other.get_step_time_series(day, day)
+        self.assertEqual(len(self.inner.time_series_calls), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from datetime import date, timedelta
+import numpy as np
+from cohort import build_matrix, rolling_mean, streaks, cohort_stats, summary_frame
+
+class TestCohort(unittest.TestCase):
+    def setUp(self):
+        self.start = date(2023, 1, 1)
+        self.end = self.start + timedelta(days=29)
+
+    def _series(self, values):
+        return [{"dateTime": (self.start + timedelta(days=i)).isoformat(), "value": str(v)}
+                for i, v in enumerate(values) if v is not None]
+
+    def test_build_matrix(self):
+        user_ids, matrix = build_matrix({
+            "bob": self._series([1, None, 3]),
+            "alice": [],
+            "carol": [{"dateTime": "2022-12-31", "value": "99"}],
+        }, self.start, self.end)
+
+        self.assertEqual(user_ids, ["alice", "bob", "carol"])
+        self.assertEqual(matrix.shape, (3, 30))
+        self.assertEqual(matrix[1, :3].tolist(), [1, 0, 3])
+        self.assertEqual(matrix[2].sum(), 0)
+
+    def test_rolling_mean(self):
+        matrix = np.arange(10, dtype=np.float64).reshape(1, 10)
+        out = rolling_mean(matrix, 3)
+        self.assertTrue(np.isnan(out[0, :2]).all())
+        self.assertEqual(out[0, 2:].tolist(), [1, 2, 3, 4, 5, 6, 7, 8])
+
+    def test_streaks(self):
+        matrix = np.array([[10, 10, 0, 10, 10, 10, 0, 10],
+                           [0, 0, 0, 0, 0, 0, 0, 0]], dtype=np.float64)
+        current, longest = streaks(matrix, goal=10)
+        self.assertEqual(current.tolist(), [1, 0])
+        self.assertEqual(longest.tolist(), [3, 0])
+
+    def test_matches_calculate_stats_semantics(self):
+        # Same scenario as TestStats.test_calculate_stats_varied_data:
+        # the last 10 days hold 0, 100, ..., 900
+        values = [0] * 20 + [i * 100 for i in range(10)]
+        user_ids, matrix = build_matrix({"u": self._series(values)}, self.start, self.end)
+        stats = cohort_stats(matrix, goal=500)
+
+        self.assertEqual(stats["weekly_avg"][0], 600.0)
+        self.assertEqual(stats["monthly_avg"][0], 150.0)
+        self.assertEqual(stats["current_streak"][0], 5)
+        self.assertEqual(stats["percentiles"].shape, (1, 4))
+        # Last week 300..900 vs prior week (0,0,0,0,0,100,200)
+        self.assertAlmostEqual(stats["wow_delta"][0], 600.0 - 300 / 7)
+
+    def test_summary_frame(self):
+        user_ids, matrix = build_matrix({"a": self._series([1000] * 30), "b": []}, self.start, self.end)
+        frame = summary_frame(user_ids, cohort_stats(matrix))
+        self.assertEqual(list(frame.index), ["a", "b"])
+        self.assertEqual(frame.loc["a", "monthly_avg"], 1000.0)
+        self.assertIn("p90", frame.columns)
+
+    def test_empty_matrix(self):
+        with self.assertRaises(ValueError):
+            cohort_stats(np.zeros((2, 0)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import json
+import unittest
+import http.client
+from unittest.mock import patch
+from config import Settings
+from exceptions import FitbitAuthError
+from daemon import StatsDaemon
+
+class TestStatsDaemon(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+        self.fail = False
+        self.error = RuntimeError("upstream down")
+        settings = Settings(client_id="test_id", client_secret="test_secret", cache_file=None)
+        self.daemon = StatsDaemon(settings, interval=3600, port=0, compute=self._compute)
+
+    def tearDown(self):
+        self.daemon.stop()
+
+    def _compute(self):
+        self.calls += 1
+        if self.fail:
+            raise self.error
+        return {"today_steps": self.calls}
+
+    def _get(self, conn, path="/stats"):
+        conn.request("GET", path)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+
+    def test_serves_cached_stats_without_recomputing(self):
+        self.daemon.start()
+        conn = http.client.HTTPConnection("127.0.0.1", self.daemon.port)
+        try:
+            for i in range(20):
+                status, body = self._get(conn, "/stats?t=%d" % i if i % 2 else "/stats")
+                self.assertEqual(status, 200)
+                self.assertEqual(body["stats"], {"today_steps": 1})
+        finally:
+            conn.close()
+        self.assertEqual(self.calls, 1)
+
+    def test_refresh_failure_keeps_previous_stats(self):
+        self.daemon.refresh()
+        self.fail = True
+        self.daemon.refresh()
+        status, body = self.daemon.response()
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["stats"], {"today_steps": 1})
+
+    def test_unavailable_before_first_refresh(self):
+        self.fail = True
+        self.daemon.start()
+        conn = http.client.HTTPConnection("127.0.0.1", self.daemon.port)
+        try:
+            status, _ = self._get(conn)
+            self.assertEqual(status, 503)
+            status, _ = self._get(conn, "/missing")
+            self.assertEqual(status, 404)
+        finally:
+            conn.close()
+
+    def test_authorization_required_reported(self):
+        self.fail = True
+        self.error = FitbitAuthError("No valid token and interactive authorization is disabled.")
+        self.daemon.refresh()
+        status, body = self.daemon.response()
+        self.assertEqual(status, 503)
+        self.assertEqual(json.loads(body), {"error": "authorization required"})
+
+        # Stats computed before the token lapsed keep being served
+        self.fail = False
+        self.daemon.refresh()
+        self.fail = True
+        self.daemon.refresh()
+        self.assertEqual(self.daemon.response()[0], 200)
+
+    @patch("daemon.TokenManager")
+    def test_token_manager_non_interactive_after_start(self, mock_manager):
+        mock_manager.return_value.get_token.side_effect = FitbitAuthError("no token")
+        self.daemon.compute = self.daemon._compute
+        self.daemon.start()
+
+        # The first refresh may prompt, later ones must not
+        self.assertTrue(mock_manager.call_args.kwargs["interactive"])
+        self.assertFalse(self.daemon.tokens.interactive)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import csv
+import json
+import time
+import tempfile
+import unittest
+from datetime import date, timedelta
+from pathlib import Path
+from config import Settings
+from exceptions import ConfigError
+from export import export_history, open_sink
+from benchmarks.mock_fitbit import MockFitbitServer, steps_for
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.api = MockFitbitServer().start()
+        self.token_files = []
+        for name in ("alice", "bob", "carol"):
+            path = self.dir / f"{name}.json"
+            path.write_text(json.dumps({"access_token": f"token-{name}", "refresh_token": "r",
+                                        "expires_at": time.time() + 3600 * 8}))
+            self.token_files.append(path)
+        self.settings = Settings(client_id="id", client_secret="secret", api_base_url=self.api.url, cache_file=None)
+        self.start = date(2023, 1, 1)
+        self.end = date(2023, 12, 31)
+
+    def tearDown(self):
+        self.api.stop()
+        self.tmp.cleanup()
+
+    def test_csv_export(self):
+        path = self.dir / "steps.csv"
+        report = export_history(self.settings, self.token_files, self.start, self.end, path, chunk_days=100)
+
+        self.assertEqual(report.rows, 3 * 365)
+        self.assertEqual(report.failed, [])
+        # 4 chunks per user
+        self.assertEqual(self.api.requests, 12)
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 3 * 365)
+        bob_day = next(r for r in rows if r["user_id"] == "bob" and r["date"] == "2023-06-01")
+        self.assertEqual(int(bob_day["steps"]), steps_for(date(2023, 6, 1)))
+
+    def test_parquet_export_writes_one_row_group_per_chunk(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest("pyarrow not installed")
+        path = self.dir / "steps.parquet"
+        export_history(self.settings, self.token_files, self.start, self.end, path, chunk_days=100)
+
+        parquet = pq.ParquetFile(path)
+        self.assertEqual(parquet.metadata.num_row_groups, 12)
+        table = parquet.read()
+        self.assertEqual(table.num_rows, 3 * 365)
+        self.assertEqual(table.column("date")[0].as_py(), self.start)
+        self.assertEqual(table.column("steps")[0].as_py(), steps_for(self.start))
+
+    def test_failed_user_is_reported(self):
+        (self.dir / "broken.json").write_text("{}")
+        report = export_history(self.settings, self.token_files + [self.dir / "broken.json"],
+                                self.start, self.start + timedelta(days=9), self.dir / "steps.csv")
+
+        self.assertEqual(report.failed, ["broken"])
+        self.assertEqual(report.rows, 30)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ConfigError):
+            open_sink(self.dir / "steps.xlsx")
+
+if __name__ == '__main__':
+    unittest.main()
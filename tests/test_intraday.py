@@ -0,0 +1,63 @@
+import unittest
+import json
+from datetime import date
+from intraday import (new_minute_array, minute_hook, hourly_sums, active_minutes,
+                      peak_hour, intraday_stats, IntradayHistory, MINUTES_PER_DAY)
+
+class TestIntraday(unittest.TestCase):
+    def setUp(self):
+        self.minutes = new_minute_array()
+        self.minutes[7 * 60 + 30] = 100  # 07:30
+        self.minutes[7 * 60 + 31] = 50
+        self.minutes[18 * 60] = 120      # 18:00
+
+    def test_new_minute_array(self):
+        minutes = new_minute_array()
+        self.assertEqual(len(minutes), MINUTES_PER_DAY)
+        self.assertEqual(sum(minutes), 0)
+
+    def test_minute_hook_fills_array(self):
+        payload = json.dumps({
+            "activities-steps": [{"dateTime": "2023-01-01", "value": "30"}],
+            "activities-steps-intraday": {
+                "dataset": [{"time": "00:01:00", "value": 10}, {"time": "23:59:00", "value": 20}],
+                "datasetInterval": 1,
+            },
+        })
+        minutes = new_minute_array()
+        data = json.loads(payload, object_hook=minute_hook(minutes))
+
+        self.assertEqual(minutes[1], 10)
+        self.assertEqual(minutes[1439], 20)
+        self.assertEqual(sum(minutes), 30)
+        self.assertEqual(data["activities-steps-intraday"]["dataset"], [None, None])
+
+    def test_hourly_stats(self):
+        sums = hourly_sums(self.minutes)
+        self.assertEqual(len(sums), 24)
+        self.assertEqual(sums[7], 150)
+        self.assertEqual(sums[18], 120)
+        self.assertEqual(peak_hour(self.minutes), 7)
+        self.assertEqual(active_minutes(self.minutes), 3)
+        self.assertEqual(active_minutes(self.minutes, threshold=100), 2)
+
+    def test_intraday_stats(self):
+        stats = intraday_stats(self.minutes)
+        self.assertEqual(stats["total_steps"], 270)
+        self.assertEqual(stats["active_minutes"], 3)
+        self.assertEqual(stats["peak_hour"], 7)
+
+    def test_history(self):
+        history = IntradayHistory(date(2023, 1, 1), days=365)
+        self.assertEqual(history.data.itemsize * len(history.data), 365 * MINUTES_PER_DAY * history.data.itemsize)
+
+        history.set_day(date(2023, 1, 2), self.minutes)
+        view = history.day(date(2023, 1, 2))
+        self.assertEqual(sum(view), 270)
+        self.assertEqual(history.active_minutes_by_day()[:3], [0, 3, 0])
+
+        with self.assertRaises(KeyError):
+            history.day(date(2024, 1, 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import tempfile
+import unittest
+from datetime import date, timedelta
+from pathlib import Path
+import numpy as np
+from intraday import new_minute_array, MINUTES_PER_DAY
+from intraday_store import IntradayStore, parse_time, sync_intraday, time_of_day_stats
+from series import epoch_day
+
+def minutes_for(day: date) -> list:
+    # Distinct per day and per minute, so misplaced records show up
+    base = day.toordinal() % 100
+    return [base + m % 7 for m in range(MINUTES_PER_DAY)]
+
+class FakeIntradayClient:
+    def __init__(self):
+        self.calls = []
+
+    def get_intraday_steps(self, date_str):
+        self.calls.append(date_str)
+        minutes = new_minute_array()
+        minutes[8 * 60] = date.fromisoformat(date_str).day
+        return minutes
+
+class TestIntradayStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.store = IntradayStore(self.root, grow_days=8)
+        self.start = date(2024, 1, 1)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def fill(self, days: int, user_id: str = "alice"):
+        for i in range(days):
+            day = self.start + timedelta(days=i)
+            self.store.put_day(user_id, day, minutes_for(day))
+
+    def test_round_trip_survives_reopen(self):
+        self.fill(20)
+        self.store.close()
+
+        store = IntradayStore(self.root)
+        self.addCleanup(store.close)
+        day = self.start + timedelta(days=13)
+        self.assertEqual(store.day("alice", day).tolist(), minutes_for(day))
+        self.assertEqual(len(store.days("alice")), 20)
+        self.assertIsNone(store.day("alice", date(2023, 1, 1)))
+        self.assertEqual(store.days("bob"), [])
+
+    def test_range_is_zero_copy_view(self):
+        self.fill(30)
+        days, minutes = self.store.range("alice", self.start + timedelta(days=5), self.start + timedelta(days=14))
+
+        self.assertEqual(minutes.shape, (10, MINUTES_PER_DAY))
+        self.assertFalse(minutes.flags.owndata)
+        self.assertIsInstance(minutes.base, np.memmap)
+        self.assertEqual(days[0], epoch_day(self.start + timedelta(days=5)))
+        self.assertEqual(minutes[3].tolist(), minutes_for(self.start + timedelta(days=8)))
+
+    def test_out_of_order_days_come_back_sorted(self):
+        for offset in (3, 0, 2, 1):
+            day = self.start + timedelta(days=offset)
+            self.store.put_day("alice", day, minutes_for(day))
+
+        days, minutes = self.store.range("alice", self.start, self.start + timedelta(days=3))
+
+        self.assertEqual(days.tolist(), [epoch_day(self.start) + i for i in range(4)])
+        for i in range(4):
+            self.assertEqual(minutes[i].tolist(), minutes_for(self.start + timedelta(days=i)))
+
+    def test_rewrite_updates_in_place(self):
+        self.fill(3)
+        updated = [5] * MINUTES_PER_DAY
+        self.store.put_day("alice", self.start, updated)
+        self.store.close()
+
+        store = IntradayStore(self.root)
+        self.addCleanup(store.close)
+        self.assertEqual(store.day("alice", self.start).tolist(), updated)
+        self.assertEqual(len(store.days("alice")), 3)
+        self.assertEqual(store.range("alice", self.start, self.start + timedelta(days=2))[1].shape[0], 3)
+
+    def test_views_stay_valid_when_file_grows(self):
+        self.fill(4)
+        view = self.store.day("alice", self.start)
+        self.fill(40)
+        self.assertEqual(view.tolist(), minutes_for(self.start))
+
+    def test_time_of_day(self):
+        minutes = new_minute_array()
+        minutes[parse_time("06:59")] = 1000
+        minutes[parse_time("07:00")] = 10
+        minutes[parse_time("08:59")] = 20
+        minutes[parse_time("09:00")] = 1000
+        self.store.put_day("alice", self.start, minutes)
+
+        days, steps = self.store.time_of_day("alice", self.start, self.start, "07:00", "09:00")
+
+        self.assertEqual(steps.tolist(), [30])
+        with self.assertRaises(ValueError):
+            self.store.time_of_day("alice", self.start, self.start, "09:00", "07:00")
+
+    def test_time_of_day_stats(self):
+        for i in range(10):
+            minutes = new_minute_array()
+            minutes[7 * 60 + 15] = 100 * i
+            self.store.put_day("alice", self.start + timedelta(days=i), minutes)
+
+        stats = time_of_day_stats(self.store, "alice", "07:00", "09:00", days=90,
+                                  today=self.start + timedelta(days=10))
+
+        self.assertEqual(stats["days_counted"], 10)
+        self.assertEqual(stats["total"], 4500)
+        self.assertEqual(stats["mean"], 450.0)
+        self.assertEqual(stats["max_day"], (self.start + timedelta(days=9)).isoformat())
+
+    def test_sync_fetches_only_missing_and_open_days(self):
+        client = FakeIntradayClient()
+        end = self.start + timedelta(days=4)
+
+        self.assertEqual(sync_intraday(self.store, client, "alice", self.start, end), 5)
+        self.assertEqual(sync_intraday(self.store, client, "alice", self.start, end, refetch_from=end), 1)
+        self.assertEqual(client.calls[-1], end.isoformat())
+        self.assertEqual(int(self.store.day("alice", end)[8 * 60]), end.day)
+
+if __name__ == '__main__':
+    unittest.main()
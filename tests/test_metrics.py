@@ -0,0 +1,108 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+import metrics
+from metrics import MetricsRegistry
+from api_client import FitbitClient
+from rate_limit import RateLimiter
+from stats import calculate_stats
+
+class StubClient:
+    def get_step_time_series(self, start_date, end_date):
+        return [{"dateTime": datetime.now().date().strftime("%Y-%m-%d"), "value": "1000"}]
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter_and_prometheus_text(self):
+        counter = self.registry.counter("requests_total", "Requests.")
+        counter.inc(endpoint="a", status="200")
+        counter.inc(2, endpoint="a", status="200")
+        counter.inc(endpoint='b"x', status="429")
+
+        text = self.registry.render_prometheus()
+
+        self.assertIn("# TYPE requests_total counter", text)
+        self.assertIn('requests_total{endpoint="a",status="200"} 3', text)
+        self.assertIn('requests_total{endpoint="b\\"x",status="429"} 1', text)
+        self.assertEqual(counter.value(endpoint="a", status="200"), 3)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = self.registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, endpoint="x")
+
+        text = self.registry.render_prometheus()
+
+        self.assertIn('latency_seconds_bucket{endpoint="x",le="0.1"} 2', text)
+        self.assertIn('latency_seconds_bucket{endpoint="x",le="1"} 3', text)
+        self.assertIn('latency_seconds_bucket{endpoint="x",le="+Inf"} 4', text)
+        self.assertIn('latency_seconds_count{endpoint="x"} 4', text)
+        self.assertEqual(histogram.count(endpoint="x"), 4)
+
+    def test_summary_quantiles_over_recent_window(self):
+        summary = self.registry.summary("latency_seconds", "Latency.", quantiles=(0.5, 0.99), window=100)
+        for value in range(1, 201):
+            summary.observe(value / 1000, endpoint="x")
+
+        # Only the last 100 observations (0.101..0.2) are kept
+        self.assertEqual(summary.count(endpoint="x"), 100)
+        self.assertEqual(summary.quantile(0.5, endpoint="x"), 0.15)
+        self.assertEqual(summary.quantile(0.99, endpoint="x"), 0.199)
+        self.assertIsNone(summary.quantile(0.5, endpoint="y"))
+        text = self.registry.render_prometheus()
+        self.assertIn("# TYPE latency_seconds summary", text)
+        self.assertIn('latency_seconds{endpoint="x",quantile="0.99"} 0.199', text)
+        self.assertIn('latency_seconds_count{endpoint="x"} 100', text)
+
+    def test_values_keep_full_precision(self):
+        self.registry.counter("bytes_total", "Bytes.").inc(123456789)
+        self.registry.histogram("seconds", "Seconds.", buckets=(0.1,)).observe(0.123456789)
+
+        text = self.registry.render_prometheus()
+
+        self.assertIn("bytes_total 123456789\n", text)
+        self.assertIn("seconds_sum 0.123456789\n", text)
+
+    def test_hooks(self):
+        seen = []
+        def failing_hook(name, labels, value):
+            raise RuntimeError("broken exporter")
+        self.registry.add_hook(failing_hook)
+        self.registry.add_hook(lambda name, labels, value: seen.append((name, labels, value)))
+
+        self.registry.counter("c", "C.").inc(5, kind="k")
+
+        self.assertEqual(seen, [("c", {"kind": "k"}, 5)])
+
+class TestInstrumentation(unittest.TestCase):
+    @patch('requests.Session.get')
+    def test_client_records_requests_and_retries(self, mock_get):
+        throttled = MagicMock(status_code=429, headers={"Retry-After": "0"}, content=b"{}")
+        ok = MagicMock(status_code=200, headers={}, content=b'{"summary": {"steps": 1}}')
+        ok.json.return_value = {"summary": {"steps": 1}}
+        mock_get.side_effect = [throttled, ok]
+        before_429 = metrics.REQUESTS.value(endpoint="daily_summary", status="429")
+        before_retries = metrics.RETRIES.value(endpoint="daily_summary", reason="429")
+        before_bytes = metrics.RESPONSE_BYTES.value(endpoint="daily_summary")
+        before_latency = metrics.REQUEST_SECONDS.count(endpoint="daily_summary")
+
+        client = FitbitClient("token", rate_limiter=RateLimiter(sleep=lambda s: None))
+        client.get_daily_steps("2023-01-01")
+
+        self.assertEqual(metrics.REQUESTS.value(endpoint="daily_summary", status="429") - before_429, 1)
+        self.assertEqual(metrics.RETRIES.value(endpoint="daily_summary", reason="429") - before_retries, 1)
+        self.assertEqual(metrics.RESPONSE_BYTES.value(endpoint="daily_summary") - before_bytes, 27)
+        self.assertEqual(metrics.REQUEST_SECONDS.count(endpoint="daily_summary") - before_latency, 2)
+
+    def test_stats_stages_are_timed(self):
+        before = {s: metrics.STAGE_SECONDS.count(stage=s) for s in ("fetch", "parse", "aggregate")}
+
+        calculate_stats(StubClient())
+
+        for name, count in before.items():
+            self.assertEqual(metrics.STAGE_SECONDS.count(stage=name), count + 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import time
+import unittest
+from datetime import datetime, timedelta
+from api_client import FitbitClient
+from rate_limit import RateLimiter
+from stats import calculate_stats
+from benchmarks.mock_fitbit import MockFitbitServer, steps_for
+from benchmarks.run_benchmarks import compare
+
+class TestAgainstMockServer(unittest.TestCase):
+    def test_calculate_stats_end_to_end(self):
+        with MockFitbitServer() as server:
+            client = FitbitClient("token", api_base_url=server.url)
+            stats = calculate_stats(client)
+
+        today = datetime.now().date()
+        week = [steps_for(today - timedelta(days=i)) for i in range(1, 8)]
+        self.assertEqual(stats["today_steps"], steps_for(today))
+        self.assertEqual(stats["weekly_avg"], round(sum(week) / 7, 2))
+        self.assertEqual(server.requests, 1)
+
+    def test_all_metrics_fetched_concurrently(self):
+        metrics = ["distance", "calories", "active_minutes", "resting_heart_rate", "sleep_minutes"]
+        with MockFitbitServer(latency=0.2) as server:
+            client = FitbitClient("token", api_base_url=server.url)
+            started = time.perf_counter()
+            stats = calculate_stats(client, metrics=metrics)
+            elapsed = time.perf_counter() - started
+
+        # steps + 6 resources, each one call; run back to back they would take ~1.4s
+        self.assertEqual(server.requests, 7)
+        self.assertLess(elapsed, 0.8)
+        today = datetime.now().date()
+        self.assertEqual(stats["today_steps"], steps_for(today))
+        self.assertEqual(stats["metrics"]["sleep_minutes"]["today"], 420)
+        self.assertEqual(stats["metrics"]["active_minutes"]["today"], 2 * (steps_for(today) // 100))
+        self.assertEqual(stats["metrics"]["resting_heart_rate"]["days_counted_monthly"], 30)
+
+    def test_intraday_end_to_end(self):
+        with MockFitbitServer() as server:
+            client = FitbitClient("token", api_base_url=server.url)
+            minutes = client.get_intraday_steps("2024-01-01")
+        self.assertEqual(sum(minutes), steps_for(datetime(2024, 1, 1).date()))
+
+    def test_injected_429_is_retried(self):
+        with MockFitbitServer(rate_limit_every=2) as server:
+            client = FitbitClient("token", api_base_url=server.url, rate_limiter=RateLimiter(sleep=lambda s: None))
+            client.get_daily_steps("2024-01-01")
+            steps = client.get_daily_steps("2024-01-01")
+        self.assertEqual(steps, steps_for(datetime(2024, 1, 1).date()))
+        self.assertEqual(server.throttled, 1)
+        self.assertEqual(server.requests, 3)
+
+class TestBaselineCompare(unittest.TestCase):
+    def test_flags_regressions_by_direction(self):
+        baseline = {"stats": {"p50_ms": 10.0, "requests": 1}, "client": {"rps": 100.0}}
+        results = {"stats": {"p50_ms": 20.0, "requests": 5}, "client": {"rps": 50.0}}
+        self.assertEqual(len(compare(results, baseline, tolerance=0.25)), 2)
+
+        results = {"stats": {"p50_ms": 11.0, "requests": 5}, "client": {"rps": 90.0}}
+        self.assertEqual(compare(results, baseline, tolerance=0.25), [])
+
+if __name__ == '__main__':
+    unittest.main()
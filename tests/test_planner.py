@@ -0,0 +1,83 @@
+import unittest
+from datetime import date, timedelta
+from planner import QueryPlanner
+
+class RangeClient:
+    def __init__(self):
+        self.calls = []
+
+    def get_step_time_series(self, start_date, end_date):
+        self.calls.append((start_date, end_date))
+        start = date.fromisoformat(start_date)
+        end = date.fromisoformat(end_date)
+        series = []
+        while start <= end:
+            series.append({"dateTime": start.isoformat(), "value": str(start.day)})
+            start += timedelta(days=1)
+        return series
+
+class SeriesClient(RangeClient):
+    def get_step_series(self, start_date, end_date, into=None):
+        entries = self.get_step_time_series(start_date, end_date)
+        for entry in entries:
+            into.set_entry(entry["dateTime"], entry["value"])
+        return into
+
+class TestQueryPlanner(unittest.TestCase):
+    def setUp(self):
+        self.client = RangeClient()
+        self.planner = QueryPlanner(self.client)
+
+    def test_merges_adjacent_and_overlapping(self):
+        a = self.planner.add("steps", date(2023, 1, 1), date(2023, 1, 10))
+        b = self.planner.add("steps", date(2023, 1, 11), date(2023, 1, 11))
+        c = self.planner.add("steps", date(2023, 1, 5), date(2023, 1, 7))
+        d = self.planner.add("steps", date(2023, 2, 1), date(2023, 2, 2))
+
+        calls = self.planner.execute()
+
+        self.assertEqual(calls, 2)
+        self.assertEqual(self.client.calls, [("2023-01-01", "2023-01-11"), ("2023-02-01", "2023-02-02")])
+        self.assertEqual(len(a.result()), 10)
+        self.assertEqual(b.result(), [{"dateTime": "2023-01-11", "value": "11"}])
+        self.assertEqual([e["dateTime"] for e in c.result()], ["2023-01-05", "2023-01-06", "2023-01-07"])
+        self.assertEqual(len(d.result()), 2)
+
+    def test_splits_ranges_beyond_api_limit(self):
+        planner = QueryPlanner(self.client, max_range_days=30)
+        query = planner.add("steps", date(2023, 1, 1), date(2023, 3, 1))
+
+        self.assertEqual(planner.execute(), 2)
+        self.assertEqual(len(query.result()), 60)
+
+    def test_series_queries_share_one_buffer(self):
+        client = SeriesClient()
+        planner = QueryPlanner(client, max_range_days=30)
+        a = planner.add("steps", date(2023, 1, 1), date(2023, 1, 31))
+        b = planner.add("steps", date(2023, 2, 1), date(2023, 2, 10))
+
+        self.assertEqual(planner.execute(), 2)
+
+        self.assertEqual(len(client.calls), 2)
+        self.assertEqual(a.series()[date(2023, 1, 31)], 31)
+        self.assertEqual(list(b.series().values), list(range(1, 11)))
+        self.assertIsInstance(b.series().values, memoryview)
+        self.assertEqual(b.result()[0], {"dateTime": "2023-02-01", "value": "1"})
+
+    def test_series_from_entries(self):
+        query = self.planner.add("steps", date(2023, 1, 1), date(2023, 1, 3))
+        self.planner.execute()
+
+        self.assertEqual(list(query.series().values), [1, 2, 3])
+
+    def test_unknown_resource(self):
+        with self.assertRaises(ValueError):
+            self.planner.add("floors", date(2023, 1, 1), date(2023, 1, 1))
+
+    def test_result_before_execute(self):
+        query = self.planner.add("steps", date(2023, 1, 1), date(2023, 1, 1))
+        with self.assertRaises(RuntimeError):
+            query.result()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import pstats
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+import main
+import stats
+from api_client import FitbitClient
+from resilience import CircuitBreaker
+from benchmarks.mock_fitbit import MockFitbitServer
+from profiling import Profiler
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name) / "profile"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_stage_records_time_and_allocations(self):
+        profiler = Profiler(self.dir)
+        profiler.start()
+        with profiler.stage("build"):
+            data = [bytes(1000) for _ in range(100)]
+        with profiler.stage("build"):
+            pass
+        profiler.stop()
+
+        stage = profiler.stages["build"]
+        self.assertEqual(stage.calls, 2)
+        self.assertGreater(stage.seconds, 0)
+        self.assertGreater(stage.net_bytes, 100 * 1000)
+        self.assertEqual(len(data), 100)
+
+    def test_install_wraps_and_uninstall_restores(self):
+        original = FitbitClient.get_step_series
+        profiler = Profiler(self.dir)
+        profiler.install()
+        try:
+            self.assertIsNot(FitbitClient.get_step_series, original)
+            self.assertTrue(hasattr(stats.summarize_steps, "__wrapped__"))
+        finally:
+            profiler.uninstall()
+        self.assertIs(FitbitClient.get_step_series, original)
+        self.assertFalse(hasattr(stats.summarize_steps, "__wrapped__"))
+        self.assertIn("import", profiler.stages)
+
+    def test_profiled_stats_run_writes_reports(self):
+        with MockFitbitServer() as server, Profiler(self.dir, sample_interval=0.001) as profiler:
+            client = FitbitClient("token", api_base_url=server.url, breaker=CircuitBreaker())
+            stats.calculate_stats(client)
+
+        for stage in ("client.get_step_series", "http", "json_decode", "aggregate"):
+            self.assertIn(stage, profiler.stages)
+        report = (self.dir / "report.txt").read_text()
+        self.assertIn("client.get_step_series", report)
+        self.assertIn("allocation sites", report)
+        self.assertGreater(pstats.Stats(str(self.dir / "profile.pstats")).total_calls, 0)
+        for line in (self.dir / "profile.folded").read_text().splitlines():
+            stack, count = line.rsplit(" ", 1)
+            self.assertTrue(stack.startswith("MainThread") or ";" in stack)
+            self.assertGreater(int(count), 0)
+
+    @patch("main.run")
+    @patch("main.load_settings")
+    def test_main_profile_flag(self, mock_settings, mock_run):
+        with patch("builtins.print"):
+            main.main(["--profile", str(self.dir)])
+
+        mock_run.assert_called_once()
+        self.assertTrue((self.dir / "report.txt").exists())
+        self.assertTrue((self.dir / "profile.folded").exists())
+        self.assertFalse(hasattr(FitbitClient.get_step_series, "__wrapped__"))
+
+if __name__ == '__main__':
+    unittest.main()
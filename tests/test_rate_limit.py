@@ -0,0 +1,61 @@
+import unittest
+from rate_limit import TokenBucket, RateLimiter, backoff_delay
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class TestTokenBucket(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.bucket = TokenBucket(limit=150, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_headers_drive_budget(self):
+        self.bucket.update({
+            "Fitbit-Rate-Limit-Limit": "150",
+            "Fitbit-Rate-Limit-Remaining": "1",
+            "Fitbit-Rate-Limit-Reset": "120",
+        })
+        self.bucket.acquire()
+        self.assertEqual(self.clock.sleeps, [])
+
+        # Budget spent: waits exactly until the reset window, then refills
+        self.bucket.acquire()
+        self.assertEqual(self.clock.sleeps, [120])
+        self.assertEqual(self.bucket.remaining, 149)
+
+    def test_reserve_is_never_spent(self):
+        bucket = TokenBucket(limit=2, reserve=1, clock=self.clock, sleep=self.clock.sleep)
+        bucket.acquire()
+        bucket.acquire()
+        self.assertEqual(len(self.clock.sleeps), 1)
+
+    def test_exhaust_uses_retry_after(self):
+        self.bucket.exhaust(30)
+        self.bucket.acquire()
+        self.assertEqual(self.clock.sleeps, [30])
+
+    def test_ignores_malformed_headers(self):
+        self.bucket.update({"Fitbit-Rate-Limit-Remaining": "n/a"})
+        self.assertEqual(self.bucket.remaining, 150)
+
+class TestRateLimiter(unittest.TestCase):
+    def test_bucket_per_user(self):
+        limiter = RateLimiter()
+        self.assertIs(limiter.bucket("a"), limiter.bucket("a"))
+        self.assertIsNot(limiter.bucket("a"), limiter.bucket("b"))
+
+    def test_backoff_is_capped(self):
+        for attempt in range(10):
+            self.assertLessEqual(backoff_delay(attempt, base=1.0, cap=5.0), 5.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import time
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+import requests
+import metrics
+from api_client import FitbitClient, HEDGE_MIN_SAMPLES
+from exceptions import CircuitOpenError
+from rate_limit import RateLimiter
+from resilience import CircuitBreaker, timeout_for, DEFAULT_TIMEOUT
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def ok_response(steps: int = 1):
+    response = MagicMock()
+    response.status_code = 200
+    response.headers = {}
+    response.content = b"{}"
+    response.json.return_value = {"summary": {"steps": steps}}
+    return response
+
+class TestTimeouts(unittest.TestCase):
+    def test_per_endpoint_and_overrides(self):
+        self.assertEqual(timeout_for("steps_intraday"), (3.05, 20.0))
+        self.assertEqual(timeout_for("unknown"), DEFAULT_TIMEOUT)
+        overrides = {"steps_intraday": (1, 2), "default": (0.5, 1)}
+        self.assertEqual(timeout_for("steps_intraday", overrides), (1, 2))
+        self.assertEqual(timeout_for("unknown", overrides), (0.5, 1))
+        # Endpoints with their own default keep it unless overridden by name
+        self.assertEqual(timeout_for("daily_summary", overrides), (3.05, 5.0))
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=10, clock=self.clock)
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.allow()
+        self.breaker.record_failure()
+
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.allow()
+
+    def test_half_open_lets_one_probe_through(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now = 10
+
+        self.breaker.allow()
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.allow()
+        self.breaker.record_success()
+        self.breaker.allow()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_probe_reopens(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now = 10
+        self.breaker.allow()
+        self.breaker.record_failure()
+
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.allow()
+        self.clock.now = 20
+        self.breaker.allow()
+
+class TestClientResilience(unittest.TestCase):
+    def client(self, **kwargs) -> FitbitClient:
+        kwargs.setdefault("breaker", CircuitBreaker("test", failure_threshold=2, reset_timeout=60))
+        return FitbitClient("token", rate_limiter=RateLimiter(sleep=lambda s: None), **kwargs)
+
+    @patch("requests.Session.get")
+    def test_timeouts_and_fail_fast(self, mock_get):
+        mock_get.side_effect = requests.ConnectTimeout("connect timed out")
+        client = self.client(timeouts={"daily_summary": (0.5, 1.0)})
+
+        for _ in range(2):
+            with self.assertRaises(requests.ConnectTimeout):
+                client.get_daily_steps("2023-01-01")
+        with self.assertRaises(CircuitOpenError):
+            client.get_daily_steps("2023-01-01")
+
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(mock_get.call_args.kwargs["timeout"], (0.5, 1.0))
+
+    @patch("requests.Session.get")
+    def test_server_errors_open_the_circuit_during_retries(self, mock_get):
+        failing = ok_response()
+        failing.status_code = 503
+        mock_get.return_value = failing
+
+        with self.assertRaises(CircuitOpenError):
+            self.client().get_daily_steps("2023-01-01")
+        self.assertEqual(mock_get.call_count, 2)
+
+    def test_slow_request_is_hedged(self):
+        client = self.client(hedge_percentile=0.9, api_base_url="http://hedge.test")
+        for _ in range(HEDGE_MIN_SAMPLES):
+            metrics.REQUEST_LATENCY.observe(0.01, host="hedge.test", endpoint="daily_summary")
+        calls = []
+        release = threading.Event()
+
+        def get(url, timeout):
+            calls.append(url)
+            if len(calls) == 1:
+                # The primary stalls until the test is over
+                release.wait(5)
+                return ok_response(1)
+            return ok_response(2)
+
+        before = metrics.HEDGED_REQUESTS.value(endpoint="daily_summary", winner="hedge")
+        with patch.object(client.session, "get", side_effect=get):
+            started = time.perf_counter()
+            steps = client.get_daily_steps("2023-01-01")
+            elapsed = time.perf_counter() - started
+        release.set()
+
+        self.assertEqual(steps, 2)
+        self.assertEqual(len(calls), 2)
+        self.assertLess(elapsed, 1)
+        self.assertEqual(metrics.HEDGED_REQUESTS.value(endpoint="daily_summary", winner="hedge") - before, 1)
+
+    def test_fast_request_is_not_hedged(self):
+        client = self.client(hedge_percentile=0.9, api_base_url="http://nohedge.test")
+        for _ in range(HEDGE_MIN_SAMPLES):
+            metrics.REQUEST_LATENCY.observe(1.0, host="nohedge.test", endpoint="daily_summary")
+
+        with patch.object(client.session, "get", return_value=ok_response()) as mock_get:
+            client.get_daily_steps("2023-01-01")
+
+        self.assertEqual(mock_get.call_count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
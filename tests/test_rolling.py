@@ -0,0 +1,106 @@
+import os
+import random
+import tempfile
+import unittest
+from datetime import date, timedelta
+from rolling import RollingAggregator, calculate_rolling_stats
+from stats import calculate_stats
+
+class RangeClient:
+    def __init__(self, value_fn):
+        self.value_fn = value_fn
+        self.calls = []
+
+    def get_step_time_series(self, start_date, end_date):
+        self.calls.append((start_date, end_date))
+        day = date.fromisoformat(start_date)
+        end = date.fromisoformat(end_date)
+        series = []
+        while day <= end:
+            series.append({"dateTime": day.isoformat(), "value": str(self.value_fn(day))})
+            day += timedelta(days=1)
+        return series
+
+class TestRollingAggregator(unittest.TestCase):
+    def _expected(self, values, last, days):
+        window = [values[d] for d in values if last - timedelta(days=days) < d <= last]
+        return {
+            "sum": sum(window),
+            "count": len(window),
+            "min": min(window) if window else None,
+            "max": max(window) if window else None,
+        }
+
+    def test_matches_brute_force_with_new_days_and_edits(self):
+        rng = random.Random(42)
+        aggregator = RollingAggregator(windows=(3, 7, 30))
+        values = {}
+        day = date(2024, 1, 1)
+        for step in range(400):
+            if step % 5 == 4 and values:
+                # Correct a recent day (sometimes the latest one)
+                edit = day - timedelta(days=rng.randrange(0, 10))
+                if edit in values or edit == day:
+                    values[edit] = rng.randrange(0, 20000)
+                    aggregator.update(edit, values[edit])
+            else:
+                day += timedelta(days=rng.choice((1, 1, 1, 2)))
+                values[day] = rng.randrange(0, 20000)
+                aggregator.update(day, values[day])
+
+            for w in (3, 7, 30):
+                result = aggregator.window(w)
+                expected = self._expected(values, day, w)
+                self.assertEqual({k: result[k] for k in expected}, expected, f"step {step}, window {w}")
+
+    def test_gap_longer_than_largest_window_resets(self):
+        aggregator = RollingAggregator(windows=(7,))
+        aggregator.update(date(2024, 1, 1), 100)
+        aggregator.update(date(2024, 3, 1), 5)
+
+        self.assertEqual(aggregator.window(7)["sum"], 5)
+        self.assertFalse(aggregator.update(date(2024, 1, 1), 100))
+
+    def test_save_and_load(self):
+        aggregator = RollingAggregator()
+        for i in range(400):
+            aggregator.update(date(2024, 1, 1) + timedelta(days=i), i)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rolling.json")
+            aggregator.save(path)
+            restored = RollingAggregator.load(path)
+
+        for w in aggregator.windows:
+            self.assertEqual(restored.window(w), aggregator.window(w))
+        self.assertEqual(restored.last_day, aggregator.last_day)
+
+    def test_load_missing_file(self):
+        aggregator = RollingAggregator.load("/nonexistent/rolling.json")
+        self.assertIsNone(aggregator.last_day)
+
+class TestRollingStats(unittest.TestCase):
+    def test_second_refresh_only_fetches_open_days(self):
+        client = RangeClient(lambda d: d.toordinal() % 1000)
+        today = date(2024, 6, 15)
+        aggregator = RollingAggregator()
+
+        first = calculate_rolling_stats(client, aggregator, today=today)
+        second = calculate_rolling_stats(client, aggregator, today=today + timedelta(days=1))
+
+        self.assertEqual(client.calls[0], ("2023-06-16", "2024-06-15"))
+        self.assertEqual(client.calls[1], ("2024-06-14", "2024-06-16"))
+        self.assertEqual(first["rolling"]["365"]["count"], 365)
+        self.assertEqual(second["today_steps"], (today + timedelta(days=1)).toordinal() % 1000)
+
+    def test_matches_calculate_stats(self):
+        client = RangeClient(lambda d: (d.toordinal() * 37) % 15000)
+
+        rolling = calculate_rolling_stats(client, RollingAggregator())
+        plain = calculate_stats(client)
+
+        for key in ("today_steps", "weekly_avg", "monthly_avg", "days_counted_weekly", "days_counted_monthly"):
+            self.assertEqual(rolling[key], plain[key])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import json
+from datetime import date
+from series import StepSeries, series_hook, epoch_day, from_epoch_day
+
+class TestStepSeries(unittest.TestCase):
+    def setUp(self):
+        self.series = StepSeries.for_range(date(2023, 1, 1), date(2023, 1, 10))
+        for i in range(10):
+            self.series.values[i] = (i + 1) * 100
+
+    def test_epoch_day(self):
+        self.assertEqual(epoch_day(date(1970, 1, 2)), 1)
+        self.assertEqual(from_epoch_day(epoch_day(date(2023, 5, 6))), date(2023, 5, 6))
+
+    def test_lookup_by_date(self):
+        self.assertEqual(len(self.series), 10)
+        self.assertEqual(self.series.end, date(2023, 1, 10))
+        self.assertEqual(self.series[date(2023, 1, 3)], 300)
+        self.assertEqual(self.series.get(date(2022, 12, 31)), 0)
+        self.assertNotIn(date(2023, 1, 11), self.series)
+        with self.assertRaises(KeyError):
+            self.series[date(2023, 1, 11)]
+
+    def test_window_is_zero_copy(self):
+        window = self.series.window(date(2023, 1, 4), date(2023, 1, 6))
+
+        self.assertEqual(list(window.values), [400, 500, 600])
+        self.assertEqual(window.start, date(2023, 1, 4))
+        self.assertEqual(window.total(), 1500)
+
+        window.set(date(2023, 1, 5), 1)
+        self.assertEqual(self.series[date(2023, 1, 5)], 1)
+
+    def test_numpy_view_shares_memory(self):
+        view = self.series.window(date(2023, 1, 2), date(2023, 1, 3)).to_numpy()
+
+        self.assertEqual(view.tolist(), [200, 300])
+        self.series.set(date(2023, 1, 2), 7)
+        self.assertEqual(view[0], 7)
+
+    def test_entries_round_trip(self):
+        entries = [{"dateTime": "2023-01-02", "value": "20"}, {"dateTime": "2023-02-01", "value": "99"}]
+        series = StepSeries.from_entries(entries, date(2023, 1, 1), date(2023, 1, 3))
+
+        self.assertEqual(list(series.values), [0, 20, 0])
+        self.assertEqual(series.to_entries()[1], {"dateTime": "2023-01-02", "value": "20"})
+
+    def test_series_hook_fills_series(self):
+        payload = json.dumps({"activities-steps": [
+            {"dateTime": "2023-01-01", "value": "10"},
+            {"dateTime": "2023-01-02", "value": "20"},
+        ]})
+        series = StepSeries.for_range(date(2023, 1, 1), date(2023, 1, 2))
+        data = json.loads(payload, object_hook=series_hook(series))
+
+        self.assertEqual(list(series.values), [10, 20])
+        self.assertEqual(data["activities-steps"], [None, None])
+
+if __name__ == '__main__':
+    unittest.main()
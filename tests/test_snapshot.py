@@ -0,0 +1,122 @@
+import io
+import os
+import json
+import time
+import unittest
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest.mock import patch
+import main
+from benchmarks.bench_startup import heavy_modules_loaded
+from snapshot import (save_snapshot, load_snapshot, snapshot_age, acquire_refresh_lock, release_refresh_lock,
+                      refresh_lock_path)
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "snapshot.json"
+        self.stats = {"today_steps": 1, "weekly_avg": 2.0, "monthly_avg": 3.0,
+                      "days_counted_weekly": 7, "days_counted_monthly": 30}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        save_snapshot(self.stats, self.path)
+        payload = load_snapshot(self.path)
+        self.assertEqual(payload["stats"], self.stats)
+        self.assertLess(snapshot_age(payload), 5)
+
+    def test_missing_or_corrupt(self):
+        self.assertIsNone(load_snapshot(self.path))
+        self.path.write_text("{not json")
+        self.assertIsNone(load_snapshot(self.path))
+
+    def test_cached_path_skips_heavy_imports(self):
+        # Startup regression guard: the cached CLI paths must stay stdlib-only
+        save_snapshot(self.stats, self.path)
+        for flag in ("--cached", "--swr"):
+            self.assertEqual(heavy_modules_loaded(self.path, flag), [])
+
+            with redirect_stdout(io.StringIO()) as out:
+                main.main([flag, "--snapshot", str(self.path)])
+            self.assertIn("Today's Steps:      1", out.getvalue())
+            self.assertIn("(cached, ", out.getvalue())
+
+    def test_refresh_lock(self):
+        self.assertTrue(acquire_refresh_lock(self.path))
+        self.assertFalse(acquire_refresh_lock(self.path))
+        # A lock left behind by a refresh that died is taken over
+        old = time.time() - 600
+        os.utime(refresh_lock_path(self.path), (old, old))
+        self.assertTrue(acquire_refresh_lock(self.path))
+        release_refresh_lock(self.path)
+        self.assertFalse(refresh_lock_path(self.path).exists())
+
+class TestStaleWhileRevalidate(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "snapshot.json"
+        self.stats = {"today_steps": 1, "weekly_avg": 2.0, "monthly_avg": 3.0,
+                      "days_counted_weekly": 7, "days_counted_monthly": 30}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def save(self, age: float):
+        save_snapshot(self.stats, self.path)
+        payload = json.loads(self.path.read_text())
+        payload["saved_at"] -= age
+        self.path.write_text(json.dumps(payload))
+
+    @patch("main.spawn_refresh")
+    @patch("main.load_settings")
+    def test_stale_snapshot_printed_and_refreshed_in_background(self, mock_settings, mock_spawn):
+        self.save(age=600)
+
+        main.main(["--swr", "--snapshot", str(self.path), "--include", "distance"])
+        main.main(["--swr", "--snapshot", str(self.path)])
+
+        mock_settings.assert_not_called()
+        # The second run sees the first refresh still in flight
+        mock_spawn.assert_called_once()
+        args = mock_spawn.call_args.args[0]
+        self.assertIn("--refresh-snapshot", args)
+        self.assertEqual(args[args.index("--include") + 1], "distance")
+        self.assertTrue(refresh_lock_path(self.path).exists())
+
+    @patch("main.spawn_refresh")
+    def test_fresh_snapshot_not_refreshed(self, mock_spawn):
+        self.save(age=10)
+        main.main(["--swr", "--snapshot", str(self.path)])
+        mock_spawn.assert_not_called()
+
+    @patch("main.fetch_stats")
+    @patch("main.load_settings")
+    def test_too_old_snapshot_blocks_for_fresh_data(self, mock_settings, mock_fetch):
+        self.save(age=7200)
+        mock_fetch.return_value = dict(self.stats, today_steps=42)
+
+        main.main(["--swr", "--max-age", "3600", "--snapshot", str(self.path)])
+
+        mock_fetch.assert_called_once()
+        payload = load_snapshot(self.path)
+        self.assertEqual(payload["stats"]["today_steps"], 42)
+        self.assertLess(snapshot_age(payload), 5)
+
+    @patch("main.fetch_stats")
+    @patch("main.load_settings")
+    def test_background_refresh_updates_snapshot_and_releases_lock(self, mock_settings, mock_fetch):
+        self.save(age=600)
+        acquire_refresh_lock(self.path)
+        mock_fetch.return_value = dict(self.stats, today_steps=42)
+
+        main.main(["--refresh-snapshot", "--snapshot", str(self.path)])
+
+        self.assertFalse(mock_fetch.call_args.kwargs["interactive"])
+        self.assertEqual(load_snapshot(self.path)["stats"]["today_steps"], 42)
+        self.assertFalse(refresh_lock_path(self.path).exists())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -15,7 +15,9 @@ class MockClient:
 
     def get_step_time_series(self, start_date, end_date):
         self.time_series_calls.append((start_date, end_date))
-        return self.time_series
+        # Like the real API, a range ending today includes today's total
+        today_entry = {"dateTime": datetime.now().date().strftime("%Y-%m-%d"), "value": str(self.daily_steps)}
+        return self.time_series + [today_entry]
 
 class TestStats(unittest.TestCase):
     def setUp(self):
@@ -52,6 +54,16 @@ class TestStats(unittest.TestCase):
         # self.assertEqual(stats["days_counted_weekly"], 7)
         # self.assertEqual(stats["days_counted_monthly"], 30)
 
+    def test_calculate_stats_single_round_trip(self):
+        client = MockClient(daily_steps=500, time_series=self._generate_time_series(30, lambda i: 1000))
+
+        calculate_stats(client)
+
+        start = self.yesterday - timedelta(days=29)
+        self.assertEqual(client.time_series_calls,
+                         [(start.strftime("%Y-%m-%d"), self.today.strftime("%Y-%m-%d"))])
+        self.assertEqual(client.daily_steps_calls, [])
+
     def test_calculate_stats_empty_history(self):
         client = MockClient(daily_steps=0, time_series=[])
         
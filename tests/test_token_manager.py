@@ -0,0 +1,125 @@
+import unittest
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+from unittest.mock import patch
+from config import Settings
+from token_manager import TokenManager
+from exceptions import FitbitAuthError
+
+class FakeTimer:
+    """
+    Records a scheduled refresh instead of starting a thread; fire() runs it.
+    """
+    def __init__(self, delay, function, args=()):
+        self.delay = delay
+        self.function = function
+        self.args = args
+        self.daemon = False
+        self.started = False
+        self.cancelled = False
+
+    @classmethod
+    def factory(cls, timers):
+        def create(*args, **kwargs):
+            timer = cls(*args, **kwargs)
+            timers.append(timer)
+            return timer
+        return create
+
+    def start(self):
+        self.started = True
+
+    def cancel(self):
+        self.cancelled = True
+
+    def fire(self):
+        self.function(*self.args)
+
+class TestTokenManager(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.token_file = Path(self.tmp.name) / "token.json"
+        self.settings = Settings(client_id="test_id", client_secret="test_secret", token_file=self.token_file)
+        self.manager = TokenManager(self.settings, interactive=False, background=False)
+
+    def tearDown(self):
+        self.manager.close()
+        self.tmp.cleanup()
+
+    def _write_token(self, access_token, expires_in):
+        with open(self.token_file, "w") as f:
+            json.dump({"access_token": access_token, "refresh_token": "ref",
+                       "expires_at": time.time() + expires_in}, f)
+
+    def _fake_refresh(self, calls):
+        def refresh(auth, token_data):
+            calls.append(token_data["refresh_token"])
+            time.sleep(0.05)
+            return auth.save_token({"access_token": "fresh", "refresh_token": "ref2", "expires_in": 28800})
+        return refresh
+
+    def test_reads_file_once(self):
+        self._write_token("cached", 3600)
+        self.assertEqual(self.manager.get_token(), "cached")
+
+        with patch("builtins.open") as mock_file:
+            self.assertEqual(self.manager.get_token(), "cached")
+            mock_file.assert_not_called()
+
+    def test_refreshes_before_expiry(self):
+        # Still valid, but inside the refresh margin
+        self._write_token("old", 60)
+        calls = []
+        with patch("auth.FitbitAuth.refresh_token", autospec=True, side_effect=self._fake_refresh(calls)):
+            self.assertEqual(self.manager.get_token(), "fresh")
+
+        self.assertEqual(calls, ["ref"])
+        with open(self.token_file) as f:
+            self.assertEqual(json.load(f)["refresh_token"], "ref2")
+
+    def test_concurrent_callers_share_one_refresh(self):
+        self._write_token("expired", -10)
+        calls = []
+        tokens = []
+        with patch("auth.FitbitAuth.refresh_token", autospec=True, side_effect=self._fake_refresh(calls)):
+            threads = [threading.Thread(target=lambda: tokens.append(self.manager.get_token())) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        self.assertEqual(calls, ["ref"])
+        self.assertEqual(tokens, ["fresh"] * 8)
+
+    def test_missing_file_non_interactive(self):
+        with self.assertRaises(FitbitAuthError):
+            self.manager.get_token()
+
+    def test_background_refresh_scheduled(self):
+        timers = []
+        manager = TokenManager(self.settings, refresh_margin=300, interactive=False, timer=FakeTimer.factory(timers))
+        self._write_token("soon", 3600)
+        calls = []
+        try:
+            with patch("auth.FitbitAuth.refresh_token", autospec=True, side_effect=self._fake_refresh(calls)):
+                self.assertEqual(manager.get_token(), "soon")
+                self.assertEqual(len(timers), 1)
+                self.assertAlmostEqual(timers[0].delay, 3300, delta=5)
+                self.assertEqual(calls, [])
+
+                timers[0].fire()
+
+            self.assertEqual(calls, ["ref"])
+            self.assertEqual(manager.get_token(), "fresh")
+            # The refreshed token schedules its own refresh
+            self.assertEqual(len(timers), 2)
+            self.assertAlmostEqual(timers[1].delay, 28500, delta=5)
+        finally:
+            manager.close()
+        self.assertTrue(timers[1].cancelled)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import json
+import time
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from config import Settings
+from cache import StepCache
+from webhook import (WebhookReceiver, NotificationQueue, Notification, sign, verify_signature,
+                     parse_notifications, date_runs)
+from benchmarks.mock_fitbit import MockFitbitServer, send_notifications, verify_subscriber, steps_for
+
+class TestSignature(unittest.TestCase):
+    def test_sign_matches_fitbit_scheme(self):
+        # base64(HMAC-SHA1("secret&", body))
+        self.assertEqual(sign(b"[]", "secret"), "vy40yZ+Xm7kAVBOfufPWvl40opU=")
+        self.assertTrue(verify_signature(b"[]", sign(b"[]", "secret"), "secret"))
+        self.assertFalse(verify_signature(b"[]", sign(b"[]", "other"), "secret"))
+        self.assertFalse(verify_signature(b"[]", None, "secret"))
+
+    def test_parse_skips_malformed_entries(self):
+        body = json.dumps([
+            {"collectionType": "activities", "date": "2024-01-02", "ownerId": "A", "subscriptionId": "A"},
+            {"collectionType": "activities", "date": "not-a-date", "ownerId": "B"},
+        ]).encode()
+        self.assertEqual(parse_notifications(body), [Notification("activities", date(2024, 1, 2), "A", "A")])
+
+class TestNotificationQueue(unittest.TestCase):
+    def test_dedupes_per_user_and_day(self):
+        queue = NotificationQueue()
+        a1 = Notification("activities", date(2024, 1, 2), "A")
+        a2 = Notification("activities", date(2024, 1, 1), "A")
+        b1 = Notification("activities", date(2024, 1, 2), "B")
+
+        self.assertEqual(queue.put([a1, a2, a1]), 2)
+        self.assertEqual(queue.put([a1, b1]), 1)
+
+        self.assertEqual(queue.drain(), {"A": [date(2024, 1, 1), date(2024, 1, 2)], "B": [date(2024, 1, 2)]})
+        self.assertEqual(len(queue), 0)
+
+    def test_date_runs(self):
+        days = [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 2), date(2024, 1, 5)]
+        self.assertEqual(date_runs(days), [(date(2024, 1, 1), date(2024, 1, 2)), (date(2024, 1, 5), date(2024, 1, 5))])
+
+class TestWebhookReceiver(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.api = MockFitbitServer().start()
+        self.token_files = []
+        for owner_id in ("USER1", "USER2"):
+            path = Path(self.tmp.name) / f"{owner_id}.json"
+            path.write_text(json.dumps({"access_token": f"token-{owner_id}", "refresh_token": "r",
+                                        "user_id": owner_id, "expires_at": time.time() + 3600 * 8}))
+            self.token_files.append(path)
+        self.settings = Settings(client_id="id", client_secret="secret", api_base_url=self.api.url,
+                                 cache_file=Path(self.tmp.name) / "cache.db",
+                                 subscriber_verification_code="verify-me")
+        self.receiver = WebhookReceiver(self.settings, self.token_files, port=0)
+        self.receiver.start(worker=False)
+
+    def tearDown(self):
+        self.receiver.stop()
+        self.api.stop()
+        self.tmp.cleanup()
+
+    def test_subscriber_verification(self):
+        self.assertEqual(verify_subscriber(self.receiver.url, "verify-me"), 204)
+        self.assertEqual(verify_subscriber(self.receiver.url, "wrong"), 404)
+
+    def test_rejects_bad_signature(self):
+        notification = {"collectionType": "activities", "date": "2024-01-02", "ownerId": "USER1"}
+        status = send_notifications(self.receiver.url, [notification], "secret", signature="forged")
+
+        self.assertEqual(status, 404)
+        self.assertEqual(len(self.receiver.queue), 0)
+
+    def test_fetches_only_changed_users_and_days(self):
+        changed = datetime.now().date() - timedelta(days=10)
+        notification = {"collectionType": "activities", "date": changed.isoformat(),
+                        "ownerId": "USER2", "ownerType": "user", "subscriptionId": "USER2"}
+
+        # Fitbit may deliver the same change more than once
+        self.assertEqual(send_notifications(self.receiver.url, [notification, notification], "secret"), 204)
+        self.assertEqual(send_notifications(self.receiver.url, [notification], "secret"), 204)
+        self.assertEqual(self.receiver.process_pending(), 1)
+
+        self.assertEqual(self.api.requests, 1)
+        cache = StepCache(self.settings.cache_file)
+        try:
+            self.assertEqual(cache.get_range("USER2", changed, changed), {changed.toordinal(): (steps_for(changed), True)})
+            self.assertEqual(cache.get_range("USER1", changed, changed), {})
+        finally:
+            cache.close()
+
+    def test_unknown_owner_is_ignored(self):
+        notification = {"collectionType": "activities", "date": "2024-01-02", "ownerId": "STRANGER"}
+        send_notifications(self.receiver.url, [notification], "secret")
+
+        self.assertEqual(self.receiver.process_pending(), 0)
+        self.assertEqual(self.api.requests, 0)
+
+if __name__ == '__main__':
+    unittest.main()
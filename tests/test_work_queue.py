@@ -0,0 +1,158 @@
+import json
+import time
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from pathlib import Path
+from batch import UserResult
+from config import Settings
+from work_queue import WorkQueue, run_worker, shard_of, PENDING, LEASED, DONE, FAILED
+from benchmarks.mock_fitbit import MockFitbitServer, steps_for
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TestWorkQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "queue.db"
+        self.clock = FakeClock()
+        self.queue = WorkQueue(self.path, lease_seconds=60, max_attempts=2, clock=self.clock)
+        self.files = [Path(f"/tokens/user{i}.json") for i in range(10)]
+        self.queue.enqueue(self.files)
+
+    def tearDown(self):
+        self.queue.close()
+        self.tmp.cleanup()
+
+    def other(self) -> WorkQueue:
+        queue = WorkQueue(self.path, lease_seconds=60, max_attempts=2, clock=self.clock)
+        self.addCleanup(queue.close)
+        return queue
+
+    def test_claims_never_overlap(self):
+        queues = [self.queue, self.other(), self.other()]
+        claimed = []
+        lock = threading.Lock()
+
+        def work(queue, worker):
+            while True:
+                jobs = queue.claim(worker, limit=2)
+                if not jobs:
+                    return
+                with lock:
+                    claimed.extend(job.user_id for job in jobs)
+
+        threads = [threading.Thread(target=work, args=(q, f"w{i}")) for i, q in enumerate(queues)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(claimed), sorted(f.stem for f in self.files))
+        self.assertEqual(self.queue.counts(), {LEASED: 10})
+
+    def test_shards_partition_users(self):
+        users = []
+        for shard in range(3):
+            jobs = self.queue.claim(f"w{shard}", limit=10, shard=shard, num_shards=3)
+            self.assertTrue(all(shard_of(job.user_id, 3) == shard for job in jobs))
+            users.extend(job.user_id for job in jobs)
+        self.assertEqual(sorted(users), sorted(f.stem for f in self.files))
+
+    def test_expired_lease_is_reclaimed(self):
+        job = self.queue.claim("crashed")[0]
+        self.clock.now += 61
+
+        taken = self.other().claim("rescuer", limit=10)
+
+        self.assertIn(job.id, [j.id for j in taken])
+        self.assertEqual(next(j for j in taken if j.id == job.id).attempts, 2)
+        # The original worker's late result is rejected
+        self.assertFalse(self.queue.complete(job.id, "crashed", {"late": True}))
+        self.assertTrue(self.queue.complete(job.id, "rescuer", {"ok": True}))
+        self.assertEqual(self.queue.get(job.user_id).result, {"ok": True})
+
+    def test_heartbeat_keeps_lease(self):
+        job = self.queue.claim("w1")[0]
+        self.clock.now += 50
+        self.assertTrue(self.queue.heartbeat(job.id, "w1"))
+        self.clock.now += 50
+
+        self.assertNotIn(job.id, [j.id for j in self.other().claim("w2", limit=10)])
+        self.assertFalse(self.queue.heartbeat(job.id, "w2"))
+
+    def test_failed_job_retries_then_gives_up(self):
+        job = self.queue.claim("w1")[0]
+        self.assertTrue(self.queue.fail(job.id, "w1", "timeout"))
+        self.assertEqual(self.queue.get(job.user_id).state, PENDING)
+
+        job = self.queue.claim("w1")[0]
+        self.assertEqual(job.attempts, 2)
+        self.queue.fail(job.id, "w1", "timeout")
+
+        self.assertEqual(self.queue.get(job.user_id).state, FAILED)
+        self.assertEqual(self.queue.get(job.user_id).error, "timeout")
+
+    def test_enqueue_requeues_finished_but_not_leased_jobs(self):
+        done, running = self.queue.claim("w1", limit=2)
+        self.queue.complete(done.id, "w1", {})
+
+        self.assertEqual(self.queue.enqueue([done.token_file, running.token_file]), 1)
+        self.assertEqual(self.queue.get(done.user_id).state, PENDING)
+        self.assertEqual(self.queue.get(running.user_id).state, LEASED)
+
+class TestRunWorker(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.settings = Settings(client_id="id", client_secret="secret", cache_file=None)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_end_to_end(self):
+        token_files = []
+        for name in ("alice", "bob"):
+            path = self.dir / f"{name}.json"
+            path.write_text(json.dumps({"access_token": f"token-{name}", "refresh_token": "r",
+                                        "expires_at": time.time() + 3600 * 8}))
+            token_files.append(path)
+        token_files.append(self.dir / "missing.json")
+
+        with MockFitbitServer() as server:
+            settings = Settings(client_id="id", client_secret="secret", api_base_url=server.url, cache_file=None)
+            queue = WorkQueue(self.dir / "queue.db", max_attempts=1)
+            queue.enqueue(token_files)
+            report = run_worker(settings, queue, worker="w1")
+
+        self.assertEqual((report.processed, report.succeeded, report.failed), (3, 2, 1))
+        self.assertEqual(queue.counts(), {DONE: 2, FAILED: 1})
+        stats = queue.get("alice").result["stats"]
+        self.assertEqual(stats["today_steps"], steps_for(datetime.now().date()))
+        queue.close()
+
+    def test_waits_for_other_workers_leases(self):
+        queue = WorkQueue(self.dir / "queue.db", lease_seconds=0.3)
+        queue.enqueue([Path("alice.json")])
+        queue.claim("crashed")
+        processed = []
+
+        def process(tokens, token_file, cache, user_id, rate_limiter):
+            processed.append(user_id)
+            return UserResult(user_id=user_id, token_file=token_file, stats={})
+
+        report = run_worker(self.settings, queue, worker="w2", poll_interval=0.05, process=process)
+
+        self.assertEqual(processed, ["alice"])
+        self.assertEqual(report.succeeded, 1)
+        self.assertEqual(queue.get("alice").state, DONE)
+        queue.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, Callable, Optional, Union
+
+from config import Settings
+from auth import FitbitAuth
+from exceptions import FitbitAuthError
+
+logger = logging.getLogger(__name__)
+
+class _TokenState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.token_data: Optional[Dict[str, Any]] = None
+        self.timer: Optional[threading.Timer] = None
+
+class TokenManager:
+    """
+    In-memory token store keyed by token file.
+    Token files are read once, tokens are refreshed `refresh_margin` seconds
+    before they expire (in the background when `background` is set), and
+    concurrent callers for the same user share a single refresh request.
+    """
+    def __init__(self, settings: Settings, refresh_margin: float = 300, interactive: bool = True,
+                 background: bool = True, timer: Callable[..., threading.Timer] = threading.Timer):
+        self.settings = settings
+        self.refresh_margin = refresh_margin
+        self.interactive = interactive
+        self.background = background
+        # Factory for the background refresh timers (threading.Timer signature)
+        self.timer = timer
+        self._states: Dict[Path, _TokenState] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _state(self, token_file: Path) -> _TokenState:
+        with self._lock:
+            if token_file not in self._states:
+                self._states[token_file] = _TokenState()
+            return self._states[token_file]
+
+    def _auth(self, token_file: Path) -> FitbitAuth:
+        settings = self.settings.model_copy(update={"token_file": token_file})
+        return FitbitAuth(settings, interactive=self.interactive)
+
+    def get_token(self, token_file: Optional[Union[str, Path]] = None) -> str:
+        """
+        Returns a valid access token, touching disk or the network only when needed.
+        """
+        token_file = Path(token_file or self.settings.token_file)
+        state = self._state(token_file)
+
+        token_data = state.token_data
+        if token_data and token_data.get("expires_at", 0) - self.refresh_margin > time.time():
+            return token_data["access_token"]
+
+        # Only one caller per user gets past this lock at a time; the rest
+        # wait and then find the token it obtained.
+        with state.lock:
+            token_data = state.token_data
+            if token_data is None:
+                token_data = self._load(token_file)
+            if token_data is None or token_data.get("expires_at", 0) - self.refresh_margin <= time.time():
+                token_data = self._refresh(token_file, token_data)
+            state.token_data = token_data
+            self._schedule(token_file, state)
+            return token_data["access_token"]
+
+    def _load(self, token_file: Path) -> Optional[Dict[str, Any]]:
+        if not token_file.exists():
+            return None
+        try:
+            with open(token_file, "r") as f:
+                token_data = json.load(f)
+        except json.JSONDecodeError as e:
+            logger.error(f"Error reading token file {token_file}: {e}")
+            return None
+        if "access_token" not in token_data:
+            logger.error(f"Token file {token_file} has no access_token")
+            return None
+        return token_data
+
+    def _refresh(self, token_file: Path, token_data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        auth = self._auth(token_file)
+        if token_data and "refresh_token" in token_data:
+            logger.info(f"Refreshing token for {token_file}...")
+            auth.refresh_token(token_data)
+        else:
+            auth.authorize()
+        if auth.token_data is None:
+            raise FitbitAuthError(f"Token refresh for {token_file} returned no token")
+        return auth.token_data
+
+    def _schedule(self, token_file: Path, state: _TokenState):
+        if not self.background or self._closed:
+            return
+        if state.timer is not None:
+            state.timer.cancel()
+        delay = max(0.0, state.token_data.get("expires_at", 0) - self.refresh_margin - time.time())
+        state.timer = self.timer(delay, self._background_refresh, args=(token_file, state))
+        state.timer.daemon = True
+        state.timer.start()
+
+    def _background_refresh(self, token_file: Path, state: _TokenState):
+        with state.lock:
+            if self._closed:
+                return
+            try:
+                # Non-interactive: a background thread must never open a browser
+                auth = self._auth(token_file)
+                auth.interactive = False
+                auth.refresh_token(state.token_data)
+                if auth.token_data is not None:
+                    state.token_data = auth.token_data
+                    self._schedule(token_file, state)
+            except Exception as e:
+                # The next get_token() call retries synchronously
+                logger.warning(f"Background token refresh for {token_file} failed: {e}")
+
+    def close(self):
+        """
+        Cancels pending background refreshes.
+        """
+        self._closed = True
+        with self._lock:
+            for state in self._states.values():
+                if state.timer is not None:
+                    state.timer.cancel()
@@ -0,0 +1,300 @@
+import hmac
+import json
+import base64
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+from config import Settings
+from exceptions import FitbitAPIError
+from token_manager import TokenManager
+from api_client import FitbitClient
+from cache import StepCache, CachedFitbitClient
+from rate_limit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "X-Fitbit-Signature"
+
+@dataclass(frozen=True)
+class Notification:
+    """
+    One entry of a Fitbit subscription notification: `owner_id`'s `collection_type` data changed on `date`.
+    """
+    collection_type: str
+    date: date
+    owner_id: str
+    subscription_id: str = ""
+
+def sign(body: bytes, client_secret: str) -> str:
+    """
+    Fitbit's notification signature: base64(HMAC-SHA1(body)) keyed with the client secret plus '&'.
+    """
+    digest = hmac.new(f"{client_secret}&".encode(), body, hashlib.sha1).digest()
+    return base64.b64encode(digest).decode()
+
+def verify_signature(body: bytes, signature: Optional[str], client_secret: str) -> bool:
+    if not signature:
+        return False
+    return hmac.compare_digest(sign(body, client_secret), signature)
+
+def parse_notifications(body: bytes) -> List[Notification]:
+    """
+    Parses a notification body, skipping malformed entries.
+    """
+    notifications = []
+    for entry in json.loads(body):
+        try:
+            notifications.append(Notification(
+                collection_type=entry["collectionType"],
+                date=datetime.strptime(entry["date"], "%Y-%m-%d").date(),
+                owner_id=entry["ownerId"],
+                subscription_id=entry.get("subscriptionId", ""),
+            ))
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Skipping malformed notification {entry!r}: {e}")
+    return notifications
+
+class NotificationQueue:
+    """
+    Thread-safe queue of changed (owner_id, date) pairs. Repeated notifications
+    for the same user and day collapse into one pending entry.
+    """
+    def __init__(self):
+        self._pending: "OrderedDict[Tuple[str, date], None]" = OrderedDict()
+        self._cond = threading.Condition()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def put(self, notifications: List[Notification]) -> int:
+        """
+        Queues notifications and returns how many were new.
+        """
+        added = 0
+        with self._cond:
+            for notification in notifications:
+                key = (notification.owner_id, notification.date)
+                if key not in self._pending:
+                    self._pending[key] = None
+                    added += 1
+            if added:
+                self._cond.notify()
+        return added
+
+    def drain(self, timeout: Optional[float] = None) -> Dict[str, List[date]]:
+        """
+        Removes everything pending as {owner_id: [dates]}, waiting up to `timeout` seconds for work.
+        """
+        with self._cond:
+            if not self._pending and timeout:
+                self._cond.wait(timeout)
+            changed: Dict[str, List[date]] = {}
+            for owner_id, day in self._pending:
+                changed.setdefault(owner_id, []).append(day)
+            self._pending.clear()
+        return {owner_id: sorted(days) for owner_id, days in changed.items()}
+
+def index_token_files(token_files: List[Path]) -> Dict[str, Path]:
+    """
+    Maps Fitbit user IDs (the `user_id` field of each token file) to their token files.
+    """
+    index = {}
+    for token_file in token_files:
+        try:
+            with open(token_file, "r") as f:
+                owner_id = json.load(f).get("user_id")
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Skipping unreadable token file {token_file}: {e}")
+            continue
+        if not owner_id:
+            logger.warning(f"Token file {token_file} has no user_id; its notifications cannot be routed")
+            continue
+        index[owner_id] = token_file
+    return index
+
+def date_runs(days: List[date]) -> List[Tuple[date, date]]:
+    """
+    Groups sorted dates into contiguous (first, last) runs.
+    """
+    runs = []
+    for day in days:
+        if runs and day == runs[-1][1] + timedelta(days=1):
+            runs[-1] = (runs[-1][0], day)
+        elif not runs or day != runs[-1][1]:
+            runs.append((day, day))
+    return runs
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Responses are a bare status line; avoid delayed-ACK stalls on keep-alive
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        # Subscriber verification: answer 204 for the right code and 404 otherwise
+        params = parse_qs(urlparse(self.path).query)
+        code = self.server.receiver.settings.subscriber_verification_code
+        if code and params.get("verify") == [code]:
+            self._send(204)
+        else:
+            self._send(404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        receiver = self.server.receiver
+        if not verify_signature(body, self.headers.get(SIGNATURE_HEADER), receiver.settings.client_secret):
+            logger.warning("Rejected notification with a missing or invalid signature")
+            self._send(404)
+            return
+        try:
+            notifications = parse_notifications(body)
+        except ValueError as e:
+            logger.warning(f"Rejected unparseable notification body: {e}")
+            self._send(400)
+            return
+        # Fitbit expects an answer within a few seconds, so fetching happens off this thread
+        added = receiver.queue.put(notifications)
+        logger.debug(f"Queued {added} of {len(notifications)} notifications")
+        self._send(204)
+
+    def _send(self, status: int):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        # Suppress default server logging
+        pass
+
+def subscribe_all(settings: Settings, token_files: List[Path], collection: str = "activities") -> int:
+    """
+    Creates a `collection` subscription for every token file, using the Fitbit user ID as the subscription ID.
+    Returns the number of users subscribed.
+    """
+    tokens = TokenManager(settings, interactive=False, background=False)
+    rate_limiter = RateLimiter()
+    subscribed = 0
+    try:
+        for owner_id, token_file in index_token_files(token_files).items():
+            client = FitbitClient.from_settings(tokens.get_token(token_file), settings, rate_limiter=rate_limiter,
+                                                user_key=owner_id)
+            try:
+                client.create_subscription(owner_id, collection)
+                subscribed += 1
+            except FitbitAPIError as e:
+                logger.error(f"Subscribing {owner_id} failed: {e}")
+    finally:
+        tokens.close()
+    return subscribed
+
+# Called with (owner_id, token_file, changed dates)
+SyncFn = Callable[[str, Path, List[date]], None]
+
+class WebhookReceiver:
+    """
+    Receives Fitbit subscription notifications, verifies and queues them, and
+    refetches only the users and dates they mark as changed.
+    """
+    def __init__(self, settings: Settings, token_files: List[Path], sync: Optional[SyncFn] = None,
+                 host: str = "127.0.0.1", port: int = 8090):
+        self.settings = settings
+        self.owners = index_token_files(token_files)
+        self.host = host
+        self.port = port
+        self.queue = NotificationQueue()
+        self.tokens: Optional[TokenManager] = None
+        self.cache: Optional[StepCache] = None
+        # One budget per Fitbit user across every refetch
+        self.rate_limiter = RateLimiter()
+        self.sync = sync or self._sync
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    def _sync(self, owner_id: str, token_file: Path, days: List[date]):
+        if self.tokens is None:
+            self.tokens = TokenManager(self.settings, interactive=False)
+        if self.cache is None:
+            if not self.settings.cache_file:
+                logger.warning("No cache_file configured; notifications have nowhere to be stored")
+                return
+            self.cache = StepCache(self.settings.cache_file)
+
+        token = self.tokens.get_token(token_file)
+        client = FitbitClient.from_settings(token, self.settings, rate_limiter=self.rate_limiter, user_key=owner_id)
+        client = CachedFitbitClient(client, self.cache, user_id=owner_id)
+        # Changed days lose their final flag, so the cached client refetches exactly those runs
+        self.cache.invalidate(owner_id, days)
+        for first, last in date_runs(days):
+            client.get_step_series(first.strftime("%Y-%m-%d"), last.strftime("%Y-%m-%d"))
+
+    def process_pending(self, timeout: Optional[float] = None) -> int:
+        """
+        Syncs every queued (user, date) change. Returns the number of users synced.
+        """
+        synced = 0
+        for owner_id, days in self.queue.drain(timeout).items():
+            token_file = self.owners.get(owner_id)
+            if token_file is None:
+                logger.warning(f"Notification for unknown user {owner_id}")
+                continue
+            try:
+                self.sync(owner_id, token_file, days)
+                synced += 1
+                logger.info(f"Synced {len(days)} changed day(s) for {owner_id}")
+            except Exception as e:
+                logger.error(f"Sync for {owner_id} failed: {e}")
+        return synced
+
+    def _work_loop(self):
+        while not self._stop.is_set():
+            self.process_pending(timeout=1.0)
+
+    def start(self, worker: bool = True):
+        """
+        Starts the HTTP server thread and, unless `worker` is False, the sync worker thread.
+        """
+        self.server = ThreadingHTTPServer((self.host, self.port), WebhookHandler)
+        self.server.daemon_threads = True
+        self.server.receiver = self
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        if worker:
+            self._worker = threading.Thread(target=self._work_loop, daemon=True)
+            self._worker.start()
+        logger.info(f"Listening for Fitbit notifications on http://{self.host}:{self.port}/ "
+                    f"for {len(self.owners)} users")
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/"
+
+    def serve_forever(self):
+        self.start()
+        try:
+            self._stop.wait()
+        except KeyboardInterrupt:
+            logger.info("Shutting down...")
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stop.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        if self._worker is not None:
+            self._worker.join()
+        if self.tokens is not None:
+            self.tokens.close()
+        if self.cache is not None:
+            self.cache.close()
@@ -0,0 +1,305 @@
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional, Union
+
+from config import Settings
+from token_manager import TokenManager
+from cache import StepCache
+from rate_limit import RateLimiter
+from batch import UserResult, assign_user_ids, process_user
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_FILE = "work_queue.db"
+DEFAULT_LEASE_SECONDS = 120.0
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+@dataclass
+class Job:
+    id: int
+    user_id: str
+    token_file: Path
+    state: str
+    attempts: int
+    worker: Optional[str] = None
+    lease_expires: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+
+def _shard_key(user_id: str) -> int:
+    # crc32 rather than hash(), so every process and machine agrees
+    return zlib.crc32(user_id.encode())
+
+def shard_of(user_id: str, num_shards: int) -> int:
+    """
+    The shard a user's job belongs to when the queue is split `num_shards` ways.
+    """
+    return _shard_key(user_id) % num_shards
+
+class WorkQueue:
+    """
+    SQLite-backed queue with one sync job per user, shared by every worker that can open the file.
+    A worker claims jobs under a time-limited lease and renews it with heartbeat(); a lease
+    that runs out (the worker crashed or hung) makes the job claimable again. Completing or
+    failing a job only succeeds for the current lease holder, so a worker that lost its lease
+    can never overwrite the result of the worker that took over.
+    """
+    def __init__(self, path: Union[str, Path] = DEFAULT_QUEUE_FILE, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = 3, clock: Callable[[], float] = time.time):
+        self.path = str(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.clock = clock
+        # Autocommit mode, so claims can take the write lock up front with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " user_id TEXT NOT NULL UNIQUE,"
+                " token_file TEXT NOT NULL,"
+                " shard_key INTEGER NOT NULL,"
+                " state TEXT NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " worker TEXT,"
+                " lease_expires REAL,"
+                " result TEXT,"
+                " error TEXT,"
+                " updated_at REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, lease_expires)")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def enqueue(self, token_files: List[Path]) -> int:
+        """
+        Queues a sync job for each token file (user ids come from batch.assign_user_ids, so
+        enqueue a whole batch source at once). A user that already has a job is re-queued
+        unless a worker currently holds it. Returns the number of jobs that are now pending.
+        """
+        now = self.clock()
+        user_ids = assign_user_ids([Path(path) for path in token_files])
+        rows = [(user_id, str(path), _shard_key(user_id), PENDING, now) for path, user_id in user_ids.items()]
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                before = self.conn.total_changes
+                self.conn.executemany(
+                    "INSERT INTO jobs (user_id, token_file, shard_key, state, updated_at) VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT (user_id) DO UPDATE SET token_file = excluded.token_file, state = excluded.state,"
+                    " attempts = 0, worker = NULL, lease_expires = NULL, error = NULL, updated_at = excluded.updated_at"
+                    " WHERE jobs.state != 'leased'",
+                    rows
+                )
+                queued = self.conn.total_changes - before
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return queued
+
+    def claim(self, worker: str, limit: int = 1, shard: Optional[int] = None, num_shards: int = 1) -> List[Job]:
+        """
+        Atomically leases up to `limit` claimable jobs: pending ones and ones whose lease expired.
+        With `num_shards` > 1 only users of shard `shard` are considered, so workers given
+        different shards never contend for the same rows.
+        """
+        now = self.clock()
+        query = ("SELECT id FROM jobs WHERE (state = ? OR (state = ? AND lease_expires <= ?)) AND attempts < ?")
+        params: List[Any] = [PENDING, LEASED, now, self.max_attempts]
+        if num_shards > 1:
+            query += " AND shard_key % ? = ?"
+            params += [num_shards, shard or 0]
+        query += " ORDER BY updated_at, id LIMIT ?"
+        params.append(limit)
+
+        with self.lock:
+            # Taking the write lock before the SELECT makes select-then-update atomic across processes
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._expire(now)
+                ids = [row[0] for row in self.conn.execute(query, params).fetchall()]
+                if ids:
+                    marks = ",".join("?" * len(ids))
+                    self.conn.execute(
+                        f"UPDATE jobs SET state = ?, worker = ?, lease_expires = ?, attempts = attempts + 1,"
+                        f" updated_at = ? WHERE id IN ({marks})",
+                        [LEASED, worker, now + self.lease_seconds, now, *ids]
+                    )
+                rows = self._select(f"id IN ({','.join('?' * len(ids))})", ids) if ids else []
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        for job in rows:
+            if job.attempts > 1:
+                logger.info(f"Reclaimed job for {job.user_id} (attempt {job.attempts})")
+        return rows
+
+    def _expire(self, now: float):
+        # Expired leases that used up their attempts will never be claimed again
+        self.conn.execute(
+            "UPDATE jobs SET state = ?, error = COALESCE(error, 'lease expired'), worker = NULL, updated_at = ?"
+            " WHERE state = ? AND lease_expires <= ? AND attempts >= ?",
+            (FAILED, now, LEASED, now, self.max_attempts)
+        )
+
+    def heartbeat(self, job_id: int, worker: str) -> bool:
+        """
+        Extends the lease of a job this worker holds. False means the lease was lost.
+        """
+        now = self.clock()
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND worker = ? AND state = ?",
+                (now + self.lease_seconds, now, job_id, worker, LEASED)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker: str, result: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Marks a leased job done and stores its result. False if the worker no longer holds the lease.
+        """
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET state = ?, result = ?, error = NULL, lease_expires = NULL, updated_at = ?"
+                " WHERE id = ? AND worker = ? AND state = ?",
+                (DONE, json.dumps(result) if result is not None else None, self.clock(), job_id, worker, LEASED)
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: int, worker: str, error: str, retry: bool = True) -> bool:
+        """
+        Records a failed attempt. The job goes back to pending while it has attempts left
+        (and `retry` is set), otherwise it is marked failed for good.
+        """
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET state = CASE WHEN ? AND attempts < ? THEN ? ELSE ? END,"
+                " error = ?, worker = NULL, lease_expires = NULL, updated_at = ?"
+                " WHERE id = ? AND worker = ? AND state = ?",
+                (int(retry), self.max_attempts, PENDING, FAILED, error, self.clock(), job_id, worker, LEASED)
+            )
+        return cursor.rowcount == 1
+
+    def has_open_jobs(self) -> bool:
+        """
+        True while any job is pending or leased, i.e. there may still be work to pick up.
+        """
+        with self.lock:
+            self._expire(self.clock())
+            row = self.conn.execute("SELECT COUNT(*) FROM jobs WHERE state IN (?, ?)", (PENDING, LEASED)).fetchone()
+        return row[0] > 0
+
+    def counts(self) -> Dict[str, int]:
+        with self.lock:
+            rows = self.conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {state: count for state, count in rows}
+
+    def get(self, user_id: str) -> Optional[Job]:
+        with self.lock:
+            rows = self._select("user_id = ?", [user_id])
+        return rows[0] if rows else None
+
+    def _select(self, where: str, params: List[Any]) -> List[Job]:
+        rows = self.conn.execute(
+            "SELECT id, user_id, token_file, state, attempts, worker, lease_expires, result, error"
+            f" FROM jobs WHERE {where} ORDER BY id", params
+        ).fetchall()
+        return [Job(id=r[0], user_id=r[1], token_file=Path(r[2]), state=r[3], attempts=r[4], worker=r[5],
+                    lease_expires=r[6], result=json.loads(r[7]) if r[7] else None, error=r[8]) for r in rows]
+
+class _Heartbeat:
+    """
+    Renews a job's lease from a background thread while the job runs.
+    """
+    def __init__(self, queue: WorkQueue, job: Job, worker: str, interval: float):
+        self.queue = queue
+        self.job = job
+        self.worker = worker
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self.queue.heartbeat(self.job.id, self.worker):
+                logger.warning(f"Lost the lease on {self.job.user_id}; another worker may take it over")
+                return
+
+    def __enter__(self) -> "_Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+@dataclass
+class WorkerReport:
+    worker: str
+    processed: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+
+def run_worker(settings: Settings, queue: WorkQueue, worker: Optional[str] = None, shard: Optional[int] = None,
+               num_shards: int = 1, batch_size: int = 1, poll_interval: float = 5.0,
+               process: Callable[..., UserResult] = process_user) -> WorkerReport:
+    """
+    Claims and syncs jobs until the queue has no open work left. While other workers still
+    hold leases it keeps polling, so it takes over their jobs if those leases expire.
+    `process(tokens, token_file, cache, user_id, rate_limiter)` does the per-user work (batch.process_user
+    by default); the worker's jobs share one RateLimiter.
+    """
+    report = WorkerReport(worker=worker or default_worker_id())
+    cache = StepCache(settings.cache_file) if settings.cache_file else None
+    tokens = TokenManager(settings, interactive=False, background=False)
+    rate_limiter = RateLimiter()
+    started = time.perf_counter()
+    try:
+        while True:
+            jobs = queue.claim(report.worker, limit=batch_size, shard=shard, num_shards=num_shards)
+            if not jobs:
+                if not queue.has_open_jobs():
+                    break
+                time.sleep(poll_interval)
+                continue
+            for job in jobs:
+                with _Heartbeat(queue, job, report.worker, queue.lease_seconds / 3):
+                    result = process(tokens, job.token_file, cache, job.user_id, rate_limiter)
+                report.processed += 1
+                if result.ok:
+                    recorded = queue.complete(job.id, report.worker, {"stats": result.stats, "elapsed": result.elapsed})
+                    report.succeeded += 1
+                else:
+                    recorded = queue.fail(job.id, report.worker, result.error)
+                    report.failed += 1
+                if not recorded:
+                    logger.warning(f"Result for {job.user_id} dropped: the lease moved to another worker")
+                logger.info(f"{job.user_id}: {'ok' if result.ok else 'FAILED (' + result.error + ')'}")
+    finally:
+        tokens.close()
+        if cache is not None:
+            cache.close()
+    report.elapsed = time.perf_counter() - started
+    return report